@@ -0,0 +1,347 @@
+import numpy as np
+import pandas as pd
+
+# Columns that the sidebar multiselects filter on
+FILTER_COLUMNS = ['Product_Type', 'Department', 'Shift', 'Manager', 'Factory_Unit', 'Machine_Unit',
+                  'Productivity_Zone', 'Anomaly_Conduct']
+
+# Numeric measures of the dataset
+MEASURES = ['Labor_Presence', 'Labor_Total_Output', 'Labor_Target_Output', 'Labor_Efficiency_Rate', 'Productivity']
+
+# Calendar keys derived from Date when a grouping asks for them
+TIME_KEYS = {
+    'Week': lambda dates: dates.dt.isocalendar().week,
+    'Month': lambda dates: dates.dt.month,
+    'Year': lambda dates: dates.dt.year,
+    'Day_of_Week': lambda dates: dates.dt.day_name(),
+    'Week_Start': lambda dates: dates.dt.to_period('W').dt.start_time,
+    'Week_Ending': lambda dates: dates.dt.to_period('W').dt.end_time.dt.normalize(),
+    'Month_Start': lambda dates: dates.dt.to_period('M').dt.to_timestamp()
+}
+
+INTERVAL_KEYS = {"Weekly": 'Week', "Monthly": 'Month', "Yearly": 'Year'}
+# Productivity Evolution draws weeks on a date axis, so its forecast continues them across year ends
+EVOLUTION_KEYS = dict(INTERVAL_KEYS, Weekly='Week_Start')
+
+
+# Sidebar state with nothing narrowed: the full date and efficiency range, no multiselects.
+# Key order matches the filters dict built by labour.py so both hash to the same cache key.
+def default_filters(data):
+    filters = {'start_date': data['Date'].min().date(), 'end_date': data['Date'].max().date()}
+    filters.update({column: [] for column in FILTER_COLUMNS})
+    filters['efficiency_rate'] = (float(data['Labor_Efficiency_Rate'].min()),
+                                  float(data['Labor_Efficiency_Rate'].max()))
+    return filters
+
+
+# What the sidebar needs to draw its filters without the rows: the date and efficiency ranges
+# and each multiselect's options in order of first appearance
+def dataset_metadata(data):
+    return {
+        'date_range': (data['Date'].min(), data['Date'].max()),
+        'efficiency_range': (float(data['Labor_Efficiency_Rate'].min()),
+                             float(data['Labor_Efficiency_Rate'].max())),
+        'options': {column: list(data[column].unique()) for column in FILTER_COLUMNS}
+    }
+
+
+# Apply the sidebar filters to the dataset
+# Rows are stored grouped into partitions by calendar month and Factory_Unit. Each partition is a
+# contiguous row range with min/max statistics, so a filter only reads the partitions that can match.
+# They are row ranges of a fully loaded frame: they save filtering work, not loading or memory.
+PARTITION_KEYS = ['Month', 'Factory_Unit']
+PARTITION_STATS = ['Date'] + MEASURES
+
+
+# Sort rows by partition and describe each partition: its keys, row range, size and min/max stats
+def partition_table(df):
+    month = df['Date'].dt.to_period('M').dt.to_timestamp()
+    order = np.lexsort((df['Date'].to_numpy(), df['Factory_Unit'].astype(str).to_numpy(), month.to_numpy()))
+    df = df.iloc[order].reset_index(drop=True)
+    month = month.iloc[order].reset_index(drop=True)
+    ids = df.groupby([month, df['Factory_Unit']], dropna=False, sort=False).ngroup().to_numpy()
+
+    grouped = df.groupby(ids, sort=True)
+    positions = pd.Series(np.arange(len(df))).groupby(ids, sort=True)
+    partitions = pd.DataFrame({
+        'Month': month.groupby(ids, sort=True).first(),
+        'Factory_Unit': grouped['Factory_Unit'].first(),
+        'start': positions.min(),
+        'stop': positions.max() + 1
+    })
+    partitions['Rows'] = partitions['stop'] - partitions['start']
+    stats = grouped[[c for c in PARTITION_STATS if c in df]].agg(['min', 'max'])
+    stats.columns = [f'{column}_{stat}' for column, stat in stats.columns]
+    return df, partitions.join(stats).reset_index(drop=True)
+
+
+# Partitions whose statistics overlap the date range, efficiency range and factory selection
+def prune_partitions(partitions, filters):
+    keep = (
+        (partitions['Date_max'] >= pd.to_datetime(filters['start_date'])) &
+        (partitions['Date_min'] <= pd.to_datetime(filters['end_date'])) &
+        (partitions['Labor_Efficiency_Rate_max'] >= filters['efficiency_rate'][0]) &
+        (partitions['Labor_Efficiency_Rate_min'] <= filters['efficiency_rate'][1])
+    )
+    if filters.get('Factory_Unit'):
+        keep &= partitions['Factory_Unit'].isin(filters['Factory_Unit'])
+    return partitions[keep]
+
+
+# Row positions of the partitions that survive pruning
+def partition_rows(partitions, filters):
+    kept = prune_partitions(partitions, filters)
+    if kept.empty:
+        return np.empty(0, dtype=np.intp)
+    return np.concatenate([np.arange(start, stop) for start, stop in zip(kept['start'], kept['stop'])])
+
+
+# Positions of the rows matching the sidebar filters. With a partition table only the partitions
+# that can match are read, and only the filtered columns are gathered, never whole rows.
+def filter_positions(data, filters, partitions=None):
+    rows = partition_rows(partitions, filters) if partitions is not None else None
+    column = (lambda name: data[name].iloc[rows]) if rows is not None else (lambda name: data[name])
+    mask = (
+        (column('Date') >= pd.to_datetime(filters['start_date'])) &
+        (column('Date') <= pd.to_datetime(filters['end_date'])) &
+        column('Labor_Efficiency_Rate').between(*filters['efficiency_rate'])
+    )
+    for name in FILTER_COLUMNS:
+        if filters.get(name):
+            mask &= column(name).isin(filters[name])
+    mask = mask.to_numpy()
+    return rows[mask] if rows is not None else np.flatnonzero(mask)
+
+
+# Positions narrowed to the rows matching every {column: values} predicate of a chart selection,
+# reading only the selected columns at those positions
+def narrow_positions(data, positions, selection):
+    for column, values in selection.items():
+        positions = positions[data[column].iloc[positions].isin(values).to_numpy()]
+    return positions
+
+
+# Apply the sidebar filters
+def apply_filters(data, filters, partitions=None):
+    return data.iloc[filter_positions(data, filters, partitions)]
+
+
+# Row positions of every value of every filter column. Chart selections resolve against it by
+# intersecting sorted position lists, so narrowing the view never re-scans the columns.
+def build_filter_index(df):
+    index = {}
+    for column in FILTER_COLUMNS:
+        codes, values = pd.factorize(df[column])
+        order = np.argsort(codes, kind='stable')
+        bounds = np.searchsorted(codes[order], np.arange(len(values) + 1))
+        index[column] = {value: order[bounds[i]:bounds[i + 1]] for i, value in enumerate(values)}
+    return index
+
+
+# Sorted positions of the rows matching every {column: values} predicate (any value per column)
+def select_positions(index, selection):
+    positions = None
+    for column, values in selection.items():
+        lists = [index[column][value] for value in values if value in index[column]]
+        rows = np.sort(np.concatenate(lists)) if lists else np.empty(0, dtype=np.intp)
+        positions = rows if positions is None else np.intersect1d(positions, rows, assume_unique=True)
+    return positions
+
+
+def _group_keys(df, by):
+    return [TIME_KEYS[key](df['Date']).rename(key) if key in TIME_KEYS else df[key] for key in by]
+
+
+# Group rows by dataset columns and/or TIME_KEYS and aggregate.
+# how is a pandas aggregation name, a {column: aggregation} dict, or 'size' for row counts.
+def group_aggregate(df, by, values=None, how='mean'):
+    grouped = df.groupby(_group_keys(df, by), observed=True)
+    if how == 'size':
+        result = grouped.size().rename('Count')
+    elif isinstance(how, dict):
+        result = grouped.agg(how)
+    else:
+        result = grouped[list(values) if isinstance(values, (list, tuple)) else values].agg(how)
+    return result.reset_index()
+
+
+# Stratified sampling for approximate mode: every row carries the number of rows it stands for
+SAMPLE_WEIGHT = '_weight'
+SAMPLE_STRATA = ['Factory_Unit', 'Shift', 'Department']
+
+
+# Proportional allocation of the row budget over the strata, with a floor per stratum so small
+# strata still get usable estimates. Sampling is one vectorised shuffle-and-rank pass.
+def stratified_sample(data, budget, min_per_stratum=30, seed=0):
+    if len(data) <= budget:
+        return data.assign(**{SAMPLE_WEIGHT: 1.0})
+    rng = np.random.default_rng(seed)
+    strata = data.groupby(SAMPLE_STRATA, observed=True, dropna=False, sort=False).ngroup().to_numpy()
+    sizes = np.bincount(strata)
+    allocation = np.minimum(sizes, np.maximum(min_per_stratum, np.round(budget * sizes / len(data)))).astype(int)
+
+    order = np.lexsort((rng.random(len(data)), strata))
+    sorted_strata = strata[order]
+    rank = np.arange(len(order)) - np.searchsorted(sorted_strata, sorted_strata)
+    keep = np.sort(order[rank < allocation[sorted_strata]])
+
+    sample = data.iloc[keep].copy()
+    sample[SAMPLE_WEIGHT] = (sizes / allocation)[strata[keep]]
+    return sample
+
+
+# Weighted estimate of a group_aggregate result from a stratified sample, with the half width
+# of a 95% confidence interval in a '<column>_ci' column next to every sum, mean and count
+def estimate_aggregate(sample, by, values=None, how='mean', z=1.96):
+    keys = _group_keys(sample, by)
+    weights = sample[SAMPLE_WEIGHT]
+    weight_sum = weights.groupby(keys, observed=True).sum()
+    if how == 'size':
+        variance = (weights * (weights - 1)).groupby(keys, observed=True).sum()
+        result = pd.DataFrame({'Count': weight_sum, 'Count_ci': z * np.sqrt(variance)})
+        return result.reset_index()
+
+    if isinstance(how, dict):
+        aggregations = how
+    else:
+        columns = list(values) if isinstance(values, (list, tuple)) else [values]
+        aggregations = {column: how for column in columns}
+    result = {}
+    for column, agg in aggregations.items():
+        x = sample[column]
+        weighted = (weights * x).groupby(keys, observed=True)
+        if agg == 'mean':
+            mean = weighted.sum() / weight_sum
+            row_mean = weighted.transform('sum') / weights.groupby(keys, observed=True).transform('sum')
+            variance = (weights ** 2 * (x - row_mean) ** 2).groupby(keys, observed=True).sum() / weight_sum ** 2
+            result[column] = mean
+            result[f'{column}_ci'] = z * np.sqrt(variance)
+        elif agg == 'sum':
+            result[column] = weighted.sum()
+            result[f'{column}_ci'] = z * np.sqrt((weights * (weights - 1) * x ** 2).groupby(keys, observed=True).sum())
+        else:
+            # Order statistics have no cheap interval; take them from the sampled rows as-is
+            result[column] = x.groupby(keys, observed=True).agg(agg)
+    return pd.DataFrame(result).reset_index()
+
+
+PRODUCT_SUMMARY = {
+    'Labor_Total_Output': 'sum',
+    'Labor_Target_Output': 'sum',
+    'Productivity': 'mean',
+    'Labor_Efficiency_Rate': 'mean'
+}
+
+# Aggregate tables each page draws from, as (by, values, how) specs
+PAGE_AGGREGATES = {
+    "Labor Presence at Machine (within Zone)": {
+        'presence_by_shift_machine': (('Shift', 'Machine_Unit'), 'Labor_Presence', 'sum'),
+        'presence_by_day_shift': (('Day_of_Week', 'Shift'), 'Labor_Presence', 'mean')
+    },
+    "Labor Total Produced Output": {
+        'output_by_month_department': (('Month_Start', 'Department'), 'Labor_Total_Output', 'sum')
+    },
+    "Productivity (90% target achieved with 90% presence)": {
+        'presence_by_product': (('Product_Type',), 'Labor_Presence', 'mean')
+    },
+    "Labor Efficiency Rate": {
+        'efficiency_by_week': (('Week_Ending',), 'Labor_Efficiency_Rate', 'mean')
+    },
+    "Productivity Zone - Green (90%+), Yellow (80%-90%), Red (<80%)": {
+        'zones_by_week': (('Week_Start', 'Productivity_Zone'), None, 'size')
+    },
+    "Product": {
+        'product_summary': (('Product_Type',), None, PRODUCT_SUMMARY),
+        'department_summary': (('Department',), None, PRODUCT_SUMMARY),
+        'presence_by_product_department': (('Product_Type', 'Department'), 'Labor_Presence', 'mean')
+    },
+    "Time Intervals (Week, Month, Year)": {
+        interval: ((key,), MEASURES, 'mean') for interval, key in INTERVAL_KEYS.items()
+    },
+    "Productivity Pulse": {
+        interval: ((key, 'Shift'), MEASURES, 'mean') for interval, key in INTERVAL_KEYS.items()
+    },
+    "Productivity Panorama": {
+        'productivity_by_machine': (('Machine_Unit',), 'Productivity', 'mean')
+    },
+    "Target Tracker": {
+        'productivity_by_factory_machine': (('Factory_Unit', 'Machine_Unit'), 'Productivity', 'mean')
+    },
+    "Shift Synergy": {
+        'productivity_by_shift_department_zone': (('Shift', 'Department', 'Productivity_Zone'), 'Productivity', 'mean')
+    },
+    "Efficiency Compass": {
+        'department_summary': (('Department',), None, {'Labor_Efficiency_Rate': 'mean', 'Productivity': 'mean'})
+    },
+    "Productivity Evolution": dict(
+        {'productivity_by_year_month': (('Year', 'Month'), 'Productivity', 'mean')},
+        **{interval: ((key, 'Shift'), MEASURES, 'mean') for interval, key in EVOLUTION_KEYS.items()}
+    )
+}
+
+# Dimensions and metrics offered by the pivot explorer (label -> column)
+PIVOT_DIMENSIONS = {
+    'Department': 'Department',
+    'Shift': 'Shift',
+    'Manager': 'Manager',
+    'Factory Unit': 'Factory_Unit',
+    'Machine Unit': 'Machine_Unit',
+    'Product Type': 'Product_Type',
+    'Productivity Zone': 'Productivity_Zone'
+}
+PIVOT_METRICS = ['Productivity', 'Labor_Efficiency_Rate', 'Labor_Total_Output', 'Labor_Presence', 'Labor_Target_Output']
+# Aggregations that can be rebuilt from the cube's mergeable statistics
+PIVOT_AGGREGATIONS = {'Mean': 'mean', 'Sum': 'sum', 'Count': 'count', 'Min': 'min', 'Max': 'max', 'Std Dev': 'std'}
+
+
+# One pass over the rows: count, sum, centred sum of squares (about the cell's own mean), min and
+# max of every pivot metric at the finest combination of all pivot dimensions, missing dimension
+# values included. Any coarser cut is re-aggregated from it. Sampled rows count with their
+# SAMPLE_WEIGHT, so the same cube serves approximate mode.
+def build_cube(df):
+    dims = list(PIVOT_DIMENSIONS.values())
+    weights = df[SAMPLE_WEIGHT] if SAMPLE_WEIGHT in df else pd.Series(1.0, index=df.index)
+    values = df[dims + PIVOT_METRICS].copy()
+    for metric in PIVOT_METRICS:
+        values[f'{metric}__w'] = weights.where(values[metric].notna(), 0.0)
+        values[f'{metric}__wx'] = weights * values[metric]
+    grouped = values.groupby(dims, observed=True, dropna=False)
+    for metric in PIVOT_METRICS:
+        cell_mean = grouped[f'{metric}__wx'].transform('sum') / grouped[f'{metric}__w'].transform('sum')
+        values[f'{metric}__m2'] = weights * (values[metric] - cell_mean) ** 2
+    grouped = values.groupby(dims, observed=True, dropna=False)
+    parts = []
+    for metric in PIVOT_METRICS:
+        stats = grouped[metric].agg(['min', 'max'])
+        stats['count'] = grouped[f'{metric}__w'].sum()
+        stats['sum'] = grouped[f'{metric}__wx'].sum()
+        stats['m2'] = grouped[f'{metric}__m2'].sum()
+        parts.append(stats.add_prefix(f'{metric}__'))
+    return pd.concat(parts, axis=1).reset_index()
+
+
+# Cut the cube by one or two dimensions and derive the requested aggregation. The spread of a cut
+# adds each cell's centred sum of squares to its count times its mean's squared distance from
+# the cut's mean, so no large sums of squares are subtracted.
+def pivot(cube, dims, metric, how):
+    cells = cube[list(dims)].assign(
+        count=cube[f'{metric}__count'], sum=cube[f'{metric}__sum'], m2=cube[f'{metric}__m2'],
+        min=cube[f'{metric}__min'], max=cube[f'{metric}__max'])
+    grouped = cells.groupby(list(dims), observed=True, dropna=False)
+    cut_mean = grouped['sum'].transform('sum') / grouped['count'].transform('sum')
+    cells['m2'] += cells['count'] * (cells['sum'] / cells['count'] - cut_mean) ** 2
+    stats = cells.groupby(list(dims), observed=True, dropna=False).agg(
+        count=('count', 'sum'), sum=('sum', 'sum'), m2=('m2', 'sum'), min=('min', 'min'), max=('max', 'max'))
+    count = stats['count'].where(stats['count'] > 0)
+    mean = stats['sum'] / count
+    variance = stats['m2'] / (count - 1).clip(lower=1)
+    derived = {
+        'mean': mean,
+        'sum': stats['sum'],
+        'count': stats['count'],
+        'min': stats['min'],
+        'max': stats['max'],
+        'std': variance ** 0.5
+    }
+    result = pd.DataFrame({metric: derived[how], 'Std': derived['std'], 'Rows': stats['count']})
+    return result.reset_index()
@@ -0,0 +1,63 @@
+import pandas as pd
+
+from analytics import FILTER_COLUMNS, MEASURES
+
+# Keys the event counts are kept by; Date is the day of the event
+COUNT_KEYS = ['Anomaly_Conduct', 'Date', 'Shift', 'Department', 'Factory_Unit']
+# Columns kept for every event: all the filters can narrow, and the measures overlays draw
+EVENT_COLUMNS = ['Date'] + FILTER_COLUMNS + MEASURES
+
+
+# Index of the rows with an Anomaly_Conduct: the events themselves, in date order, and their
+# counts per (type, day, Shift, Department, Factory_Unit). Built once per dataset; everything
+# read from it costs in proportion to the number of events, not rows.
+def build_index(df):
+    events = df.loc[df['Anomaly_Conduct'].notna(), EVENT_COLUMNS].sort_values('Date', kind='stable')
+    events = events.reset_index(drop=True)
+    days = events['Date'].dt.normalize()
+    counts = events.groupby([days if key == 'Date' else events[key] for key in COUNT_KEYS],
+                            observed=True, dropna=False).size().rename('Count').reset_index()
+    return {
+        'events': events,
+        'counts': counts,
+        # Counts answer date filters exactly only when no event falls inside a day
+        'daily': bool((events['Date'] == days).all()),
+        'efficiency_range': (float(df['Labor_Efficiency_Rate'].min()), float(df['Labor_Efficiency_Rate'].max()))
+    }
+
+
+# {column: values} every matching event must have one of: the sidebar multiselects, then the
+# chart selections
+def _predicates(filters):
+    predicates = [(column, filters[column]) for column in FILTER_COLUMNS if filters.get(column)]
+    predicates.extend((filters.get('chart_selection') or {}).items())
+    return predicates
+
+
+def _matching(table, filters, predicates, efficiency=True):
+    mask = ((table['Date'] >= pd.to_datetime(filters['start_date'])) &
+            (table['Date'] <= pd.to_datetime(filters['end_date'])))
+    if efficiency:
+        mask &= table['Labor_Efficiency_Rate'].between(*filters['efficiency_rate'])
+    for column, values in predicates:
+        mask &= table[column].isin(values)
+    return table[mask]
+
+
+# The events matching the sidebar filters and chart selections
+def matching_events(index, filters):
+    return _matching(index['events'], filters, _predicates(filters))
+
+
+# Event counts by any of COUNT_KEYS under the sidebar filters and chart selections. Read from the
+# count table when the filters only touch its keys, from the matching events otherwise.
+def event_counts(index, filters, by):
+    predicates = _predicates(filters)
+    low, high = index['efficiency_range']
+    full_efficiency = filters['efficiency_rate'][0] <= low and filters['efficiency_rate'][1] >= high
+    if index['daily'] and full_efficiency and all(column in COUNT_KEYS for column, _ in predicates):
+        counts = _matching(index['counts'], filters, predicates, efficiency=False)
+        return counts.groupby(list(by), observed=True, dropna=False)['Count'].sum().reset_index()
+    events = matching_events(index, filters)
+    keys = [events['Date'].dt.normalize() if key == 'Date' else events[key] for key in by]
+    return events.groupby(keys, observed=True, dropna=False).size().rename('Count').reset_index()
@@ -0,0 +1,344 @@
+import argparse
+import asyncio
+import collections
+import concurrent.futures
+import datetime
+import json
+import os
+import sys
+import threading
+import urllib.parse
+
+import analytics
+import disk_cache
+import export
+import ingest
+import shared_store
+from util import slugify
+
+# Aggregations a client may ask for; 'size' counts rows
+AGGREGATIONS = ['mean', 'sum', 'min', 'max', 'median', 'std', 'count', 'size']
+# Dimensions a client may group by: the filter columns and the calendar keys
+DIMENSIONS = analytics.FILTER_COLUMNS + list(analytics.TIME_KEYS)
+PAGES = {slugify(page): page for page in analytics.PAGE_AGGREGATES}
+MAX_REQUEST_LINE = 8192
+MAX_HEADERS = 100
+
+
+class BadRequest(ValueError):
+    pass
+
+
+class NotFound(LookupError):
+    pass
+
+
+def _values(query, name):
+    return [value for raw in query.get(name, []) for value in raw.split(',') if value]
+
+
+# The sidebar filters from query parameters: start_date and end_date (ISO dates), one parameter
+# per filter column (repeated or comma-separated) and efficiency_min / efficiency_max. Anything
+# left out keeps the sidebar default, so a request matches the dashboard's view and cache keys.
+def parse_filters(query, defaults):
+    filters = dict(defaults)
+    try:
+        for key in ('start_date', 'end_date'):
+            if key in query:
+                filters[key] = datetime.date.fromisoformat(query[key][-1])
+        low, high = filters['efficiency_rate']
+        filters['efficiency_rate'] = (float(query['efficiency_min'][-1]) if 'efficiency_min' in query else low,
+                                      float(query['efficiency_max'][-1]) if 'efficiency_max' in query else high)
+    except ValueError as e:
+        raise BadRequest(str(e)) from None
+    # Sorted like presets.view_filters, so a selection gets the same cache keys in any order
+    for column in analytics.FILTER_COLUMNS:
+        filters[column] = sorted(_values(query, column), key=str)
+    return filters
+
+
+def _records(table):
+    return json.loads(table.to_json(orient='records', date_format='iso'))
+
+
+# (by, values, how) of an /aggregate or /export/aggregate request
+def _aggregate_spec(query):
+    by = tuple(_values(query, 'by'))
+    values = _values(query, 'values') or None
+    how = query.get('how', ['mean'])[-1]
+    if not by or any(key not in DIMENSIONS for key in by):
+        raise BadRequest(f"by must name one or more of {DIMENSIONS}")
+    if how not in AGGREGATIONS:
+        raise BadRequest(f"how must be one of {AGGREGATIONS}")
+    if how != 'size' and (not values or any(v not in analytics.MEASURES for v in values)):
+        raise BadRequest(f"values must name one or more of {analytics.MEASURES}")
+    return by, values if values is None or len(values) > 1 else values[0], how
+
+
+# Serves the dashboard's aggregates from the dataset it would show: the published shared store
+# when there is one, the default workbook otherwise. Tables go through the same disk cache keys
+# as labour.py's aggregate(), so the UI and the API fill the cache for each other.
+class Service:
+    def __init__(self, workers, max_pending, cache=None):
+        self.pool = concurrent.futures.ThreadPoolExecutor(max_workers=workers, thread_name_prefix='api')
+        self.max_pending = max_pending
+        self.pending = 0
+        self.cache = cache or disk_cache.DiskCache()
+        self.inflight = {}
+        self.lock = threading.Lock()
+        self.dataset = None
+        self.filtered = collections.OrderedDict()
+
+    # (data_key, rows, partitions, sidebar defaults), reattached when a new version is published
+    def current_dataset(self):
+        version = shared_store.current_version()
+        data_key = f"shared:{version}" if version else None
+        with self.lock:
+            if self.dataset is not None and (data_key is None or self.dataset[0] == data_key):
+                return self.dataset
+        if version:
+            tables = shared_store.attach(version)
+            data, partitions = tables['data'], tables.get('partitions')
+        else:
+            data_hash = disk_cache.content_hash(ingest.DEFAULT_DATA_PATH)
+            data_key = f"default:{data_hash}"
+            data, partitions, _ = self.cache.get_or_compute(
+                lambda: ingest.load_dataset([ingest.DEFAULT_DATA_PATH]), 'dataset', data_hash)
+        dataset = (data_key, data, partitions, analytics.default_filters(data))
+        with self.lock:
+            self.dataset = dataset
+            self.filtered.clear()
+        return dataset
+
+    # Filtered rows of the last few filter states
+    def filter_rows(self, data_key, data, partitions, filters):
+        key = disk_cache.make_key(data_key, filters)
+        with self.lock:
+            if key in self.filtered:
+                self.filtered.move_to_end(key)
+                return self.filtered[key]
+        filtered = analytics.apply_filters(data, filters, partitions)
+        with self.lock:
+            self.filtered[key] = filtered
+            while len(self.filtered) > 32:
+                self.filtered.popitem(last=False)
+        return filtered
+
+    def aggregate(self, data_key, data, partitions, filters, by, values=None, how='mean'):
+        return self.cache.get_or_compute(
+            lambda: analytics.group_aggregate(self.filter_rows(data_key, data, partitions, filters), by, values, how),
+            'aggregate', data_key, filters, by, values, how
+        )
+
+    # Build the JSON body of one endpoint; runs in the worker pool
+    def respond(self, path, query):
+        data_key, data, partitions, defaults = self.current_dataset()
+        if path == '/filters':
+            metadata = self.cache.get_or_compute(lambda: analytics.dataset_metadata(data), 'metadata', data_key)
+            return {'data_key': data_key, 'defaults': defaults, **metadata}
+
+        filters = parse_filters(query, defaults)
+        table = lambda by, values=None, how='mean': self.aggregate(data_key, data, partitions, filters, by, values, how)
+        body = {'data_key': data_key, 'filters': filters}
+        if path == '/productivity/shift':
+            body['rows'] = _records(table(('Shift',), 'Productivity'))
+        elif path == '/zones':
+            body['rows'] = _records(table(('Productivity_Zone',), None, 'size'))
+        elif path == '/anomalies':
+            body['rows'] = _records(table(('Anomaly_Conduct',), None, 'size'))
+        elif path == '/products':
+            try:
+                n = int(query.get('n', ['5'])[-1])
+            except ValueError:
+                raise BadRequest("n must be an integer") from None
+            ranked = table(('Product_Type',), 'Productivity').sort_values('Productivity', ascending=False)
+            body['top'] = _records(ranked.head(n))
+            body['bottom'] = _records(ranked.tail(n).iloc[::-1])
+        elif path == '/aggregate':
+            body['rows'] = _records(table(*_aggregate_spec(query)))
+        elif path == '/pages':
+            body = {'pages': PAGES}
+        elif path.startswith('/pages/') and path[len('/pages/'):] in PAGES:
+            page = PAGES[path[len('/pages/'):]]
+            body['page'] = page
+            body['tables'] = {name: _records(table(*spec))
+                              for name, spec in analytics.PAGE_AGGREGATES[page].items()}
+        else:
+            raise NotFound(path)
+        return body
+
+    # The file of an export endpoint as (MIME type, file name, byte blocks). Rows are read in
+    # chunks at the positions the filters match, straight from the dataset, so an export never
+    # holds a filtered copy of the rows; blocks are encoded as the client reads them.
+    def export(self, path, query):
+        fmt = query.get('format', ['csv'])[-1]
+        if fmt not in export.FORMATS:
+            raise BadRequest(f"format must be one of {list(export.FORMATS)}")
+        data_key, data, partitions, defaults = self.current_dataset()
+        filters = parse_filters(query, defaults)
+        if path == '/export/rows':
+            chunks = export.row_chunks(data, analytics.filter_positions(data, filters, partitions))
+            stem = 'filtered_rows'
+        elif path == '/export/aggregate':
+            spec = _aggregate_spec(query)
+            chunks = export.row_chunks(self.aggregate(data_key, data, partitions, filters, *spec))
+            stem = slugify('_'.join(spec[0]))
+        else:
+            raise NotFound(path)
+        return export.FORMATS[fmt][0], export.file_name(stem, fmt), export.stream(chunks, fmt)
+
+    # Identical requests in flight share one computation
+    async def handle(self, path, query):
+        key = disk_cache.make_key(path, sorted(query.items()))
+        future = self.inflight.get(key)
+        if future is None:
+            if self.pending >= self.max_pending:
+                return 503, {'error': "Too many requests in progress, retry shortly"}
+            self.pending += 1
+            future = asyncio.get_running_loop().run_in_executor(self.pool, self.respond, path, query)
+            self.inflight[key] = future
+            future.add_done_callback(lambda _: self._finished(key))
+        try:
+            return 200, await asyncio.shield(future)
+        except BadRequest as e:
+            return 400, {'error': str(e)}
+        except NotFound:
+            return 404, {'error': f"Unknown endpoint {path}"}
+
+    # Exports are not shared between requests (each client reads its own stream) but count
+    # towards max_pending while they run
+    async def stream_export(self, writer, path, query, keep_alive):
+        if self.pending >= self.max_pending:
+            await _send(writer, 503, {'error': "Too many requests in progress, retry shortly"}, keep_alive)
+            return
+        self.pending += 1
+        try:
+            mime, name, blocks = await asyncio.get_running_loop().run_in_executor(self.pool, self.export, path, query)
+            await _send_stream(self, writer, mime, name, blocks, keep_alive)
+        finally:
+            self.pending -= 1
+
+    def _finished(self, key):
+        self.pending -= 1
+        self.inflight.pop(key, None)
+
+
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 500: 'Internal Server Error',
+           503: 'Service Unavailable'}
+
+
+# Stream an export with chunked transfer encoding; each block is encoded in the worker pool, so
+# the event loop keeps serving other clients while a large export is written
+async def _send_stream(service, writer, mime, name, blocks, keep_alive):
+    headers = ["HTTP/1.1 200 OK", f"Content-Type: {mime}", "Transfer-Encoding: chunked",
+               f'Content-Disposition: attachment; filename="{name}"', "Access-Control-Allow-Origin: *",
+               f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+    writer.write(('\r\n'.join(headers) + '\r\n\r\n').encode())
+    loop = asyncio.get_running_loop()
+    while True:
+        block = await loop.run_in_executor(service.pool, next, blocks, None)
+        if block is None:
+            break
+        if block:
+            writer.write(f"{len(block):x}\r\n".encode() + block + b"\r\n")
+            await writer.drain()
+    writer.write(b"0\r\n\r\n")
+    await writer.drain()
+
+
+async def _send(writer, status, body, keep_alive):
+    payload = json.dumps(body, default=str).encode()
+    headers = [f"HTTP/1.1 {status} {REASONS[status]}", "Content-Type: application/json",
+               f"Content-Length: {len(payload)}", "Access-Control-Allow-Origin: *",
+               f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+    if status == 503:
+        headers.append("Retry-After: 1")
+    writer.write(('\r\n'.join(headers) + '\r\n\r\n').encode() + payload)
+    await writer.drain()
+
+
+# One client connection: GET requests over HTTP/1.1 keep-alive until the client closes
+async def serve_connection(service, reader, writer, idle_timeout):
+    try:
+        while True:
+            try:
+                request_line = await asyncio.wait_for(reader.readline(), idle_timeout)
+            except (asyncio.TimeoutError, ConnectionError):
+                return
+            if not request_line:
+                return
+            headers = {}
+            for _ in range(MAX_HEADERS):
+                line = await reader.readline()
+                if line in (b'\r\n', b'\n', b''):
+                    break
+                name, _, value = line.decode('latin-1').partition(':')
+                headers[name.strip().lower()] = value.strip()
+
+            parts = request_line.decode('latin-1').split()
+            if len(request_line) > MAX_REQUEST_LINE or len(parts) != 3:
+                await _send(writer, 400, {'error': "Malformed request"}, False)
+                return
+            method, target, version = parts
+            keep_alive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+            url = urllib.parse.urlsplit(target)
+            path = url.path.rstrip('/') or '/'
+            if method == 'GET' and path.startswith('/export/'):
+                try:
+                    await service.stream_export(writer, path, urllib.parse.parse_qs(url.query), keep_alive)
+                except (BadRequest, NotFound) as e:
+                    status, body = (400, {'error': str(e)}) if isinstance(e, BadRequest) else (404, {'error': f"Unknown endpoint {path}"})
+                    await _send(writer, status, body, keep_alive)
+                if not keep_alive:
+                    return
+                continue
+            if method != 'GET':
+                status, body = 405, {'error': "Only GET is supported"}
+            else:
+                try:
+                    status, body = await service.handle(path, urllib.parse.parse_qs(url.query))
+                except Exception as e:
+                    status, body = 500, {'error': f"{type(e).__name__}: {e}"}
+            await _send(writer, status, body, keep_alive)
+            if not keep_alive:
+                return
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(host, port, workers, max_pending, idle_timeout):
+    service = Service(workers, max_pending)
+    # Load the dataset before accepting connections, so the first requests do not all wait on it
+    await asyncio.get_running_loop().run_in_executor(service.pool, service.current_dataset)
+    server = await asyncio.start_server(
+        lambda reader, writer: serve_connection(service, reader, writer, idle_timeout), host, port, backlog=1024)
+    print(f"Serving labour productivity aggregates on http://{host}:{port}", file=sys.stderr)
+    async with server:
+        await server.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Serve the dashboard's filtered aggregates as JSON. Endpoints: /filters, /productivity/shift, "
+                    "/zones, /anomalies, /products?n=, /aggregate?by=&values=&how=, /pages and /pages/<page>; "
+                    "/export/rows and /export/aggregate?by=&values=&how= stream files (format=csv, parquet "
+                    "or xlsx). All take the sidebar filters as query parameters.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--workers', type=int, default=min(8, os.cpu_count() or 1),
+                        help="Threads computing aggregates")
+    parser.add_argument('--max-pending', type=int, default=256,
+                        help="Distinct requests in progress before new ones get 503")
+    parser.add_argument('--idle-timeout', type=float, default=30, help="Seconds a keep-alive connection may idle")
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(serve(args.host, args.port, args.workers, args.max_pending, args.idle_timeout))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,90 @@
+import concurrent.futures
+import multiprocessing
+import os
+
+import numpy as np
+import pandas as pd
+
+SERIES_KEYS = ['Machine_Unit', 'Shift']
+# Below this many points in total, a process pool costs more than it saves
+PARALLEL_MIN_POINTS = 50_000
+
+
+# Weekly mean productivity of every (Machine_Unit, Shift) series, oldest week first
+def weekly_series(df):
+    weekly = df.groupby(SERIES_KEYS + [df['Date'].dt.to_period('W').dt.start_time.rename('Week_Start')],
+                        observed=True)['Productivity'].mean()
+    return [(keys[:2], group.droplevel(SERIES_KEYS)) for keys, group in weekly.groupby(level=SERIES_KEYS)]
+
+
+# PELT with a squared-error (mean shift) cost. Segment costs come from cumulative sums, and
+# candidates that can no longer start an optimal segment are pruned, which keeps the search
+# linear in the series length in practice.
+def pelt(y, penalty, min_size=2):
+    n = len(y)
+    if n < 2 * min_size:
+        return []
+    sums = np.concatenate([[0.0], np.cumsum(y)])
+    squares = np.concatenate([[0.0], np.cumsum(y ** 2)])
+
+    def segment_cost(starts, end):
+        length = end - starts
+        return squares[end] - squares[starts] - (sums[end] - sums[starts]) ** 2 / length
+
+    best = np.full(n + 1, np.inf)
+    best[0] = -penalty
+    previous = np.zeros(n + 1, dtype=int)
+    candidates = np.array([0])
+    for t in range(min_size, n + 1):
+        admissible = candidates[t - candidates >= min_size]
+        waiting = candidates[t - candidates < min_size]
+        totals = best[admissible] + segment_cost(admissible, t) + penalty
+        i = int(np.argmin(totals))
+        best[t] = totals[i]
+        previous[t] = admissible[i]
+        candidates = np.concatenate([admissible[totals - penalty <= best[t]], waiting, [t - min_size + 1]])
+
+    breakpoints = []
+    t = n
+    while t > 0:
+        t = previous[t]
+        if t > 0:
+            breakpoints.append(t)
+    return sorted(breakpoints)
+
+
+# BIC-style penalty with the noise level estimated from first differences (robust to level shifts)
+def default_penalty(y):
+    if len(y) < 3:
+        return np.inf
+    sigma = np.median(np.abs(np.diff(y))) / 0.6745 / np.sqrt(2)
+    return 2 * max(sigma, 1e-9) ** 2 * np.log(len(y))
+
+
+def _detect_batch(batch):
+    rows = []
+    for keys, dates, values in batch:
+        breakpoints = pelt(values, default_penalty(values))
+        bounds = [0] + breakpoints + [len(values)]
+        for k, position in enumerate(breakpoints):
+            before = values[bounds[k]:position].mean()
+            after = values[position:bounds[k + 2]].mean()
+            rows.append((*keys, dates[position], before, after, after - before))
+    return rows
+
+
+# Detect level shifts in every (Machine_Unit, Shift) weekly productivity series. Series are
+# split into batches and run across a process pool when there is enough work to pay for it.
+def detect_changepoints(df, workers=None):
+    series = [(keys, group.index.to_numpy(), group.to_numpy(dtype=float)) for keys, group in weekly_series(df)]
+    total_points = sum(len(values) for _, _, values in series)
+    workers = workers or os.cpu_count() or 1
+    if workers > 1 and total_points >= PARALLEL_MIN_POINTS:
+        batches = [series[i::workers * 4] for i in range(workers * 4)]
+        # spawn, not fork: the caller is usually a multi-threaded server
+        with concurrent.futures.ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+            rows = [row for batch_rows in pool.map(_detect_batch, batches) for row in batch_rows]
+    else:
+        rows = _detect_batch(series)
+    return pd.DataFrame(rows, columns=SERIES_KEYS + ['Week_Start', 'Before', 'After', 'Change'])
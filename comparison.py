@@ -0,0 +1,106 @@
+import numpy as np
+import pandas as pd
+
+from analytics import MEASURES
+
+# Breakdowns a comparison can be cut by (label -> column)
+COMPARE_DIMENSIONS = {
+    'Department': 'Department',
+    'Factory Unit': 'Factory_Unit',
+    'Product Type': 'Product_Type',
+    'Shift': 'Shift',
+    'Machine Unit': 'Machine_Unit',
+    'Manager': 'Manager'
+}
+# Automatic comparison periods; None means the equally long period just before
+OFFSETS = {
+    "Previous Period": None,
+    "Previous Week": pd.DateOffset(weeks=1),
+    "Previous Month": pd.DateOffset(months=1),
+    "Same Period Last Year": pd.DateOffset(years=1)
+}
+# KPIs compared, as (how, measure): means and totals of a measure, or output over target
+KPIS = {
+    'Productivity': ('mean', 'Productivity'),
+    'Labor_Efficiency_Rate': ('mean', 'Labor_Efficiency_Rate'),
+    'Labor_Presence': ('mean', 'Labor_Presence'),
+    'Labor_Total_Output': ('sum', 'Labor_Total_Output'),
+    'Labor_Target_Output': ('sum', 'Labor_Target_Output'),
+    'Target_Attainment': ('ratio', ('Labor_Total_Output', 'Labor_Target_Output')),
+    'Rows': ('rows', None)
+}
+
+
+# Daily buckets of every breakdown: per day and dimension value, the sum and non-missing count
+# of each measure plus the row count. Any two periods are compared from these without touching
+# the rows again.
+def daily_buckets(df):
+    days = df['Date'].dt.normalize().rename('Date')
+    buckets = {}
+    for column in COMPARE_DIMENSIONS.values():
+        grouped = df.groupby([days, df[column]], observed=True, dropna=False)
+        sums = grouped[MEASURES].sum().add_suffix('_Sum')
+        counts = grouped[MEASURES].count().add_suffix('_Count')
+        buckets[column] = sums.join(counts).assign(Rows=grouped.size()).reset_index()
+    return buckets
+
+
+# The comparison period for the range start..end (inclusive dates) under an automatic mode
+def prior_period(start, end, mode):
+    start, end = pd.Timestamp(start), pd.Timestamp(end)
+    offset = OFFSETS[mode]
+    if offset is None:
+        length = end - start + pd.Timedelta(days=1)
+        return (start - length).date(), (start - pd.Timedelta(days=1)).date()
+    prior_end = end - offset
+    if end.is_month_end and 'weeks' not in offset.kwds:
+        # A range ending on a month end compares with one ending on a month end, e.g. all of May
+        prior_end += pd.offsets.MonthEnd(0)
+    return (start - offset).date(), prior_end.date()
+
+
+def _kpis(sums):
+    kpis = pd.DataFrame(index=sums.index)
+    for name, (how, measure) in KPIS.items():
+        if how == 'mean':
+            kpis[name] = sums[f'{measure}_Sum'] / sums[f'{measure}_Count']
+        elif how == 'sum':
+            kpis[name] = sums[f'{measure}_Sum']
+        elif how == 'ratio':
+            kpis[name] = 100 * sums[f'{measure[0]}_Sum'] / sums[f'{measure[1]}_Sum']
+        else:
+            kpis[name] = sums['Rows']
+    return kpis
+
+
+# KPIs of both periods, their deltas and percent changes, per value of `by` (or overall when
+# by is None), in long form: one row per value and KPI. Buckets of both periods are stacked
+# and summed in a single group-by; periods may overlap. The overall comparison always has every
+# KPI, missing (NaN) for a period without rows; a value in only one period has a missing Delta.
+def compare(buckets, by, current, prior):
+    dimension = by or next(iter(COMPARE_DIMENSIONS.values()))
+    table = buckets[dimension]
+    stacked = pd.concat([
+        table[table['Date'].between(pd.Timestamp(start), pd.Timestamp(end))].assign(Period=period)
+        for period, (start, end) in (('Current', current), ('Prior', prior))
+    ])
+    keys = [by] if by else []
+    sums = stacked.drop(columns=['Date'] if by else ['Date', dimension]).groupby(
+        ['Period'] + keys, observed=True, dropna=False).sum()
+    kpis = _kpis(sums).reset_index().melt(id_vars=['Period'] + keys, var_name='KPI')
+    result = kpis.pivot_table(index=keys + ['KPI'], columns='Period', values='value', aggfunc='first',
+                              dropna=False, observed=True, sort=False)
+    result = result.reindex(columns=['Current', 'Prior'])
+    if not by:
+        result = result.reindex(pd.Index(list(KPIS), name='KPI'))
+    result.columns.name = None
+    result['Delta'] = result['Current'] - result['Prior']
+    result['Change_%'] = (100 * result['Delta'] / result['Prior'].abs()).replace([np.inf, -np.inf], np.nan)
+    return result.reset_index()
+
+
+# Direction of each compared value's change; values found in only one of the periods are
+# 'New' (no prior rows) or 'Dropped' (no current rows) rather than an increase or decrease
+def direction(deltas):
+    return pd.Series(np.select([deltas['Prior'].isna(), deltas['Current'].isna(), deltas['Delta'].ge(0)],
+                               ['New', 'Dropped', 'Increase'], 'Decrease'), index=deltas.index)
@@ -0,0 +1,137 @@
+import hashlib
+import json
+import os
+import pickle
+import sqlite3
+import time
+
+# Cache location and size budget; shared by every server process on the host
+CACHE_DIR = os.environ.get('LABOUR_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'labour_productivity'))
+CACHE_MAX_BYTES = int(os.environ.get('LABOUR_CACHE_MAX_MB', '1024')) * 1024 * 1024
+
+# Bump when the layout of cached values changes
+SCHEMA_VERSION = 1
+
+# Sources whose changes invalidate cached results
+CODE_FILES = ['analytics.py', 'labour.py', 'rolling.py', 'scenarios.py', 'changepoints.py', 'forecasting.py', 'hierarchy.py', 'ingest.py', 'comparison.py', 'validation.py', 'anomalies.py', 'drivers.py']
+
+
+# Hash of the code that produces cached values, so a deploy never serves stale results
+def code_version(paths=None):
+    digest = hashlib.sha256(str(SCHEMA_VERSION).encode())
+    here = os.path.dirname(os.path.abspath(__file__))
+    for name in paths or CODE_FILES:
+        try:
+            with open(os.path.join(here, name), 'rb') as f:
+                digest.update(f.read())
+        except FileNotFoundError:
+            digest.update(name.encode())
+    return digest.hexdigest()[:16]
+
+
+# Content hash of a dataset file or an uploaded file's bytes
+def content_hash(source):
+    digest = hashlib.sha256()
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        digest.update(source)
+    else:
+        with open(source, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+# Stable key for any JSON-like description of a cached value
+def make_key(*parts):
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class DiskCache:
+    # SQLite in WAL mode gives atomic writes and safe concurrent access from several processes;
+    # entries are evicted least-recently-used first once the total size passes max_bytes
+    def __init__(self, directory=CACHE_DIR, max_bytes=CACHE_MAX_BYTES):
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, 'cache.sqlite')
+        self.max_bytes = max_bytes
+        self.version = code_version()
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS entries ('
+                'key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL, '
+                'created REAL NOT NULL, accessed REAL NOT NULL)'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)')
+
+    # One short-lived connection per call keeps the cache usable from any thread
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30, isolation_level=None)
+
+    def _key(self, parts):
+        return make_key(self.version, *parts)
+
+    def get(self, *parts, default=None):
+        key = self._key(parts)
+        conn = self._connect()
+        try:
+            row = conn.execute('SELECT value FROM entries WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                return default
+            conn.execute('UPDATE entries SET accessed = ? WHERE key = ?', (time.time(), key))
+        finally:
+            conn.close()
+        return pickle.loads(row[0])
+
+    def put(self, value, *parts):
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(blob) > self.max_bytes:
+            return value
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.execute('INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)',
+                         (self._key(parts), blob, len(blob), now, now))
+            self._evict(conn)
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+        return value
+
+    # Return the cached value, computing and storing it on a miss
+    def get_or_compute(self, compute, *parts):
+        missing = object()
+        value = self.get(*parts, default=missing)
+        if value is missing:
+            value = self.put(compute(), *parts)
+        return value
+
+    def _evict(self, conn):
+        total = conn.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        stale = []
+        for key, size in conn.execute('SELECT key, size FROM entries ORDER BY accessed'):
+            stale.append((key,))
+            total -= size
+            if total <= self.max_bytes:
+                break
+        conn.executemany('DELETE FROM entries WHERE key = ?', stale)
+
+    def stats(self):
+        conn = self._connect()
+        try:
+            entries, size = conn.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries').fetchone()
+        finally:
+            conn.close()
+        return {'entries': entries, 'bytes': size, 'max_bytes': self.max_bytes, 'code_version': self.version}
+
+    def clear(self):
+        conn = self._connect()
+        try:
+            conn.execute('DELETE FROM entries')
+        finally:
+            conn.close()
@@ -0,0 +1,253 @@
+import math
+
+import numpy as np
+import pandas as pd
+
+# Dimensions compared as drivers of an outcome
+DRIVER_DIMENSIONS = ['Shift', 'Department', 'Manager', 'Factory_Unit', 'Machine_Unit', 'Product_Type']
+# Outcome the driver analysis opens on, and the significance level of the pairwise tests
+DRIVER_OUTCOME = 'Productivity'
+ALPHA = 0.05
+
+# Continued fractions and series below stop once every element has converged
+MAX_ITERATIONS = 100_000
+EPSILON = 1e-15
+TINY = 1e-300
+
+_lgamma = np.frompyfunc(math.lgamma, 1, 1)
+_erfc = np.frompyfunc(math.erfc, 1, 1)
+
+
+def _log_gamma(x):
+    return _lgamma(np.asarray(x, dtype=float)).astype(float)
+
+
+def _nonzero(values):
+    return np.where(np.abs(values) < TINY, TINY, values)
+
+
+# Continued fraction of the incomplete beta function (modified Lentz), for arrays of arguments
+def _beta_fraction(a, b, x):
+    c = np.ones_like(x)
+    d = 1 / _nonzero(1 - (a + b) * x / (a + 1))
+    h = d.copy()
+    for m in range(1, MAX_ITERATIONS + 1):
+        numerator = m * (b - m) * x / ((a - 1 + 2 * m) * (a + 2 * m))
+        d = 1 / _nonzero(1 + numerator * d)
+        c = _nonzero(1 + numerator / c)
+        h *= d * c
+        numerator = -(a + m) * (a + b + m) * x / ((a + 2 * m) * (a + 1 + 2 * m))
+        d = 1 / _nonzero(1 + numerator * d)
+        c = _nonzero(1 + numerator / c)
+        step = d * c
+        h *= step
+        if np.all(np.abs(step - 1) < EPSILON):
+            break
+    return h
+
+
+# Regularised incomplete beta function I_x(a, b); NaN unless a and b are positive
+def beta_inc(a, b, x):
+    a, b, x = (np.asarray(v, dtype=float) for v in np.broadcast_arrays(a, b, x))
+    result = np.where(x <= 0, 0.0, 1.0)
+    defined = np.isfinite(a) & np.isfinite(b) & (a > 0) & (b > 0) & ~np.isnan(x)
+    inside = defined & (x > 0) & (x < 1)
+    result[~defined] = np.nan
+    if inside.any():
+        a, b, x = a[inside], b[inside], x[inside]
+        front = np.exp(_log_gamma(a + b) - _log_gamma(a) - _log_gamma(b) + a * np.log(x) + b * np.log1p(-x))
+        # The fraction converges fast below (a + 1) / (a + b + 2); above it, use I_x(a, b) = 1 - I_1-x(b, a)
+        swap = x > (a + 1) / (a + b + 2)
+        value = np.empty_like(x)
+        value[~swap] = front[~swap] * _beta_fraction(a[~swap], b[~swap], x[~swap]) / a[~swap]
+        value[swap] = 1 - front[swap] * _beta_fraction(b[swap], a[swap], 1 - x[swap]) / b[swap]
+        result[inside] = value
+    return result
+
+
+# Regularised upper incomplete gamma function Q(a, x): a series below x = a + 1, a continued
+# fraction above; NaN unless a is positive
+def gamma_inc_upper(a, x):
+    a, x = (np.asarray(v, dtype=float) for v in np.broadcast_arrays(a, x))
+    defined = np.isfinite(a) & (a > 0) & ~np.isnan(x)
+    result = np.where(defined & (x <= 0), 1.0, np.nan)
+    series = defined & (x > 0) & (x < a + 1)
+    fraction = defined & (x > 0) & (x >= a + 1)
+    if series.any():
+        sa, sx = a[series], x[series]
+        term = total = 1 / sa
+        for n in range(1, MAX_ITERATIONS + 1):
+            term = term * sx / (sa + n)
+            total = total + term
+            if np.all(np.abs(term) < np.abs(total) * EPSILON):
+                break
+        result[series] = 1 - total * np.exp(-sx + sa * np.log(sx) - _log_gamma(sa))
+    if fraction.any():
+        fa, fx = a[fraction], x[fraction]
+        b = fx + 1 - fa
+        c = np.full_like(fx, 1 / TINY)
+        d = 1 / b
+        h = d.copy()
+        for n in range(1, MAX_ITERATIONS + 1):
+            numerator = -n * (n - fa)
+            b = b + 2
+            d = 1 / _nonzero(numerator * d + b)
+            c = _nonzero(b + numerator / c)
+            step = d * c
+            h *= step
+            if np.all(np.abs(step - 1) < EPSILON):
+                break
+        result[fraction] = np.exp(-fx + fa * np.log(fx) - _log_gamma(fa)) * h
+    return result
+
+
+# Upper tail probabilities of the F and chi-square distributions, and two-sided ones of Student's
+# t and the standard normal
+def f_sf(f, df1, df2):
+    f, df1, df2 = np.broadcast_arrays(np.asarray(f, dtype=float), df1, df2)
+    return beta_inc(df2 / 2, df1 / 2, df2 / (df2 + df1 * f))
+
+
+def chi2_sf(statistic, df):
+    return gamma_inc_upper(np.asarray(df, dtype=float) / 2, np.asarray(statistic, dtype=float) / 2)
+
+
+def t_two_sided(t, df):
+    t, df = np.broadcast_arrays(np.asarray(t, dtype=float), np.asarray(df, dtype=float))
+    return beta_inc(df / 2, 0.5, df / (df + t ** 2))
+
+
+def z_two_sided(z):
+    return _erfc(np.abs(np.asarray(z, dtype=float)) / math.sqrt(2)).astype(float)
+
+
+# Holm step-down adjustment of the p-values of one family of tests
+def holm(p_values):
+    p = np.asarray(p_values, dtype=float)
+    order = np.argsort(p)
+    adjusted = np.minimum(1, np.maximum.accumulate(p[order] * (len(p) - np.arange(len(p)))))
+    result = np.empty_like(p)
+    result[order] = adjusted
+    return result
+
+
+# Per-group sufficient statistics of every dimension in one batched pass: the group codes of all
+# dimensions are offset into one range, so a single bincount per statistic covers them all.
+# Returns the groups (dimension, label) and their count, sum, sum of squares and rank sum.
+def group_statistics(y, ranks, groups):
+    codes, labels, offsets = [], [], [0]
+    for column, values in groups.items():
+        column_codes, uniques = pd.factorize(values)
+        codes.append(column_codes + offsets[-1])
+        labels.extend((column, label) for label in uniques)
+        offsets.append(offsets[-1] + len(uniques))
+    codes = np.concatenate(codes)
+    size = offsets[-1]
+    repeat = len(groups)
+    stats = pd.DataFrame({
+        'Dimension': [column for column, _ in labels],
+        'Group': [label for _, label in labels],
+        'n': np.bincount(codes, minlength=size).astype(float),
+        'sum': np.bincount(codes, weights=np.tile(y, repeat), minlength=size),
+        'sum_sq': np.bincount(codes, weights=np.tile(y * y, repeat), minlength=size),
+        'rank_sum': np.bincount(codes, weights=np.tile(ranks, repeat), minlength=size)
+    })
+    return stats, np.array(offsets)
+
+
+# Pairwise post-hoc tests of every dimension: Welch's t on the means and Dunn's z on the mean
+# ranks, Holm-adjusted within each dimension, with Hedges' g as the effect size
+def _pairs(stats, offsets, n_total, tie_sum):
+    firsts, seconds = [], []
+    for start, stop in zip(offsets[:-1], offsets[1:]):
+        i, j = np.triu_indices(stop - start, 1)
+        firsts.append(i + start)
+        seconds.append(j + start)
+    i, j = np.concatenate(firsts), np.concatenate(seconds)
+    n, mean = stats['n'].to_numpy(), (stats['sum'] / stats['n']).to_numpy()
+    var = ((stats['sum_sq'] - stats['sum'] ** 2 / stats['n']) / (stats['n'] - 1)).clip(lower=0).to_numpy()
+    mean_rank = (stats['rank_sum'] / stats['n']).to_numpy()
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        se2_i, se2_j = var[i] / n[i], var[j] / n[j]
+        welch_t = (mean[i] - mean[j]) / np.sqrt(se2_i + se2_j)
+        welch_df = (se2_i + se2_j) ** 2 / (se2_i ** 2 / (n[i] - 1) + se2_j ** 2 / (n[j] - 1))
+        pooled = np.sqrt(((n[i] - 1) * var[i] + (n[j] - 1) * var[j]) / (n[i] + n[j] - 2))
+        hedges_g = (mean[i] - mean[j]) / pooled * (1 - 3 / (4 * (n[i] + n[j]) - 9))
+        rank_var = n_total * (n_total + 1) / 12 - tie_sum / (12 * (n_total - 1))
+        dunn_z = (mean_rank[i] - mean_rank[j]) / np.sqrt(rank_var * (1 / n[i] + 1 / n[j]))
+    pairs = pd.DataFrame({
+        'Dimension': stats['Dimension'].to_numpy()[i],
+        'Group_A': stats['Group'].to_numpy()[i], 'Group_B': stats['Group'].to_numpy()[j],
+        'Mean_A': mean[i], 'Mean_B': mean[j], 'Difference': mean[i] - mean[j], 'Hedges_g': hedges_g,
+        'Welch_t': welch_t, 'Welch_p': t_two_sided(welch_t, welch_df),
+        'Dunn_z': dunn_z, 'Dunn_p': z_two_sided(dunn_z)
+    })
+    for test in ('Welch_p', 'Dunn_p'):
+        pairs[f'{test}_Holm'] = pairs.groupby('Dimension', sort=False)[test].transform(
+            lambda p: holm(p.fillna(1)))
+    return pairs
+
+
+# Driver analysis of one outcome across every dimension at once: one-way ANOVA (F, eta and omega
+# squared) and Kruskal-Wallis (H with tie correction, epsilon squared) from per-group sufficient
+# statistics and a single ranking of the outcome, plus pairwise post-hoc tests. Returns the
+# dimensions ranked by omega squared, and the pairs.
+def driver_analysis(df, outcome=DRIVER_OUTCOME, dimensions=None):
+    columns = list(dimensions or DRIVER_DIMENSIONS)
+    rows = df[[outcome] + columns].dropna()
+    y = rows[outcome].to_numpy(dtype=float)
+    n_total = np.float64(len(y))
+    ranks = rows[outcome].rank(method='average').to_numpy()
+    _, ties = np.unique(y, return_counts=True)
+    tie_sum = float(np.sum(ties.astype(float) ** 3 - ties))
+
+    stats, offsets = group_statistics(y, ranks, {column: rows[column] for column in columns})
+    k = np.diff(offsets)
+    # Sums over the groups of each dimension
+    dimension_of_group = np.repeat(np.arange(len(columns)), k)
+
+    def per_dimension(values):
+        return np.bincount(dimension_of_group, weights=values.to_numpy(), minlength=len(columns))
+
+    k = k.astype(float)
+    grand_mean = y.mean() if n_total else np.nan
+    mean = stats['sum'] / stats['n']
+    with np.errstate(divide='ignore', invalid='ignore'):
+        between = per_dimension(stats['n'] * (mean - grand_mean) ** 2)
+        within = per_dimension(stats['sum_sq'] - stats['sum'] * mean)
+        df_between, df_within = k - 1, n_total - k
+        mean_within = within / df_within
+        f = (between / df_between) / mean_within
+        total = between + within
+        kruskal = 12 / (n_total * (n_total + 1)) * per_dimension(stats['rank_sum'] ** 2 / stats['n']) - 3 * (n_total + 1)
+        kruskal /= 1 - tie_sum / (n_total ** 3 - n_total)
+        ranking = pd.DataFrame({
+            'Dimension': columns,
+            'Groups': k.astype(int),
+            'Rows': len(y),
+            'F': f,
+            'ANOVA_p': np.nan,
+            'Eta_Squared': between / total,
+            'Omega_Squared': (between - df_between * mean_within) / (total + mean_within),
+            'H': kruskal,
+            'Kruskal_p': np.nan,
+            'Epsilon_Squared': kruskal / (n_total - 1)
+        })
+    # A dimension with one group in view (or no residual degrees of freedom) has nothing to test
+    untestable = (df_between < 1) | (df_within < 1)
+    ranking.loc[untestable, ['F', 'Eta_Squared', 'Omega_Squared', 'H', 'Epsilon_Squared']] = np.nan
+    testable = ~untestable
+    ranking.loc[testable, 'ANOVA_p'] = f_sf(f[testable], df_between[testable], df_within[testable])
+    ranking.loc[testable, 'Kruskal_p'] = chi2_sf(kruskal[testable], df_between[testable])
+
+    pairs = _pairs(stats, offsets, n_total, tie_sum)
+    significant = pairs[pairs['Welch_p_Holm'] < ALPHA].groupby('Dimension').size()
+    best = stats.assign(Mean=mean).sort_values('Mean').groupby('Dimension', sort=False)
+    ranking['Significant_Pairs'] = ranking['Dimension'].map(significant).fillna(0).astype(int)
+    ranking['Best_Group'] = ranking['Dimension'].map(best['Group'].last())
+    ranking['Worst_Group'] = ranking['Dimension'].map(best['Group'].first())
+    ranking['Spread'] = ranking['Dimension'].map(best['Mean'].last() - best['Mean'].first())
+    ranking = ranking.sort_values('Omega_Squared', ascending=False, na_position='last').reset_index(drop=True)
+    ranking.insert(0, 'Rank', np.arange(1, len(ranking) + 1))
+    return {'ranking': ranking, 'pairs': pairs}
@@ -0,0 +1,162 @@
+import datetime
+import io
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+# Formats rows and tables export to: MIME type and file extension
+FORMATS = {
+    'csv': ('text/csv', '.csv'),
+    'parquet': ('application/vnd.apache.parquet', '.parquet'),
+    'xlsx': ('application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', '.xlsx')
+}
+# Rows encoded at a time; bounds the memory an export needs beyond the rows it reads
+CHUNK_ROWS = 100_000
+# Rows per worksheet; longer exports continue on further sheets
+XLSX_SHEET_ROWS = 1_048_575
+# In-memory size of a spooled export before it moves to a temporary file
+SPOOL_BYTES = 16 * 1024 * 1024
+BLOCK_BYTES = 1024 * 1024
+# Largest file a download button builds in memory; larger exports go through the API, which streams
+DOWNLOAD_MAX_BYTES = int(os.environ.get('LABOUR_DOWNLOAD_MAX_MB', '256')) * 1024 * 1024
+# Rows whose in-memory size stands for every row in estimate_bytes
+ESTIMATE_ROWS = 1000
+
+
+class ExportTooLarge(ValueError):
+    pass
+
+
+# Slices of at most chunk_rows rows, in order: of the rows at `positions` when given (e.g. the
+# positions a filter or the filter index resolved), of the whole table otherwise. Only one slice
+# is materialised at a time.
+def row_chunks(data, positions=None, chunk_rows=CHUNK_ROWS):
+    total = len(data) if positions is None else len(positions)
+    if total == 0:
+        yield data.iloc[:0]
+    for start in range(0, total, chunk_rows):
+        if positions is None:
+            yield data.iloc[start:start + chunk_rows]
+        else:
+            yield data.iloc[positions[start:start + chunk_rows]]
+
+
+# Rough size of an export of `rows` rows of data: the in-memory size of its first rows, scaled up.
+# Encoded files are usually within a small factor of it, so it can refuse a download up front.
+def estimate_bytes(data, rows):
+    sample = data.iloc[:ESTIMATE_ROWS]
+    if rows == 0 or sample.empty:
+        return 0
+    return int(sample.memory_usage(index=False, deep=True).sum() / len(sample) * rows)
+
+
+def file_name(stem, fmt):
+    return f"{stem}{FORMATS[fmt][1]}"
+
+
+# Bytes written by an encoder, handed out after every chunk instead of kept
+class _Drain(io.RawIOBase):
+    def __init__(self):
+        self.parts = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        return len(data)
+
+    def take(self):
+        data, self.parts = b''.join(self.parts), []
+        return data
+
+
+def _csv_blocks(chunks):
+    for i, chunk in enumerate(chunks):
+        yield chunk.to_csv(index=False, header=i == 0).encode()
+
+
+# Text columns as Arrow strings, so every chunk has the schema of the first even when a chunk
+# holds no text values in a column
+def _arrow_ready(chunk):
+    text = [column for column in chunk.columns if chunk[column].dtype == object]
+    return chunk.astype({column: 'string' for column in text}) if text else chunk
+
+
+def _parquet_blocks(chunks):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    sink, writer = _Drain(), None
+    for chunk in chunks:
+        table = pa.Table.from_pandas(_arrow_ready(chunk), preserve_index=False)
+        if writer is None:
+            writer = pq.ParquetWriter(sink, table.schema)
+        writer.write_table(table.cast(writer.schema))
+        yield sink.take()
+    if writer is not None:
+        writer.close()
+        yield sink.take()
+
+
+def _cell(value):
+    if value is None or value is pd.NaT or (isinstance(value, float) and np.isnan(value)):
+        return None
+    if isinstance(value, pd.Timestamp):
+        return value.to_pydatetime()
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, (str, int, float, bool, datetime.date)):
+        return value
+    return str(value)
+
+
+# A workbook cannot be written piecewise to the client (it is a zip with its directory at the
+# end), so it goes row by row through openpyxl's write-only mode into a spooled temporary file,
+# which is then read back in blocks
+def _xlsx_blocks(chunks):
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet, rows, header = None, 0, None
+    for chunk in chunks:
+        header = [str(column) for column in chunk.columns]
+        for values in chunk.itertuples(index=False, name=None):
+            if sheet is None or rows == XLSX_SHEET_ROWS:
+                sheet = workbook.create_sheet(f"Rows {len(workbook.worksheets) + 1}")
+                sheet.append(header)
+                rows = 0
+            sheet.append([_cell(value) for value in values])
+            rows += 1
+    if sheet is None:
+        workbook.create_sheet("Rows 1").append(header or [])
+    with tempfile.SpooledTemporaryFile(max_size=SPOOL_BYTES) as out:
+        workbook.save(out)
+        out.seek(0)
+        yield from iter(lambda: out.read(BLOCK_BYTES), b'')
+
+
+# The encoded file as a sequence of byte blocks, produced as the chunks are read
+def stream(chunks, fmt):
+    if fmt == 'csv':
+        return _csv_blocks(chunks)
+    if fmt == 'parquet':
+        return _parquet_blocks(chunks)
+    if fmt == 'xlsx':
+        return _xlsx_blocks(chunks)
+    raise ValueError(f"Unknown export format {fmt!r}; expected one of {', '.join(FORMATS)}")
+
+
+# The encoded file in one buffer, for download buttons: Streamlit serves downloads from memory,
+# so the file is held once, encoded, but never as a second copy of the rows. Encoding stops with
+# ExportTooLarge once the file passes max_bytes.
+def to_buffer(chunks, fmt, max_bytes=DOWNLOAD_MAX_BYTES):
+    out = io.BytesIO()
+    for block in stream(chunks, fmt):
+        out.write(block)
+        if out.tell() > max_bytes:
+            raise ExportTooLarge(f"The export is larger than {max_bytes / 1024 / 1024:,.0f} MB; "
+                                 "narrow the filters or export through the API, which streams the file")
+    return out
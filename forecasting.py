@@ -0,0 +1,117 @@
+import numpy as np
+import pandas as pd
+
+SERIES_KEYS = ['Factory_Unit', 'Machine_Unit', 'Shift']
+HORIZON = 8
+MODELS = {"Exponential Smoothing (ETS)": 'ets', "Ridge on Calendar Features": 'ridge'}
+Z_95 = 1.96
+
+
+# Weekly mean productivity as a (series x week) matrix on a regular weekly grid; gaps are NaN
+def weekly_matrix(df):
+    weeks = df['Date'].dt.to_period('W').dt.start_time.rename('Week_Start')
+    table = df.groupby(SERIES_KEYS + [weeks], observed=True)['Productivity'].mean().unstack('Week_Start')
+    grid = pd.date_range(table.columns.min(), table.columns.max(), freq='7D')
+    return table.reindex(columns=grid)
+
+
+# Pooled fallback for series too short to estimate their own noise
+def _fill_sigma(sigma):
+    pooled = np.nanmedian(sigma) if np.isfinite(sigma).any() else 0.0
+    return np.where(np.isfinite(sigma), sigma, pooled)
+
+
+# Simple exponential smoothing (ETS(A,N,N)) for all series at once. One recursion over the
+# weeks updates an (alpha grid x series) array of levels, skipping missing weeks; each series
+# keeps the alpha with the lowest one-step-ahead squared error.
+def fit_ets(Y, horizon, alphas=np.linspace(0.05, 0.95, 19)):
+    series = Y.shape[0]
+    a = alphas[:, None]
+    level = np.full((len(alphas), series), np.nan)
+    sse = np.zeros_like(level)
+    count = np.zeros_like(level)
+    for t in range(Y.shape[1]):
+        y = Y[:, t][None, :]
+        observed = np.isfinite(y)
+        has_level = np.isfinite(level)
+        update = observed & has_level
+        error = np.where(update, y - level, 0.0)
+        sse += error ** 2
+        count += update
+        level = np.where(update, level + a * error, np.where(observed & ~has_level, y, level))
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mse = np.where(count > 0, sse / count, np.inf)
+    best = np.argmin(mse, axis=0)
+    pick = (best, np.arange(series))
+    alpha = alphas[best]
+    sigma = _fill_sigma(np.where(np.isfinite(mse[pick]), np.sqrt(mse[pick]), np.nan))
+    steps = np.arange(1, horizon + 1)
+    mean = np.repeat(level[pick][:, None], horizon, axis=1)
+    half_width = Z_95 * sigma[:, None] * np.sqrt(1 + (steps - 1) * alpha[:, None] ** 2)
+    return mean, half_width
+
+
+# Trend plus yearly Fourier terms of the week of year
+def calendar_features(weeks, origin, scale):
+    t = (weeks - origin).days.to_numpy() / 7 / scale
+    angle = 2 * np.pi * weeks.isocalendar().week.to_numpy(dtype=float) / 52.18
+    return np.column_stack([np.ones(len(weeks)), t, np.sin(angle), np.cos(angle),
+                            np.sin(2 * angle), np.cos(2 * angle)])
+
+
+# Ridge regression on calendar features for all series at once: every series shares the design
+# matrix, so the masked normal equations of all series are built with two einsums and solved
+# as one stacked linear system
+def fit_ridge(Y, weeks, horizon, penalty=1.0):
+    scale = max(1, len(weeks))
+    future = pd.date_range(weeks[-1] + pd.Timedelta(days=7), periods=horizon, freq='7D')
+    X = calendar_features(weeks, weeks[0], scale)
+    X_future = calendar_features(future, weeks[0], scale)
+    mask = np.isfinite(Y).astype(float)
+    values = np.nan_to_num(Y)
+
+    regulariser = penalty * np.eye(X.shape[1])
+    regulariser[0, 0] = 1e-6
+    gram = np.einsum('st,tp,tq->spq', mask, X, X) + regulariser
+    moments = np.einsum('st,tp->sp', values * mask, X)
+    beta = np.linalg.solve(gram, moments[..., None])[..., 0]
+
+    residuals = (values - beta @ X.T) * mask
+    dof = np.maximum(mask.sum(axis=1) - X.shape[1], 1)
+    sigma = _fill_sigma(np.where(mask.sum(axis=1) > 1, np.sqrt((residuals ** 2).sum(axis=1) / dof), np.nan))
+    mean = beta @ X_future.T
+    half_width = np.repeat(Z_95 * sigma[:, None], horizon, axis=1)
+    return mean, half_width
+
+
+# Forecast every (Factory_Unit, Machine_Unit, Shift) weekly productivity series with 95% intervals
+def forecast_series(df, model='ets', horizon=HORIZON):
+    table = weekly_matrix(df)
+    Y = table.to_numpy(dtype=float)
+    weeks = table.columns
+    if model == 'ridge':
+        mean, half_width = fit_ridge(Y, weeks, horizon)
+    else:
+        mean, half_width = fit_ets(Y, horizon)
+
+    future = pd.date_range(weeks[-1] + pd.Timedelta(days=7), periods=horizon, freq='7D')
+    keys = table.index.to_frame(index=False)
+    result = keys.loc[keys.index.repeat(horizon)].reset_index(drop=True)
+    result['Week_Start'] = np.tile(future, len(table))
+    result['Step'] = np.tile(np.arange(1, horizon + 1), len(table))
+    result['Forecast'] = np.clip(mean.ravel(), 0, 100)
+    result['Half_Width'] = half_width.ravel()
+    return result
+
+
+# Combine series forecasts into a forecast of their mean, e.g. per Shift; independent errors
+# add in quadrature
+def combine_forecasts(forecasts, by=()):
+    keys = list(by) + ['Week_Start', 'Step']
+    grouped = forecasts.assign(Variance=(forecasts['Half_Width'] / Z_95) ** 2).groupby(keys, observed=True)
+    combined = grouped.agg(Forecast=('Forecast', 'mean'), Variance=('Variance', 'sum'), Series=('Forecast', 'size'))
+    half_width = Z_95 * np.sqrt(combined['Variance']) / combined['Series']
+    combined['Lower'] = (combined['Forecast'] - half_width).clip(lower=0)
+    combined['Upper'] = (combined['Forecast'] + half_width).clip(upper=100)
+    return combined.drop(columns='Variance').reset_index()
@@ -0,0 +1,63 @@
+import pandas as pd
+
+from analytics import SAMPLE_WEIGHT
+
+# Drill paths (label -> levels, outermost first)
+HIERARCHIES = {
+    'Factory → Machine → Shift': ['Factory_Unit', 'Machine_Unit', 'Shift'],
+    'Department → Manager': ['Department', 'Manager']
+}
+SEPARATOR = ' / '
+# Measures summed at every node; means are derived from the sums and row counts
+SUMMED = ['Productivity', 'Labor_Total_Output', 'Labor_Target_Output']
+
+
+# Sums and row counts of every node of every hierarchy, one row per node with plotly-style
+# id / parent / label columns. Leaves come from a single group-by over the rows; each coarser
+# level is summed from the level below it. Sampled rows count with their SAMPLE_WEIGHT.
+def build_tree(df):
+    weights = df[SAMPLE_WEIGHT] if SAMPLE_WEIGHT in df else pd.Series(1.0, index=df.index)
+    values = df[SUMMED].mul(weights, axis=0).add_suffix('_Sum').assign(Rows=weights)
+    frames = []
+    for name, levels in HIERARCHIES.items():
+        sums = values.join(df[levels]).groupby(levels, observed=True).sum()
+        for depth in range(len(levels), 0, -1):
+            if depth < len(levels):
+                sums = sums.groupby(level=list(range(depth)), observed=True).sum()
+            nodes = sums.reset_index()
+            node_id = nodes[levels[0]].astype(str)
+            parent = pd.Series('', index=nodes.index)
+            for level in levels[1:depth]:
+                parent = node_id
+                node_id = node_id + SEPARATOR + nodes[level].astype(str)
+            nodes.insert(0, 'Hierarchy', name)
+            nodes.insert(1, 'id', node_id)
+            nodes.insert(2, 'parent', parent)
+            nodes.insert(3, 'label', nodes[levels[depth - 1]].astype(str))
+            nodes.insert(4, 'depth', depth)
+            frames.append(nodes)
+
+    tree = pd.concat(frames, ignore_index=True)
+    tree['Productivity'] = tree['Productivity_Sum'] / tree['Rows']
+    tree['Attainment'] = 100 * tree['Labor_Total_Output_Sum'] / tree['Labor_Target_Output_Sum']
+    return tree.sort_values(['Hierarchy', 'depth', 'id'], ignore_index=True)
+
+
+# Nodes of one hierarchy under root (a node id, or None for the top), down to depth levels
+# below it. The root becomes the top of the returned tree so plotly can draw it on its own.
+def visible_nodes(tree, hierarchy, root=None, depth=2):
+    nodes = tree[tree['Hierarchy'] == hierarchy]
+    if root is None:
+        return nodes[nodes['depth'] <= depth]
+    root_depth = root.count(SEPARATOR) + 1
+    inside = (nodes['id'] == root) | nodes['id'].str.startswith(root + SEPARATOR)
+    nodes = nodes[inside & (nodes['depth'] <= root_depth + depth)].copy()
+    nodes.loc[nodes['id'] == root, 'parent'] = ''
+    return nodes
+
+
+# Ids of the nodes that have children, i.e. the places a user can drill into
+def branches(tree, hierarchy):
+    levels = HIERARCHIES[hierarchy]
+    nodes = tree[(tree['Hierarchy'] == hierarchy) & (tree['depth'] < len(levels))]
+    return nodes['id'].tolist()
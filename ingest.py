@@ -0,0 +1,90 @@
+import concurrent.futures
+import io
+import multiprocessing
+import os
+
+import pandas as pd
+
+import validation
+from analytics import partition_table
+
+# Default workbook; LABOUR_DATA_PATH points headless runs and servers at another copy
+DEFAULT_DATA_PATH = os.environ.get(
+    'LABOUR_DATA_PATH',
+    r'C:\Users\Extreme\OneDrive\Desktop\streamlit  dashboards\labour productivity\Labor_Productivity_Analytics_Dataset.xlsx'
+)
+
+# Provenance of every row: the file it came from, plus the worksheet for workbooks
+SOURCE_COLUMN = 'Source_File'
+SUPPORTED_TYPES = ('.xlsx', '.csv')
+
+
+def _open(payload):
+    return io.BytesIO(payload) if isinstance(payload, (bytes, bytearray, memoryview)) else payload
+
+
+# One parse task per CSV file and per worksheet of every workbook. Sources are paths or
+# (name, bytes) pairs; sheet_name picks a single worksheet instead of all of them.
+def plan(sources, sheet_name=None):
+    tasks = []
+    for source in sources:
+        name, payload = (os.path.basename(source), source) if isinstance(source, str) else source
+        if name.lower().endswith('.csv'):
+            tasks.append((name, payload, None))
+        elif name.lower().endswith('.xlsx'):
+            sheets = [sheet_name] if sheet_name else pd.ExcelFile(_open(payload), engine='openpyxl').sheet_names
+            tasks.extend((name, payload, sheet) for sheet in sheets)
+        else:
+            raise ValueError(f"Unsupported file type: {name}")
+    return tasks
+
+
+# Parse one task and validate it in the worker: trimmed headers, then the schema and every row.
+# Returns the clean rows (dates parsed, measures numeric) and the quarantined ones.
+def _read_part(task):
+    name, payload, sheet = task
+    if sheet is None:
+        df = pd.read_csv(_open(payload))
+    else:
+        df = pd.read_excel(_open(payload), sheet_name=sheet, engine='openpyxl')
+        name = f"{name} [{sheet}]"
+    df.columns = df.columns.astype(str).str.strip()
+    validation.check_columns(df, name)
+    df, quarantine = validation.validate(df)
+    df[SOURCE_COLUMN] = name
+    quarantine.insert(0, SOURCE_COLUMN, name)
+    return df, quarantine
+
+
+# Stack parts on one schema: the union of their columns in first-seen order, source last
+def align(frames):
+    columns = list(dict.fromkeys(c for frame in frames for c in frame.columns if c != SOURCE_COLUMN))
+    columns.append(SOURCE_COLUMN)
+    return pd.concat([frame.reindex(columns=columns) for frame in frames if len(frame)] or
+                     [pd.DataFrame(columns=columns)], ignore_index=True)
+
+
+# Parse and validate every file and worksheet concurrently and stack them into one table, plus
+# one table of quarantined rows. With more than one part the work runs in a process pool, so
+# ingestion takes about as long as the largest part. Raises validation.SchemaError when a part
+# lacks expected columns.
+def ingest(sources, sheet_name=None, workers=None):
+    tasks = plan(sources, sheet_name)
+    workers = min(len(tasks), workers or os.cpu_count() or 1)
+    if workers > 1:
+        # spawn, not fork: the caller is usually a multi-threaded server
+        with concurrent.futures.ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+            parts = list(pool.map(_read_part, tasks))
+    else:
+        parts = [_read_part(task) for task in tasks]
+    quarantine = pd.concat([part[1] for part in parts], ignore_index=True)
+    return align([part[0] for part in parts]), quarantine
+
+
+# Ingest sources into what the dashboard keeps: partitioned rows, their partition table and the
+# quarantined rows
+def load_dataset(sources, sheet_name=None, workers=None):
+    data, quarantine = ingest(sources, sheet_name, workers)
+    data, partitions = partition_table(data)
+    return data, partitions, quarantine
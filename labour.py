@@ -1,57 +1,558 @@
 
+import startup
+run_profile = startup.RunProfile()
+import collections
+import concurrent.futures
+import functools
+import inspect
+import threading
 import streamlit as st
 import pandas as pd
-import plotly.express as px
 import plotly.graph_objects as go
-# Function to load default data
+import analytics
+import anomalies
+import changepoints
+import comparison
+import disk_cache
+import drivers
+import export
+import forecasting
+import hierarchy
+import ingest
+import payload
+import presets
+import rolling
+import scenarios
+import shared_store
+import tenants
+import validation
+# Plotly Express loads on the first chart, not at startup (Streamlit itself already imports
+# plotly.graph_objects); spreadsheets pull in openpyxl only when read
+px = startup.LazyModule('plotly.express')
+run_profile.mark('imports')
+
+# Plants this instance serves, each with its own dataset, shared store, disk cache and memory quota
+@st.cache_resource
+def plants():
+    return tenants.load_plants()
+
+# On-disk result cache of a plant, shared by every server process; survives restarts and deploys
+@st.cache_resource
+def result_cache(plant=tenants.DEFAULT_PLANT):
+    settings = plants()[plant]
+    return disk_cache.DiskCache(settings['cache_dir'], settings['disk_bytes'])
+
+# The disk cache of the plant a data key belongs to
+def plant_cache(data_key):
+    return result_cache(tenants.tenant_of(data_key))
+
+# Process-wide memory of every plant's datasets, indexes and results, each plant within its quota
+@st.cache_resource
+def memory_cache():
+    return tenants.TenantCache({name: settings['quota_bytes'] for name, settings in plants().items()},
+                               tenants.MEMORY_BUDGET_BYTES)
+
+# Decorator caching a function in its plant's share of memory_cache. Like st.cache_data, arguments
+# starting with '_' are not part of the key; the plant is read off the first argument named
+# *_key. DataFrames come back as shallow copies, so callers may add columns.
+def tenant_cached(spinner=None):
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            keyed = {name: value for name, value in bound.arguments.items() if not name.startswith('_')}
+            tenant = tenants.tenant_of(next(value for name, value in keyed.items() if name.endswith('key')))
+
+            def compute():
+                if spinner is None:
+                    return func(*args, **kwargs)
+                with st.spinner(spinner):
+                    return func(*args, **kwargs)
+            value = memory_cache().get_or_compute(tenant, disk_cache.make_key(func.__name__, keyed), compute)
+            # Cached frames are shared by every session and the warmers; callers get shallow copies,
+            # also of the frames inside tuples such as (data, partitions, quarantine)
+            if isinstance(value, tuple):
+                return tuple(item.copy(deep=False) if isinstance(item, pd.DataFrame) else item for item in value)
+            return value.copy(deep=False) if isinstance(value, pd.DataFrame) else value
+        return wrapper
+    return decorator
+
+# Content hash of a workbook, so cached results follow the data rather than the path
 @st.cache_data
-def load_default_data():
-    return pd.read_excel(
-        r'C:\Users\Extreme\OneDrive\Desktop\streamlit  dashboards\labour productivity\Labor_Productivity_Analytics_Dataset.xlsx',
-        sheet_name='Sheet1',
-        engine='openpyxl'
-    )
-
-# Function to load uploaded files (supports Excel and CSV)
-def load_uploaded_file(uploaded_file):
+def default_data_hash(data_path):
+    return disk_cache.content_hash(data_path)
+
+# Function to load a plant's default data (every sheet of the workbook), as partitioned rows, their
+# partition table and the rows validation quarantined
+@tenant_cached()
+def load_default_data(data_key, data_path):
+    return plant_cache(data_key).get_or_compute(
+        lambda: ingest.load_dataset([data_path]), 'dataset', default_data_hash(data_path))
+
+# Function to attach the dataset published by a plant's loader process (one copy per host)
+@tenant_cached()
+def attach_shared_data(data_key, version, store_root):
+    tables = shared_store.attach(version, store_root)
+    return tables['data'], tables.get('partitions'), tables.get('quarantine')
+
+# Function returning the sidebar metadata of a dataset. It lives in the disk cache next to the
+# dataset, so a cold server draws the sidebar before loading any rows; None until first computed.
+@st.cache_resource
+def dataset_metadata_store():
+    return {}
+
+def dataset_metadata(data_key, data=None):
+    store = dataset_metadata_store()
+    if data_key not in store:
+        metadata = plant_cache(data_key).get('metadata', data_key)
+        if metadata is None and data is not None:
+            metadata = plant_cache(data_key).put(analytics.dataset_metadata(data), 'metadata', data_key)
+        if metadata is None:
+            return None
+        store[data_key] = metadata
+    return store[data_key]
+
+# Function to load uploaded files (supports Excel and CSV). Every file and worksheet is parsed and
+# validated concurrently and stacked with a Source_File column; rows failing validation are
+# quarantined rather than loaded, and only validated uploads are kept in the disk cache.
+@tenant_cached()
+def uploaded_dataset(_uploaded_files, data_key, upload_hash):
+    return plant_cache(data_key).get_or_compute(
+        lambda: ingest.load_dataset([(f.name, f.getvalue()) for f in _uploaded_files]), 'dataset', upload_hash)
+
+def load_uploaded_files(uploaded_files, data_key, upload_hash):
+    if not all(f.name.endswith(ingest.SUPPORTED_TYPES) for f in uploaded_files):
+        st.sidebar.error("Unsupported file type! Please upload Excel or CSV files.")
+        st.stop()
     try:
-        if uploaded_file.name.endswith('.xlsx'):
-            return pd.read_excel(uploaded_file, engine='openpyxl')
-        elif uploaded_file.name.endswith('.csv'):
-            return pd.read_csv(uploaded_file)
-        else:
-            st.sidebar.error("Unsupported file type! Please upload an Excel or CSV file.")
-            st.stop()
+        return uploaded_dataset(uploaded_files, data_key, upload_hash)
+    except validation.SchemaError as e:
+        st.sidebar.error(f"Upload rejected: {e}")
+        st.stop()
     except Exception as e:
         st.sidebar.error(f"Error loading file: {e}")
         st.stop()
 
+# Function to build the anomaly event index of a dataset when it is loaded: only the rows with an
+# Anomaly_Conduct, and their counts by type, day, Shift, Department and Factory_Unit
+@tenant_cached()
+def anomaly_index(_data, data_key):
+    return plant_cache(data_key).get_or_compute(lambda: anomalies.build_index(_data), 'anomaly_index', data_key)
+
+# Function to apply the sidebar filters, cached per dataset and filter state so every
+# page (and every headless report page) reuses the same filtered rows. The partition table loaded
+# with the dataset (None for other frames) lets the filter skip row ranges that cannot match;
+# the whole dataset is still loaded and held in memory.
+@tenant_cached()
+def filter_data(_data, _partitions, data_key, filters):
+    return analytics.apply_filters(_data, filters, _partitions)
+
+# Function to index the filtered rows by every filter column value, once per filter state.
+# The index is read-only and shared by every session of the plant.
+@tenant_cached()
+def filter_index(_filtered, data_key, filters):
+    return analytics.build_filter_index(_filtered)
+
+# Function narrowing the filtered rows to the page's chart selections through the filter index
+def select_rows(filtered, data_key, filters, selection):
+    return filtered.iloc[analytics.select_positions(filter_index(filtered, data_key, filters), selection)]
+
+# Function to roll rows up into the daily buckets period comparisons are cut from; keyed by the
+# filters with the date range left out, so comparing other periods reuses the same buckets
+@tenant_cached()
+def period_buckets(_rows, data_key, filters):
+    return plant_cache(data_key).get_or_compute(
+        lambda: comparison.daily_buckets(_rows), 'period_buckets', data_key, filters)
+
+# Function to compute one aggregate table of the filtered rows, cached per dataset and filter state
+@tenant_cached()
+def aggregate(_filtered, data_key, filters, by, values=None, how='mean'):
+    return plant_cache(data_key).get_or_compute(
+        lambda: analytics.group_aggregate(_filtered, by, values, how),
+        'aggregate', data_key, filters, by, values, how
+    )
+
+# Function to build the pivot explorer's cube once per dataset and filter state
+@tenant_cached()
+def pivot_cube(_filtered, data_key, filters):
+    return plant_cache(data_key).get_or_compute(lambda: analytics.build_cube(_filtered), 'cube', data_key, filters)
+
+# Function to rank the dimensions driving one outcome, with their pairwise tests, per filter state
+@tenant_cached()
+def driver_table(_filtered, data_key, filters, outcome):
+    return plant_cache(data_key).get_or_compute(
+        lambda: drivers.driver_analysis(_filtered, outcome), 'drivers', data_key, filters, outcome)
+
+# Function to build the Factory/Machine/Shift and Department/Manager rollup trees once per filter state
+@tenant_cached()
+def hierarchy_tree(_filtered, data_key, filters):
+    return plant_cache(data_key).get_or_compute(
+        lambda: hierarchy.build_tree(_filtered), 'hierarchy', data_key, filters)
+
+# Function to compute the rolling KPIs of every group of one dimension, cached per filter state
+@tenant_cached()
+def rolling_table(_filtered, data_key, filters, group):
+    return plant_cache(data_key).get_or_compute(
+        lambda: rolling.rolling_kpis(_filtered, group), 'rolling', data_key, filters, group)
+
+# Function to evaluate a grid of what-if threshold scenarios, cached per filter state and grid
+@tenant_cached()
+def scenario_results(_filtered, data_key, filters, target_scales, green, yellow, presence_min):
+    grid = scenarios.scenario_grid(target_scales, green, yellow, presence_min)
+    return plant_cache(data_key).get_or_compute(
+        lambda: scenarios.evaluate_scenarios(_filtered, grid),
+        'scenarios', data_key, filters, target_scales, green, yellow, presence_min
+    )
+
+# Function to detect productivity level shifts per (Machine_Unit, Shift), once per dataset version
+@tenant_cached(spinner="Detecting productivity level shifts...")
+def productivity_changepoints(_data, data_key):
+    return plant_cache(data_key).get_or_compute(
+        lambda: changepoints.detect_changepoints(_data), 'changepoints', data_key)
+
+# Function to forecast every (Factory_Unit, Machine_Unit, Shift) weekly series, once per dataset version and model
+@tenant_cached(spinner="Forecasting productivity...")
+def productivity_forecasts(_data, data_key, model):
+    return plant_cache(data_key).get_or_compute(
+        lambda: forecasting.forecast_series(_data, model), 'forecasts', data_key, model, forecasting.HORIZON)
+
+# Function to fetch every aggregate table a page draws from
+def page_tables(page, filtered, data_key, filters):
+    return {
+        name: aggregate(filtered, data_key, filters, *spec)
+        for name, spec in analytics.PAGE_AGGREGATES.get(page, {}).items()
+    }
+
+# Function to draw the stratified sample behind approximate mode, once per dataset and budget
+@tenant_cached()
+def sample_data(_data, data_key, budget):
+    return analytics.stratified_sample(_data, budget)
+
+# Function to estimate one aggregate table (with confidence intervals) from the filtered sample
+@tenant_cached()
+def estimate(_sample, sample_key, filters, by, values=None, how='mean'):
+    return analytics.estimate_aggregate(_sample, by, values, how)
+
+# Function to estimate every aggregate table a page draws from
+def estimated_page_tables(page, sample, sample_key, filters):
+    return {
+        name: estimate(sample, sample_key, filters, *spec)
+        for name, spec in analytics.PAGE_AGGREGATES.get(page, {}).items()
+    }
+
+# Function returning the confidence-interval column of an estimated table, if it has one
+def ci_column(table, column):
+    name = f'{column}_ci'
+    return name if name in table.columns else None
+
+# Chart selections per page, as {chart key: {column: values}}; they outlive the chart widgets,
+# whose own state resets whenever the narrowed data changes the figure
+def chart_selections(page):
+    return st.session_state.setdefault('chart_selections', {}).setdefault(page, {})
+
+# Callback storing a chart's new selection, reading dataset values from the given point fields
+def store_chart_selection(page, key, fields):
+    selected = {}
+    for point in st.session_state[key]['selection']['points']:
+        for field, column in fields.items():
+            value = point.get(field)
+            if value not in (None, ''):
+                selected.setdefault(column, set()).add(value)
+    if selected:
+        chart_selections(page)[key] = {column: sorted(values) for column, values in selected.items()}
+    else:
+        chart_selections(page).pop(key, None)
+
+# Function merging a page's chart selections: values of one column across charts must all hold
+def page_selection(page):
+    merged = {}
+    for selection in chart_selections(page).values():
+        for column, values in selection.items():
+            merged[column] = sorted(set(merged[column]) & set(values)) if column in merged else values
+    return dict(sorted(merged.items()))
+
+def clear_chart_selections(page):
+    chart_selections(page).clear()
+
+# Function drawing a chart whose clicked or box/lasso-selected points narrow every chart on the page.
+# fields maps plotly point fields ('x', 'legendgroup', ...) to the dataset columns they carry.
+def selectable_chart(fig, page, name, fields, **kwargs):
+    key = f"chart_selection:{page}:{name}"
+    st.plotly_chart(fig, key=key, on_select=lambda: store_chart_selection(page, key, fields),
+                    selection_mode=('points', 'box', 'lasso'), **kwargs)
+
+# Function drawing a forecast as a dashed continuation of a weekly line chart on a date axis, with its
+# 95% band
+def add_forecast(fig, forecast):
+    x = forecast['Week_Start']
+    fig.add_scatter(
+        x=list(x) + list(x[::-1]),
+        y=list(forecast['Upper']) + list(forecast['Lower'][::-1]),
+        fill='toself',
+        fillcolor='rgba(99, 110, 250, 0.15)',
+        line=dict(width=0),
+        hoverinfo='skip',
+        name="95% Interval"
+    )
+    fig.add_scatter(
+        x=x,
+        y=forecast['Forecast'],
+        mode='lines+markers',
+        line=dict(dash='dash'),
+        hovertemplate="Week of %{x|%Y-%m-%d}: %{y:.1f}%<extra>Forecast</extra>",
+        name="Forecast"
+    )
+
+# Period comparison section of the parameter pages: headline KPIs with their change, then the
+# delta and percent change of one KPI per value of a chosen breakdown
+def render_period_comparison(buckets, current, prior):
+    st.header("Period Comparison")
+    st.caption(f"Current: {current[0]} to {current[1]} vs. comparison: {prior[0]} to {prior[1]}")
+    totals = comparison.compare(buckets, None, current, prior).set_index('KPI')
+    for column, kpi in zip(st.columns(4), ['Productivity', 'Target_Attainment', 'Labor_Total_Output',
+                                           'Labor_Efficiency_Rate']):
+        row = totals.loc[kpi]
+        if pd.isna(row['Current']):
+            column.metric(kpi.replace('_', ' '), "No data")
+            continue
+        delta = None
+        if pd.notna(row['Delta']):
+            delta = f"{row['Delta']:+,.2f}" + ("" if pd.isna(row['Change_%']) else f" ({row['Change_%']:+.1f}%)")
+        column.metric(kpi.replace('_', ' '), f"{row['Current']:,.2f}", delta)
+
+    col1, col2 = st.columns(2)
+    compare_by = comparison.COMPARE_DIMENSIONS[col1.selectbox("Compare By", list(comparison.COMPARE_DIMENSIONS))]
+    compare_kpi = col2.selectbox("Comparison KPI", list(comparison.KPIS))
+    deltas = comparison.compare(buckets, compare_by, current, prior)
+    deltas = deltas[deltas['KPI'] == compare_kpi].sort_values('Delta')
+    deltas['Direction'] = comparison.direction(deltas)
+    # Values in only one period have no change to draw; they stay in the table below
+    changed = deltas[deltas['Direction'].isin(['Increase', 'Decrease'])]
+    unmatched = len(deltas) - len(changed)
+    if unmatched:
+        st.caption(f"{unmatched} {compare_by} value(s) have rows in only one of the periods "
+                   f"(New or Dropped in the table) and are not charted.")
+
+    fig1 = px.bar(changed, x='Delta', y=compare_by, color='Direction', orientation='h',
+                  color_discrete_map={'Increase': 'green', 'Decrease': 'red'},
+                  hover_data={'Current': ':.2f', 'Prior': ':.2f', 'Change_%': ':.1f'},
+                  title=f"Change in {compare_kpi} by {compare_by}")
+    st.plotly_chart(fig1, use_container_width=True)
+    fig2 = px.bar(changed, x='Change_%', y=compare_by, color='Direction', orientation='h',
+                  color_discrete_map={'Increase': 'green', 'Decrease': 'red'},
+                  labels={'Change_%': 'Change (%)'},
+                  title=f"Percent Change in {compare_kpi} by {compare_by}")
+    st.plotly_chart(fig2, use_container_width=True)
+    st.dataframe(deltas.drop(columns=['KPI']), use_container_width=True)
+
+# Export section of every page: the exact rows behind the page (sidebar filters and chart
+# selections) and each of its aggregate tables, as CSV, Parquet or xlsx. Files are built only
+# when a button is clicked, on Streamlit's download thread, from chunks of rows read at the
+# matching positions of the dataset, so no filtered copy of the rows is made for an export.
+def render_export(data, partitions, data_key, filters, tables, row_count=None):
+    with st.expander("Export Data"):
+        fmt = st.selectbox("Export Format", list(export.FORMATS), key='export_format')
+        mime = export.FORMATS[fmt][0]
+
+        def rows():
+            positions = analytics.filter_positions(data, filters, partitions)
+            if filters.get('chart_selection'):
+                positions = analytics.narrow_positions(data, positions, filters['chart_selection'])
+            return export.to_buffer(export.row_chunks(data, positions), fmt)
+
+        label = "Filtered Rows" + (f" ({row_count:,})" if row_count is not None else "")
+        # Downloads are built in memory, so one estimated past the cap is refused up front
+        size = export.estimate_bytes(data, row_count) if row_count is not None else 0
+        if size > export.DOWNLOAD_MAX_BYTES:
+            st.warning(f"These rows come to about {size / tenants.MB:,.0f} MB, more than the "
+                       f"{export.DOWNLOAD_MAX_BYTES / tenants.MB:,.0f} MB a download can hold. Narrow the "
+                       "filters, or export them through the API's /export/rows, which streams the file.")
+        st.download_button(label, rows, file_name=export.file_name('filtered_rows', fmt), mime=mime,
+                           on_click='ignore', key='export_rows', disabled=size > export.DOWNLOAD_MAX_BYTES)
+        for name, table in tables.items():
+            st.download_button(name.replace('_', ' ').title(),
+                               lambda table=table: export.to_buffer(export.row_chunks(table), fmt),
+                               file_name=export.file_name(name, fmt), mime=mime, on_click='ignore',
+                               key=f'export_{name}')
+
+# Sidebar report of the rows validation kept out of the dataset: how many, the most common
+# problems and the first few rows as read, so the source files can be fixed
+def render_quarantine(quarantine):
+    st.sidebar.warning(f"{len(quarantine):,} row(s) failed validation and were left out.")
+    with st.sidebar.expander("Quarantined Rows"):
+        st.dataframe(validation.summarise(quarantine), hide_index=True, use_container_width=True)
+        st.dataframe(quarantine.head(validation.PREVIEW_ROWS), hide_index=True, use_container_width=True)
+        if len(quarantine) > validation.PREVIEW_ROWS:
+            st.caption(f"First {validation.PREVIEW_ROWS} of {len(quarantine):,} quarantined rows")
+
+# Background pool computing exact results while approximate estimates are on screen
+@st.cache_resource
+def exact_jobs():
+    return {
+        'pool': concurrent.futures.ThreadPoolExecutor(max_workers=2, thread_name_prefix="exact"),
+        'futures': {},
+        'lock': threading.Lock()
+    }
+
+# Fill the caches with the exact results of one view, under the same keys the page reads them
+# by: the sidebar filters pick the rows, then the page's chart selection (if any) narrows them
+def compute_exact(data, partitions, data_key, filters, page):
+    sidebar_filters = {key: value for key, value in filters.items() if key != 'chart_selection'}
+    filtered = filter_data(data, partitions, data_key, sidebar_filters)
+    if filters.get('chart_selection'):
+        filtered = select_rows(filtered, data_key, sidebar_filters, filters['chart_selection'])
+    page_tables(page, filtered, data_key, filters)
+    if page == "Pivot Explorer":
+        pivot_cube(filtered, data_key, filters)
+    elif page == "Driver Analysis":
+        driver_table(filtered, data_key, filters, drivers.DRIVER_OUTCOME)
+
+# Function returning the future of a view's exact results, submitting it on first request
+def exact_job(data, partitions, data_key, filters, page):
+    jobs = exact_jobs()
+    key = disk_cache.make_key(data_key, filters, page)
+    with jobs['lock']:
+        future = jobs['futures'].get(key)
+        if future is None:
+            if len(jobs['futures']) > 256:
+                jobs['futures'] = {k: f for k, f in jobs['futures'].items() if not f.done()}
+            future = jobs['pool'].submit(compute_exact, data, partitions, data_key, filters, page)
+            jobs['futures'][key] = future
+    return future
+
+# Poll a view's exact results without holding up the script, so widget changes rerun at once;
+# the whole page reruns (and reads them from the caches) when they are ready
+@st.fragment(run_every=0.5)
+def await_exact(future):
+    if future.done():
+        st.rerun()
+    st.caption("Computing exact results; the estimates are replaced when they are ready.")
+
+# Process-wide page visit counts, used to warm the most visited pages first
+@st.cache_resource
+def page_popularity():
+    return collections.Counter()
+
+# Process-wide handle on a plant's background cache warmer; plants warm independently
+@st.cache_resource
+def cache_warmer_state(plant):
+    return {'key': None, 'cancel': threading.Event(), 'lock': threading.Lock()}
+
+# Precompute the default-filter aggregates of every page, most visited first, then the page of
+# every saved preset under its filters, until cancelled
+def warm_caches(data, partitions, data_key, preset_views, cancel):
+    filters = analytics.default_filters(data)
+    filtered = filter_data(data, partitions, data_key, filters)
+    pivot_cube(filtered, data_key, filters)
+    hierarchy_tree(filtered, data_key, filters)
+    popularity = page_popularity()
+    for page in sorted(analytics.PAGE_AGGREGATES, key=lambda p: -popularity[p]):
+        for spec in analytics.PAGE_AGGREGATES[page].values():
+            if cancel.is_set():
+                return
+            aggregate(filtered, data_key, filters, *spec)
+    for preset_filters, page in preset_views:
+        if cancel.is_set():
+            return
+        compute_exact(data, partitions, data_key, preset_filters, page)
+
+# Start the warmer once per dataset and set of presets; a different dataset or a saved or
+# deleted preset cancels the previous run
+def start_cache_warmer(data, partitions, data_key, preset_views=()):
+    state = cache_warmer_state(tenants.tenant_of(data_key))
+    key = disk_cache.make_key(data_key, preset_views)
+    with state['lock']:
+        if state['key'] == key:
+            return
+        state['cancel'].set()
+        state['cancel'] = threading.Event()
+        state['key'] = key
+        threading.Thread(target=warm_caches, args=(data, partitions, data_key, preset_views, state['cancel']),
+                         name="cache-warmer", daemon=True).start()
+
+# Sidebar widgets are keyed by their part of the view state; a view is applied by writing
+# those keys before the widgets are drawn (at the top of a run or in a callback)
+def apply_view(view):
+    category = next(c for c, pages in ANALYSIS_PAGES.items() if view['page'] in pages)
+    st.session_state['analysis_choice'] = category
+    st.session_state[PAGE_KEYS[category]] = view['page']
+    for key, value in view.items():
+        if key != 'page':
+            st.session_state[key] = value
+
+def load_preset(name, defaults, options):
+    preset = presets.find_preset(name)
+    if preset is not None:
+        apply_view(presets.parse_view(preset, defaults, options, ANALYSIS_PAGES))
+
+def save_preset(view):
+    name = st.session_state.get('preset_name', '').strip()
+    if name:
+        presets.save_preset(name, view)
+        st.session_state['preset_choice'] = name
+
+def delete_preset():
+    if st.session_state.get('preset_choice'):
+        presets.delete_preset(st.session_state['preset_choice'])
+        st.session_state['preset_choice'] = None
+
 # Sidebar for file upload or default dataset
 st.sidebar.title("Upload or Load Dataset")
 
+# The plant whose data this session shows, kept in the URL so links open on the same plant
+plant_names = list(plants())
+if 'plant' not in st.session_state:
+    requested_plant = st.query_params.get(tenants.PLANT_PARAM)
+    st.session_state['plant'] = requested_plant if requested_plant in plant_names else plant_names[0]
+if len(plant_names) > 1:
+    st.sidebar.selectbox("Plant", plant_names, key='plant')
+plant = st.session_state['plant']
+plant_settings = plants()[plant]
+
 data_source = st.sidebar.radio(
     "Choose Data Source:",
     ("Default Dataset", "Upload Your Own Dataset")
 )
 
-# Load dataset based on user input
+# Resolve the chosen dataset to a key and a loader; the rows load after the sidebar is drawn
 if data_source == "Default Dataset":
-    data = load_default_data()
-    st.sidebar.success("Default dataset loaded successfully!")
+    shared_version = shared_store.current_version(plant_settings['store_root'])
+    if shared_version is not None:
+        data_key = tenants.scoped_key(plant, f"shared:{shared_version}")
+        load_data = lambda: attach_shared_data(data_key, shared_version, plant_settings['store_root'])
+        loaded_message = f"Shared dataset {shared_version} attached successfully!"
+    else:
+        data_key = tenants.scoped_key(plant, f"default:{default_data_hash(plant_settings['data_path'])}")
+        load_data = lambda: load_default_data(data_key, plant_settings['data_path'])
+        loaded_message = "Default dataset loaded successfully!"
 else:
-    uploaded_file = st.sidebar.file_uploader("Upload an Excel or CSV file", type=['xlsx', 'csv'])
-
-    if uploaded_file is not None:
-        data = load_uploaded_file(uploaded_file)
-        st.sidebar.success("Dataset uploaded successfully!")
+    uploaded_files = st.sidebar.file_uploader("Upload Excel or CSV files", type=['xlsx', 'csv'],
+                                              accept_multiple_files=True)
+
+    if uploaded_files:
+        upload_hash = disk_cache.make_key(sorted(
+            (f.name, disk_cache.content_hash(f.getvalue())) for f in uploaded_files))
+        data_key = tenants.scoped_key(plant, f"upload:{upload_hash}")
+        load_data = lambda: load_uploaded_files(uploaded_files, data_key, upload_hash)
+        loaded_message = f"{len(uploaded_files)} file(s) uploaded successfully!"
     else:
         st.sidebar.warning("Please upload a dataset to proceed.")
         st.stop()
+data_status = st.sidebar.empty()
 
+# A dataset seen before draws its filters from cached metadata; a new one is loaded first
+data = None
+metadata = dataset_metadata(data_key)
+if metadata is None:
+    data, partitions, quarantine = load_data()
+    metadata = dataset_metadata(data_key, data)
 
-# Refresh Button
+# Refresh Button; the view lives in the URL, so a refresh keeps it
 if st.button("Refresh Dashboard"):
-    st.experimental_set_query_params()
+    st.rerun()
 
 # Tooltip Message
 tooltip_message = (
@@ -63,96 +564,213 @@ st.markdown(
     f'<span style="color: grey; font-size: 12px; text-decoration: underline;">{tooltip_message}</span>',
     unsafe_allow_html=True
 )
+# Pages of every analysis category, and the session state key of each category's page radio
+ANALYSIS_PAGES = {
+    "Labor Productivity Analytics": [
+        "Labor Presence at Machine (within Zone)",
+        "Labor Total Produced Output",
+        "Productivity (90% target achieved with 90% presence)",
+        "Labor Target Productivity",
+        "Labor Efficiency Rate",
+        "Productivity Zone - Green (90%+), Yellow (80%-90%), Red (<80%)",
+        "Labor Anomaly Conduct",
+        "Productivity Scenario Simulator"
+    ],
+    "Parameters for Analytics": [
+        "Product",
+        "Pivot Explorer",
+        "Driver Analysis",
+        "Time Intervals (Week, Month, Year)"
+    ],
+    "Visual Themes of Labor Productivity": [
+        "Productivity Pulse",
+        "Department Dynamics",
+        "Productivity Panorama",
+        "Target Tracker",
+        "Shift Synergy",
+        "Efficiency Compass",
+        "Productivity Evolution",
+        "Rolling KPIs"
+    ]
+}
+PAGE_KEYS = dict(zip(ANALYSIS_PAGES, ['metric', 'parameter', 'theme']))
+
+# Open the view in the URL (a named preset or explicit parameters) when the session starts or
+# the dataset changes; otherwise the widgets keep their own state
+view_defaults = presets.default_view(metadata, ANALYSIS_PAGES)
+if st.session_state.get('view_data_key') != data_key:
+    st.session_state['view_data_key'] = data_key
+    query = {name: st.query_params.get_all(name) for name in st.query_params}
+    requested = presets.find_preset(st.query_params.get(presets.PRESET_PARAM)) or presets.from_query(query)
+    apply_view(presets.parse_view(requested, view_defaults, metadata['options'], ANALYSIS_PAGES))
+
 # Sidebar setup
 st.sidebar.title("Labor Productivity Dashboard")
-analysis_choice = st.sidebar.radio(
-    "Select Analysis Category:",
-    ["Labor Productivity Analytics", "Parameters for Analytics", "Visual Themes of Labor Productivity"]
-)
+analysis_choice = st.sidebar.radio("Select Analysis Category:", list(ANALYSIS_PAGES), key='analysis_choice')
 
 # Sidebar options for selecting metrics
 if analysis_choice == "Labor Productivity Analytics":
-    metric = st.sidebar.radio(
-        "Select Metric:",
-        [
-            "Labor Presence at Machine (within Zone)",
-            "Labor Total Produced Output",
-            "Productivity (90% target achieved with 90% presence)",
-            "Labor Target Productivity",
-            "Labor Efficiency Rate",
-            "Productivity Zone - Green (90%+), Yellow (80%-90%), Red (<80%)",
-            "Labor Anomaly Conduct"
-        ]
-    )
+    metric = st.sidebar.radio("Select Metric:", ANALYSIS_PAGES[analysis_choice], key='metric')
 elif analysis_choice == "Parameters for Analytics":
-    parameter = st.sidebar.radio(
-        "Select Parameter:",
-        [
-            "Product",
-            "Department",
-            "Shift",
-            "Time Intervals (Week, Month, Year)",
-            "Manager",
-            "Factory Units",
-            "Machine Unit"
-        ]
-    )
+    parameter = st.sidebar.radio("Select Parameter:", ANALYSIS_PAGES[analysis_choice], key='parameter')
 elif analysis_choice == "Visual Themes of Labor Productivity":
-    theme = st.sidebar.radio(
-        "Select Theme:",
-        [
-            "Productivity Pulse",
-            "Department Dynamics",
-            "Productivity Panorama",
-            "Target Tracker",
-            "Shift Synergy",
-            "Efficiency Compass",
-            "Productivity Evolution"
-        ]
-    )
+    theme = st.sidebar.radio("Select Theme:", ANALYSIS_PAGES[analysis_choice], key='theme')
 
 
 
 
+# Count page visits once per page change in this session
+current_page = metric if analysis_choice == "Labor Productivity Analytics" else (
+    parameter if analysis_choice == "Parameters for Analytics" else theme)
+if st.session_state.get('last_page') != current_page:
+    st.session_state['last_page'] = current_page
+    page_popularity()[current_page] += 1
+
 # Sidebar filter section
 st.sidebar.header("Filters")
 
-# Separate Date filters
-start_date = st.sidebar.date_input("Start Date", data['Date'].min())
-end_date = st.sidebar.date_input("End Date", data['Date'].max())
+# Separate Date filters (values come from the view state)
+start_date = st.sidebar.date_input("Start Date", key='start_date')
+end_date = st.sidebar.date_input("End Date", key='end_date')
 
 # Other filters
-product_type = st.sidebar.multiselect("Select Product Type", options=data['Product_Type'].unique())
-department = st.sidebar.multiselect("Select Department", options=data['Department'].unique())
-shift = st.sidebar.multiselect("Select Shift", options=data['Shift'].unique())
-manager = st.sidebar.multiselect("Select Manager", options=data['Manager'].unique())
-factory_unit = st.sidebar.multiselect("Select Factory Unit", options=data['Factory_Unit'].unique())
-machine_unit = st.sidebar.multiselect("Select Machine Unit", options=data['Machine_Unit'].unique())
-productivity_zone = st.sidebar.multiselect("Select Productivity Zone", options=data['Productivity_Zone'].unique())
-anomaly_conduct = st.sidebar.multiselect("Select Anomaly Conduct", options=data['Anomaly_Conduct'].unique())
+options = metadata['options']
+product_type = st.sidebar.multiselect("Select Product Type", options=options['Product_Type'], key='Product_Type')
+department = st.sidebar.multiselect("Select Department", options=options['Department'], key='Department')
+shift = st.sidebar.multiselect("Select Shift", options=options['Shift'], key='Shift')
+manager = st.sidebar.multiselect("Select Manager", options=options['Manager'], key='Manager')
+factory_unit = st.sidebar.multiselect("Select Factory Unit", options=options['Factory_Unit'], key='Factory_Unit')
+machine_unit = st.sidebar.multiselect("Select Machine Unit", options=options['Machine_Unit'], key='Machine_Unit')
+productivity_zone = st.sidebar.multiselect("Select Productivity Zone", options=options['Productivity_Zone'],
+                                           key='Productivity_Zone')
+anomaly_conduct = st.sidebar.multiselect("Select Anomaly Conduct", options=options['Anomaly_Conduct'],
+                                         key='Anomaly_Conduct')
 
 # Efficiency rate slider
 efficiency_rate = st.sidebar.slider(
     "Select Labor Efficiency Rate",
-    min_value=float(data['Labor_Efficiency_Rate'].min()),
-    max_value=float(data['Labor_Efficiency_Rate'].max()),
-    value=(float(data['Labor_Efficiency_Rate'].min()), float(data['Labor_Efficiency_Rate'].max()))
+    min_value=metadata['efficiency_range'][0],
+    max_value=metadata['efficiency_range'][1],
+    key='efficiency_rate'
 )
 
+# Approximate mode answers from a stratified sample while the exact results compute
+approximate = st.sidebar.checkbox(
+    "Approximate Mode (fast previews)",
+    help="Show estimates from a stratified sample with 95% confidence intervals while exact results load."
+)
+if approximate:
+    sample_budget = st.sidebar.number_input("Sample Budget (rows)", min_value=1000, max_value=5_000_000,
+                                            value=50_000, step=10_000)
+
+# Period comparison: the sidebar date range against an earlier period or a custom one
+compare_periods = st.sidebar.checkbox(
+    "Compare Periods",
+    help="Show each KPI's change against a comparison period on the parameter pages."
+)
+if compare_periods:
+    comparison_mode = st.sidebar.selectbox("Compare Against", list(comparison.OFFSETS) + ["Custom Range"])
+    prior_dates = comparison.prior_period(
+        start_date, end_date, "Previous Period" if comparison_mode == "Custom Range" else comparison_mode)
+    if comparison_mode == "Custom Range":
+        prior_dates = (st.sidebar.date_input("Comparison Start Date", prior_dates[0]),
+                       st.sidebar.date_input("Comparison End Date", prior_dates[1]))
+
+# The view as canonical filters (multiselects sorted, so equal views share cache keys), mirrored
+# into the URL for sharing and bookmarking
+view = {
+    'page': current_page,
+    'start_date': start_date,
+    'end_date': end_date,
+    'Product_Type': product_type,
+    'Department': department,
+    'Shift': shift,
+    'Manager': manager,
+    'Factory_Unit': factory_unit,
+    'Machine_Unit': machine_unit,
+    'Productivity_Zone': productivity_zone,
+    'Anomaly_Conduct': anomaly_conduct,
+    'efficiency_rate': efficiency_rate
+}
+filters = presets.view_filters(view)
+query = presets.to_query(view, view_defaults)
+if len(plant_names) > 1:
+    query[tenants.PLANT_PARAM] = plant
+if {name: st.query_params.get_all(name) for name in st.query_params} != {
+        name: value if isinstance(value, list) else [value] for name, value in query.items()}:
+    st.query_params.from_dict(query)
+
+# Named presets, saved on the server and shared by every user; their views are precomputed
+st.sidebar.header("Presets")
+saved_presets = presets.load_presets()
+preset_names = [preset['name'] for preset in saved_presets]
+if st.session_state.get('preset_choice') not in preset_names:
+    st.session_state['preset_choice'] = None
+preset_choice = st.sidebar.selectbox("Saved Presets", preset_names, key='preset_choice',
+                                     placeholder="Choose a preset")
+col1, col2 = st.sidebar.columns(2)
+col1.button("Load Preset", disabled=preset_choice is None, on_click=load_preset,
+            args=(preset_choice, view_defaults, options))
+col2.button("Delete Preset", disabled=preset_choice is None, on_click=delete_preset)
+st.sidebar.text_input("Preset Name", key='preset_name')
+st.sidebar.button("Save Current View", on_click=save_preset, args=(view,))
+st.sidebar.caption(f"View key: {presets.view_key(view)}")
+preset_views = []
+for preset in saved_presets:
+    preset_view = presets.parse_view(preset, view_defaults, options, ANALYSIS_PAGES)
+    preset_views.append((presets.view_filters(preset_view), preset_view['page']))
+
+run_profile.mark('sidebar')
+
+# Load the rows now that the sidebar is on screen
+if data is None:
+    data, partitions, quarantine = load_data()
+anomaly_events = anomaly_index(data, data_key)
+data_status.success(loaded_message)
+if quarantine is not None and len(quarantine):
+    render_quarantine(quarantine)
+
+# Memory held for each plant against its quota, with hit rates and evictions
+with st.sidebar.expander("Memory Usage"):
+    st.dataframe(memory_cache().stats(), hide_index=True, use_container_width=True)
+    st.caption(f"Instance budget: {memory_cache().budget / tenants.MB:,.0f} MB")
+run_profile.mark('data')
+
+# Warm the default view of every page in the background while the UI renders
+start_cache_warmer(data, partitions, data_key, preset_views)
+
+# Selections on this page's charts narrow every chart on it. They join the filters, so every
+# cached result downstream (exact results computed in the background included) is keyed by them too.
+chart_selection = page_selection(current_page)
+selection_filters = dict(filters, chart_selection=chart_selection) if chart_selection else filters
+
 # Apply filters
-filtered_data = data[
-    (data['Date'] >= pd.to_datetime(start_date)) &
-    (data['Date'] <= pd.to_datetime(end_date)) &
-    (data['Product_Type'].isin(product_type) if product_type else True) &
-    (data['Department'].isin(department) if department else True) &
-    (data['Shift'].isin(shift) if shift else True) &
-    (data['Manager'].isin(manager) if manager else True) &
-    (data['Factory_Unit'].isin(factory_unit) if factory_unit else True) &
-    (data['Machine_Unit'].isin(machine_unit) if machine_unit else True) &
-    (data['Productivity_Zone'].isin(productivity_zone) if productivity_zone else True) &
-    (data['Anomaly_Conduct'].isin(anomaly_conduct) if anomaly_conduct else True) &
-    (data['Labor_Efficiency_Rate'].between(efficiency_rate[0], efficiency_rate[1]))
-]
+exact_pending = exact_job(data, partitions, data_key, selection_filters, current_page) if approximate else None
+showing_estimate = exact_pending is not None and not exact_pending.done()
+if showing_estimate:
+    view_key = f"{data_key}:sample:{sample_budget}"
+    filtered_data = filter_data(sample_data(data, data_key, sample_budget), None, view_key, filters)
+else:
+    view_key = data_key
+    filtered_data = filter_data(data, partitions, data_key, filters)
+
+if chart_selection:
+    filtered_data = select_rows(filtered_data, view_key, filters, chart_selection)
+    filters = selection_filters
+    st.caption("Chart selection: " + "; ".join(
+        f"{column} = {', '.join(map(str, values))}" for column, values in chart_selection.items()))
+    st.button("Clear Chart Selection", on_click=clear_chart_selections, args=(current_page,))
+
+if showing_estimate:
+    tables = estimated_page_tables(current_page, filtered_data, view_key, filters)
+    st.info(
+        f"Approximate mode: estimates from {len(filtered_data):,} sampled rows (stratified by Factory Unit, "
+        "Shift and Department), with 95% confidence intervals as error bars. Exact results replace them "
+        "when ready."
+    )
+else:
+    tables = page_tables(current_page, filtered_data, data_key, filters)
+render_export(data, partitions, data_key, filters, tables, None if showing_estimate else len(filtered_data))
 color_palette = px.colors.qualitative.Set1
 color_palette2 = px.colors.qualitative.Set1_r # Using a vibrant color palette
 
@@ -165,7 +783,7 @@ if analysis_choice == "Labor Productivity Analytics":
         st.subheader("Labor Presence at Machine (within Zone)")
 
         # 1. Bar Chart - Labor Presence by Productivity Zone and Shift
-        presence_chart = px.bar(
+        presence_chart = payload.govern(px.bar,
             filtered_data,
             x='Productivity_Zone',
             y='Labor_Presence',
@@ -184,7 +802,7 @@ if analysis_choice == "Labor Productivity Analytics":
         st.plotly_chart(presence_chart)
 
         # 2. Stacked Bar Chart - Labor Presence by Shift and Machine Unit
-        presence_data = filtered_data.groupby(['Shift', 'Machine_Unit'])['Labor_Presence'].sum().reset_index()
+        presence_data = tables['presence_by_shift_machine']
 
         fig1 = px.bar(
             presence_data,
@@ -205,14 +823,14 @@ if analysis_choice == "Labor Productivity Analytics":
         st.plotly_chart(fig1)
 
         # 3. Line Chart - Average Labor Presence by Day and Shift
-        filtered_data['Day_of_Week'] = filtered_data['Date'].dt.day_name()
-        average_presence_data = filtered_data.groupby(['Day_of_Week', 'Shift'])['Labor_Presence'].mean().reset_index()
+        average_presence_data = tables['presence_by_day_shift']
 
         fig2 = px.line(
             average_presence_data,
             x='Day_of_Week',
             y='Labor_Presence',
             color='Shift',
+            error_y=ci_column(average_presence_data, 'Labor_Presence'),
             title="Average Labor Presence by Day and Shift",
             color_discrete_sequence=color_palette
         )
@@ -231,37 +849,36 @@ if analysis_choice == "Labor Productivity Analytics":
         st.subheader("Labor Total Produced Output Over Time")
 
         # Chart 2: Department Comparison (Grouped Bar Chart)
-        fig1= px.bar(filtered_data, x='Department', y='Labor_Total_Output', color='Shift',
-                      title='Labor Total Output by Department and Shift', barmode='group')
-        st.plotly_chart(fig1)
+        fig1= payload.govern(px.bar, filtered_data, x='Department', y='Labor_Total_Output', color='Shift',
+                                      title='Labor Total Output by Department and Shift', barmode='group')
+        selectable_chart(fig1, current_page, 'output_by_department', {'x': 'Department', 'legendgroup': 'Shift'})
 
 
 
         # Chart 4: Monthly Aggregated Output by Department (Bar Chart)
-        filtered_data['Month'] = filtered_data['Date'].dt.to_period("M").dt.to_timestamp()
-        monthly_data = filtered_data.groupby(['Month', 'Department'])['Labor_Total_Output'].sum().reset_index()
+        monthly_data = tables['output_by_month_department'].rename(columns={'Month_Start': 'Month'})
 
         fig4 = px.bar(monthly_data, x='Month', y='Labor_Total_Output', color='Department',
                       title='Monthly Total Produced Output by Department',
                       labels={"Labor_Total_Output": "Total Output"})
         st.plotly_chart(fig4)
         # Chart 1: Box Plot by Department and Shift
-        fig1 = px.box(filtered_data, x='Department', y='Labor_Total_Output', color='Shift',
-                      title='Output Distribution by Department and Shift')
+        fig1 = payload.govern(px.box, filtered_data, x='Department', y='Labor_Total_Output', color='Shift',
+                                      title='Output Distribution by Department and Shift')
         st.plotly_chart(fig1)
 
         # Chart 2: Grouped Bar Chart by Factory Unit and Department
-        fig2 = px.bar(filtered_data, x='Factory_Unit', y='Labor_Total_Output', color='Department',
-                      title='Labor Total Output by Factory Unit and Department', barmode='group',
-                      labels={"Labor_Total_Output": "Total Output"})
-        st.plotly_chart(fig2)
+        fig2 = payload.govern(px.bar, filtered_data, x='Factory_Unit', y='Labor_Total_Output', color='Department',
+                                      title='Labor Total Output by Factory Unit and Department', barmode='group',
+                                      labels={"Labor_Total_Output": "Total Output"})
+        selectable_chart(fig2, current_page, 'output_by_factory', {'x': 'Factory_Unit', 'legendgroup': 'Department'})
 
 
         # Chart 1: Bar Chart by Factory Unit and Productivity Zone with Zone Colors
         zone_colors = {'Low': 'red', "Yellow": "#FFFF8F", 'High': 'green'}
 
         # Chart 2: Box Plot by Factory Unit and Productivity Zone
-        fig2 = px.box(
+        fig2 = payload.govern(px.box,
             filtered_data,
             x='Factory_Unit',
             y='Labor_Total_Output',
@@ -279,12 +896,13 @@ if analysis_choice == "Labor Productivity Analytics":
 
         # Visualization 2: Average Labor Presence by Product Type (Bar Chart)
         st.subheader("Average Labor Presence by Product Type")
-        average_presence = filtered_data.groupby('Product_Type')['Labor_Presence'].mean().reset_index()
+        average_presence = tables['presence_by_product']
         fig_presence_product = px.bar(
             average_presence,
             x='Product_Type',
             y='Labor_Presence',
             color='Product_Type',
+            error_y=ci_column(average_presence, 'Labor_Presence'),
             title="Average Labor Presence by Product Type",
             labels={'Labor_Presence': 'Average Labor Presence (%)'},
             color_discrete_sequence=px.colors.qualitative.Safe
@@ -294,7 +912,7 @@ if analysis_choice == "Labor Productivity Analytics":
 
         # Visualization 3: Productivity by Shift
         st.subheader("Productivity by Shift")
-        fig_productivity_shift = px.bar(
+        fig_productivity_shift = payload.govern(px.bar,
             filtered_data,
             x='Shift',
             y='Productivity',
@@ -314,7 +932,7 @@ if analysis_choice == "Labor Productivity Analytics":
             'Labor_Target_Output']) * 100
         # 4. Labor Target Productivity Comparison
         st.subheader("Labor Output vs Target Output")
-        target_chart = px.bar(
+        target_chart = payload.govern(px.bar,
             filtered_data,
             x='Department',
             y=['Labor_Total_Output', 'Labor_Target_Output'],
@@ -324,23 +942,23 @@ if analysis_choice == "Labor Productivity Analytics":
         st.plotly_chart(target_chart)
 
         # Additional Plot: Productivity by Shift and Department
-        fig2 = px.bar(filtered_data, x='Shift', y=['Labor_Total_Output', 'Labor_Target_Output'] ,
-                      title='Labor Target Productivity by Shift',
-                      labels={'Labor_Target_Productivity': 'Labor Target Productivity (%)', 'Shift': 'Shift'},
-                      barmode='group')
+        fig2 = payload.govern(px.bar, filtered_data, x='Shift', y=['Labor_Total_Output', 'Labor_Target_Output'] ,
+                                      title='Labor Target Productivity by Shift',
+                                      labels={'Labor_Target_Productivity': 'Labor Target Productivity (%)', 'Shift': 'Shift'},
+                                      barmode='group')
         fig2.update_layout(xaxis_title='Shift', yaxis_title='Labor Target Productivity (%)')
         st.plotly_chart(fig2)
         # Additional Plot: Productivity by Shift and Department
-        fig2 = px.bar(filtered_data, x='Productivity_Zone', y=['Labor_Total_Output', 'Labor_Target_Output'] ,
-                      title='Labor Target Productivity by Productivity Zone ',
-                      labels={'Labor_Target_Productivity': 'Labor Target Productivity (%)', 'Shift': 'Shift'},
-                      barmode='group')
+        fig2 = payload.govern(px.bar, filtered_data, x='Productivity_Zone', y=['Labor_Total_Output', 'Labor_Target_Output'] ,
+                                      title='Labor Target Productivity by Productivity Zone ',
+                                      labels={'Labor_Target_Productivity': 'Labor Target Productivity (%)', 'Shift': 'Shift'},
+                                      barmode='group')
         fig2.update_layout(xaxis_title='Shift', yaxis_title='Labor Target Productivity (%)')
         st.plotly_chart(fig2)# Additional Plot: Productivity by Shift and Department
-        fig2 = px.bar(filtered_data, x='Labor_Efficiency_Rate', y=['Labor_Total_Output', 'Labor_Target_Output'] ,
-                      title='Labor Target Productivity by Shift and Department',
-                      labels={'Labor_Target_Productivity': 'Labor Target Productivity (%)', 'Shift': 'Shift'},
-                      barmode='group')
+        fig2 = payload.govern(px.bar, filtered_data, x='Labor_Efficiency_Rate', y=['Labor_Total_Output', 'Labor_Target_Output'] ,
+                                      title='Labor Target Productivity by Shift and Department',
+                                      labels={'Labor_Target_Productivity': 'Labor Target Productivity (%)', 'Shift': 'Shift'},
+                                      barmode='group')
         fig2.update_layout(xaxis_title='Shift', yaxis_title='Labor Target Productivity (%)')
         st.plotly_chart(fig2)
 
@@ -348,9 +966,7 @@ if analysis_choice == "Labor Productivity Analytics":
 
 
         # Create a separate DataFrame for resampled weekly data
-        weekly_data = filtered_data[['Date', 'Labor_Efficiency_Rate']].copy()
-        weekly_data['Date'] = pd.to_datetime(weekly_data['Date'])
-        weekly_data = weekly_data.set_index('Date').resample('W').mean().reset_index()
+        weekly_data = tables['efficiency_by_week'].rename(columns={'Week_Ending': 'Date'})
 
         # Plotting the resampled time series chart
         st.subheader("Labor Efficiency Rate Over Time (Weekly Average)")
@@ -358,7 +974,7 @@ if analysis_choice == "Labor Productivity Analytics":
             weekly_data,
             x='Date',
             y='Labor_Efficiency_Rate',
-
+            error_y=ci_column(weekly_data, 'Labor_Efficiency_Rate'),
             title="Labor Efficiency Rate Over Time (Weekly Average)",
             labels={'Labor_Efficiency_Rate': 'Efficiency Rate', 'Date': 'Date'}
         )
@@ -368,7 +984,7 @@ if analysis_choice == "Labor Productivity Analytics":
 
         # 2. Bar Chart for Labor Efficiency Rate by Product Type
         st.subheader("Labor Efficiency Rate by Product Type")
-        fig = px.bar(
+        fig = payload.govern(px.bar,
             filtered_data,
             x='Product_Type',
             y='Labor_Efficiency_Rate',
@@ -380,7 +996,7 @@ if analysis_choice == "Labor Productivity Analytics":
 
         # 4. Box Plot for Labor Efficiency Rate across Departments
         st.subheader("Labor Efficiency Rate Across Departments")
-        fig = px.box(
+        fig = payload.govern(px.box,
             filtered_data,
             x='Department',
             y='Labor_Efficiency_Rate',
@@ -394,7 +1010,7 @@ if analysis_choice == "Labor Productivity Analytics":
 
         # 1. Stacked Bar Chart for Productivity Zones by Department
         st.subheader("Productivity Zone Distribution by Department")
-        fig = px.histogram(
+        fig = payload.govern(px.histogram,
             filtered_data,
             x='Department',
             color='Productivity_Zone',
@@ -403,12 +1019,12 @@ if analysis_choice == "Labor Productivity Analytics":
             barmode='stack',
             color_discrete_map={'Green': 'green', 'Yellow': 'yellow', 'Red': 'red'}
         )
-        st.plotly_chart(fig)
+        selectable_chart(fig, current_page, 'zones_by_department', {'x': 'Department', 'legendgroup': 'Productivity_Zone'})
 
         # 2. Pie Chart for Overall Productivity Zone Distribution
         st.subheader("Overall Productivity Zone Distribution")
         zone_colors = {'Low': 'red', 'Yellow': '#FFFF8F', 'High': 'green'}
-        fig3 = px.pie(
+        fig3 = payload.govern(px.pie,
             filtered_data,
             names='Productivity_Zone',
             title='Productivity Zone Distribution',
@@ -420,9 +1036,10 @@ if analysis_choice == "Labor Productivity Analytics":
 
         # 3. Time Series Area Chart for Productivity Zones Over Time
         # Aggregate the count of each productivity zone by week
-        time_zone_data = filtered_data.groupby(
-            [filtered_data['Date'].dt.to_period('W'), 'Productivity_Zone']).size().unstack(fill_value=0).reset_index()
-        time_zone_data['Date'] = time_zone_data['Date'].dt.start_time  # Convert to timestamp for plotting
+        time_zone_data = tables['zones_by_week'].pivot(
+            index='Week_Start', columns='Productivity_Zone', values='Count'
+        ).reindex(columns=['Green', 'Yellow', 'Red']).fillna(0).reset_index()
+        time_zone_data = time_zone_data.rename(columns={'Week_Start': 'Date'})
 
         st.subheader("Productivity Zone Trends Over Time (Weekly)")
         fig = px.area(
@@ -439,20 +1056,23 @@ if analysis_choice == "Labor Productivity Analytics":
 
     elif metric == "Labor Anomaly Conduct":
         st.subheader("Labor Anomaly Conduct")
+        # Every chart reads the anomaly event index (exact, even in approximate mode)
         anomaly_chart = px.bar(
-            filtered_data,
+            anomalies.event_counts(anomaly_events, filters, ['Anomaly_Conduct', 'Shift']),
             x='Anomaly_Conduct',
+            y='Count',
             title="Instances of Labor Anomaly Conduct",
             color='Shift'
         )
-        st.plotly_chart(anomaly_chart)
+        selectable_chart(anomaly_chart, current_page, 'anomalies_by_shift', {'x': 'Anomaly_Conduct', 'legendgroup': 'Shift'})
         fig = px.bar(
-            filtered_data,
+            anomalies.event_counts(anomaly_events, filters, ['Date', 'Anomaly_Conduct']),
             x="Date",
+            y="Count",
             color="Anomaly_Conduct",
             title="Labor Anomalies by Date and Shift",
 
-            labels={"Anomaly_Conduct": "Type of Anomaly", "count": "Frequency"}
+            labels={"Anomaly_Conduct": "Type of Anomaly", "Count": "Frequency"}
         )
 
         st.plotly_chart(fig)
@@ -460,32 +1080,34 @@ if analysis_choice == "Labor Productivity Analytics":
 
         st.subheader("Anomaly Distribution by Department")
         fig_dept = px.bar(
-            filtered_data,
+            anomalies.event_counts(anomaly_events, filters, ['Anomaly_Conduct', 'Department']),
             x="Anomaly_Conduct",
+            y="Count",
             color="Department",
             title="Anomalies by Department",
             labels={"Anomaly_Conduct": "Type of Anomaly"},
 
         )
 
-        st.plotly_chart(fig_dept)
+        selectable_chart(fig_dept, current_page, 'anomalies_by_department', {'x': 'Anomaly_Conduct', 'legendgroup': 'Department'})
 
         # Visualization: Anomaly Distribution by Factory Unit
         st.subheader("Anomaly Distribution by Factory Unit")
         fig_factory = px.bar(
-            filtered_data,
+            anomalies.event_counts(anomaly_events, filters, ['Anomaly_Conduct', 'Factory_Unit']),
             x="Anomaly_Conduct",
+            y="Count",
             color="Factory_Unit",
             title="Anomalies by Factory Unit",
             labels={"Anomaly_Conduct": "Type of Anomaly"},
 
         )
 
-        st.plotly_chart(fig_factory)
+        selectable_chart(fig_factory, current_page, 'anomalies_by_factory', {'x': 'Anomaly_Conduct', 'legendgroup': 'Factory_Unit'})
 
 
-        fig = px.scatter(
-            filtered_data,
+        fig = payload.govern(px.scatter,
+            anomalies.matching_events(anomaly_events, filters),
             x="Labor_Presence",
             y="Anomaly_Conduct",
             color="Anomaly_Conduct",
@@ -496,17 +1118,93 @@ if analysis_choice == "Labor Productivity Analytics":
         st.plotly_chart(fig)
 
 
+    elif metric == "Productivity Scenario Simulator":
+        st.subheader("What-If Scenarios for the Productivity Rule and Zone Bands")
+        st.caption("Today: Productivity = output / target (capped at 100%), Green at 90%+, Yellow at 80-90%, "
+                   "Red below 80%, and a productive record needs 90% of target with 90% presence.")
+
+        # Threshold ranges; every combination is evaluated in one batched pass
+        col1, col2 = st.columns(2)
+        scale_range = col1.slider("Target Output (% of current)", 50, 150, (80, 120), step=5)
+        presence_range = col2.slider("Presence Requirement (%)", 50, 100, (80, 95), step=5)
+        green_range = col1.slider("Green Threshold (%)", 50, 100, (85, 95), step=5)
+        yellow_range = col2.slider("Yellow Threshold (%)", 40, 95, (75, 85), step=5)
+        target_scales = tuple(t / 100 for t in range(scale_range[0], scale_range[1] + 1, 5))
+        green_values = tuple(range(green_range[0], green_range[1] + 1, 5))
+        yellow_values = tuple(range(yellow_range[0], yellow_range[1] + 1, 5))
+        presence_values = tuple(range(presence_range[0], presence_range[1] + 1, 5))
+
+        results = scenario_results(filtered_data, view_key, filters,
+                                   target_scales, green_values, yellow_values, presence_values)
+        st.caption(f"{len(results)} scenarios evaluated over {int(results['Rows'].iloc[0]):,} records.")
+
+        baseline = results[(results['target_scale'] == 1.0) & (results['green'] == 90) &
+                           (results['yellow'] == 80) & (results['presence_min'] == 90)].iloc[0]
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Baseline Green Share", f"{baseline['Green_Share']:.1f}%")
+        col2.metric("Baseline Red Share", f"{baseline['Red_Share']:.1f}%")
+        col3.metric("Baseline Productive Share", f"{baseline['Productive_Share']:.1f}%")
+
+        col1, col2 = st.columns(2)
+        selected_green = col1.selectbox("Show Green Threshold", sorted(results['green'].unique()),
+                                        index=sorted(results['green'].unique()).index(90.0)
+                                        if 90.0 in results['green'].values else 0)
+        yellow_options = sorted(results.loc[results['green'] == selected_green, 'yellow'].unique())
+        selected_yellow = col2.selectbox("Show Yellow Threshold", yellow_options,
+                                         index=yellow_options.index(80.0) if 80.0 in yellow_options else 0)
+        view = results[(results['green'] == selected_green) & (results['yellow'] == selected_yellow)]
+
+        # 1. Productive share across target levels and presence requirements
+        fig1 = px.imshow(
+            view.pivot_table(index='presence_min', columns='target_scale', values='Productive_Share'),
+            text_auto='.1f',
+            aspect='auto',
+            color_continuous_scale='RdYlGn',
+            title=f"Productive Share (%) at Green {selected_green:.0f}%",
+            labels={'x': 'Target Output (x current)', 'y': 'Presence Requirement (%)', 'color': 'Share (%)'}
+        )
+        st.plotly_chart(fig1)
+
+        # 2. Zone mix across target levels (zones do not depend on presence)
+        zone_view = scenarios.zone_table(view[view['presence_min'] == view['presence_min'].min()])
+        fig2 = px.bar(
+            zone_view,
+            x='target_scale',
+            y='Share',
+            color='Zone',
+            barmode='stack',
+            title=f"Zone Mix by Target Output (Green {selected_green:.0f}%, Yellow {selected_yellow:.0f}%)",
+            labels={'target_scale': 'Target Output (x current)', 'Share': 'Share of Records (%)'},
+            color_discrete_map={'Green': 'green', 'Yellow': 'yellow', 'Red': 'red'}
+        )
+        st.plotly_chart(fig2)
+
+        # 3. Mean productivity by target level
+        fig3 = px.line(view.drop_duplicates('target_scale'), x='target_scale', y='Mean_Productivity', markers=True,
+                       title="Mean Productivity by Target Output",
+                       labels={'target_scale': 'Target Output (x current)', 'Mean_Productivity': 'Productivity (%)'})
+        st.plotly_chart(fig3)
+
+        st.dataframe(results.sort_values('Productive_Share', ascending=False), use_container_width=True)
+
+
 elif analysis_choice == "Parameters for Analytics":
     st.title("Labor Productivity Analytics by Parameters")
+    if compare_periods:
+        # Both periods are cut from one set of daily buckets over the whole date range
+        range_filters = dict(filters, start_date=metadata['date_range'][0].date(),
+                             end_date=metadata['date_range'][1].date())
+        range_filters.pop('chart_selection', None)
+        range_rows = filter_data(data, partitions, data_key, range_filters)
+        if chart_selection:
+            range_rows = select_rows(range_rows, data_key, range_filters, chart_selection)
+            range_filters['chart_selection'] = chart_selection
+        render_period_comparison(period_buckets(range_rows, data_key, range_filters),
+                                 (start_date, end_date), prior_dates)
     if parameter == "Product":
 
         # Top 5 Products by Sales and Profit
-        top_products = filtered_data.groupby('Product_Type').agg({
-            'Labor_Total_Output': 'sum',
-            'Labor_Target_Output': 'sum',
-            'Productivity': 'mean',
-            'Labor_Efficiency_Rate': 'mean'
-        }).sort_values(by='Labor_Total_Output', ascending=False).head(5).reset_index()
+        top_products = tables['product_summary'].sort_values(by='Labor_Total_Output', ascending=False).head(5)
 
         st.header("Top 5 Products by Sales and Profit")
         fig1 = px.bar(top_products, x='Product_Type', y=['Labor_Total_Output', 'Labor_Target_Output'],
@@ -516,12 +1214,7 @@ elif analysis_choice == "Parameters for Analytics":
         st.plotly_chart(fig1)
 
         # Bottom 5 Products by Sales and Profit
-        bottom_products = filtered_data.groupby('Product_Type').agg({
-            'Labor_Total_Output': 'sum',
-            'Labor_Target_Output': 'sum',
-            'Productivity': 'mean',
-            'Labor_Efficiency_Rate': 'mean'
-        }).sort_values(by='Labor_Total_Output', ascending=True).head(5).reset_index()
+        bottom_products = tables['product_summary'].sort_values(by='Labor_Total_Output', ascending=True).head(5)
 
         st.header("Bottom 5 Products by Sales and Profit")
         fig2 = px.bar(bottom_products, x='Product_Type', y=['Labor_Total_Output', 'Labor_Target_Output'],
@@ -532,12 +1225,7 @@ elif analysis_choice == "Parameters for Analytics":
 
         # Profit by Department
         st.header("Profit by Department")
-        profit_department =filtered_data.groupby('Department').agg({
-            'Labor_Total_Output': 'sum',
-            'Labor_Target_Output': 'sum',
-            'Labor_Efficiency_Rate': 'mean',
-            'Productivity': 'mean'
-        }).reset_index()
+        profit_department = tables['department_summary']
 
         fig3 = px.bar(profit_department, x='Department', y=['Labor_Total_Output', 'Labor_Target_Output'],
                       title="Profit by Department",
@@ -545,7 +1233,7 @@ elif analysis_choice == "Parameters for Analytics":
                       barmode='group')
         st.plotly_chart(fig3)
         st.subheader("Productivity by Product Type")
-        product_chart = px.bar(
+        product_chart = payload.govern(px.bar,
             filtered_data,
             x='Product_Type',
             y='Labor_Total_Output',
@@ -556,7 +1244,7 @@ elif analysis_choice == "Parameters for Analytics":
 
         # Visualization 1: Sales by Product Over Time
         st.subheader("Sales by Product Over Time")
-        fig_sales_product_time = px.bar(
+        fig_sales_product_time = payload.govern(px.bar,
             filtered_data,
             x='Date',
             y='Labor_Total_Output',
@@ -569,7 +1257,7 @@ elif analysis_choice == "Parameters for Analytics":
 
         # Visualization 2: Productivity by Product and Zone
         st.subheader("Productivity by Product Type and Zone")
-        fig_productivity_zone = px.bar(
+        fig_productivity_zone = payload.govern(px.bar,
             filtered_data,
             x='Product_Type',
             y='Productivity',
@@ -582,13 +1270,13 @@ elif analysis_choice == "Parameters for Analytics":
 
         # Visualization 3: Average Labor Presence by Department for Each Product
         st.subheader("Average Labor Presence by Department for Each Product Type")
-        avg_presence_department = filtered_data.groupby(['Product_Type', 'Department'])[
-            'Labor_Presence'].mean().reset_index()
+        avg_presence_department = tables['presence_by_product_department']
         fig_presence_department = px.bar(
             avg_presence_department,
             x='Product_Type',
             y='Labor_Presence',
             color='Department',
+            error_y=ci_column(avg_presence_department, 'Labor_Presence'),
             title="Average Labor Presence by Department for Each Product Type",
             labels={'Labor_Presence': 'Average Labor Presence (%)'},
             color_discrete_sequence=px.colors.qualitative.Bold
@@ -597,7 +1285,7 @@ elif analysis_choice == "Parameters for Analytics":
 
         # Visualization 4: Productivity by Product Type in Different Factory Units
         st.subheader("Productivity by Product Type in Different Factory Units")
-        fig_productivity_factory = px.bar(
+        fig_productivity_factory = payload.govern(px.bar,
             filtered_data,
             x='Factory_Unit',
             y='Productivity',
@@ -610,7 +1298,7 @@ elif analysis_choice == "Parameters for Analytics":
 
         # Visualization 5: Productivity Distribution by Shift and Product Type
         st.subheader("Productivity Distribution by Shift and Product Type")
-        fig_productivity_shift = px.box(
+        fig_productivity_shift = payload.govern(px.box,
             filtered_data,
             x='Shift',
             y='Productivity',
@@ -621,96 +1309,107 @@ elif analysis_choice == "Parameters for Analytics":
         )
         st.plotly_chart(fig_productivity_shift, use_container_width=True)
 
-    elif parameter == "Department":
-        # 2. Department - Productivity by Department
-        st.subheader("Productivity by Department")
-        department_chart = px.bar(
-            filtered_data,
-            x='Department',
-            y=['Labor_Total_Output', 'Labor_Target_Output'],
+    elif parameter == "Pivot Explorer":
+        # Any one or two dimensions against any metric, cut from the cached cube
+        st.header("Pivot Explorer")
+        dimension_labels = list(analytics.PIVOT_DIMENSIONS)
+        col1, col2, col3, col4 = st.columns(4)
+        first_dimension = col1.selectbox("Dimension", dimension_labels)
+        second_dimension = col2.selectbox(
+            "Split By", ["None"] + [label for label in dimension_labels if label != first_dimension])
+        pivot_metric = col3.selectbox("Metric", analytics.PIVOT_METRICS)
+        pivot_how = col4.selectbox("Aggregation", list(analytics.PIVOT_AGGREGATIONS))
+
+        dims = [analytics.PIVOT_DIMENSIONS[first_dimension]]
+        if second_dimension != "None":
+            dims.append(analytics.PIVOT_DIMENSIONS[second_dimension])
+        pivot_data = analytics.pivot(pivot_cube(filtered_data, view_key, filters), dims, pivot_metric,
+                                     analytics.PIVOT_AGGREGATIONS[pivot_how])
+        color_dimension = dims[1] if len(dims) > 1 else dims[0]
+
+        # 1. Aggregated metric by dimension, with one standard deviation for means
+        st.subheader(f"{pivot_how} {pivot_metric} by {' and '.join(dims)}")
+        fig1 = px.bar(
+            pivot_data,
+            x=dims[0],
+            y=pivot_metric,
+            color=color_dimension,
             barmode='group',
-            title="Labor Output vs Target Output by Department"
+            error_y='Std' if pivot_how == "Mean" else None,
+            title=f"{pivot_how} {pivot_metric} by {' and '.join(dims)}",
+            color_discrete_map={'Green': 'green', 'Yellow': 'yellow', 'Red': 'red'}
         )
-        st.plotly_chart(department_chart)
+        selectable_chart(fig1, current_page, 'pivot', {'x': dims[0], 'legendgroup': color_dimension})
 
-        # 1. Overall Productivity by Department
-        st.header("Overall Productivity by Department")
-        fig1 = px.bar(filtered_data, x='Department', y='Productivity', color='Department',
-                      title="Productivity by Department")
-        st.plotly_chart(fig1)
+        # 2. Row counts per cut (replaces the per-page histograms)
+        fig2 = px.bar(pivot_data, x=dims[0], y='Rows', color=color_dimension, barmode='stack',
+                      title=f"Records by {' and '.join(dims)}",
+                      color_discrete_map={'Green': 'green', 'Yellow': 'yellow', 'Red': 'red'})
+        st.plotly_chart(fig2)
 
-        # 3. Total Output by Department and Product Type
-        st.header("Total Output by Department and Product Type")
-        fig3 = px.bar(filtered_data, x='Department', y='Labor_Total_Output', color='Product_Type', barmode='group',
-                      title="Total Output by Department and Product Type")
-        st.plotly_chart(fig3)
+        # 3. Heatmap of the two-way cut
+        if len(dims) > 1:
+            fig3 = px.imshow(
+                pivot_data.pivot(index=dims[1], columns=dims[0], values=pivot_metric),
+                title=f"{pivot_how} {pivot_metric} Heatmap",
+                labels={'color': pivot_metric},
+                aspect='auto'
+            )
+            st.plotly_chart(fig3)
 
-        # 4. Productivity Zone Distribution by Department
-        st.header("Productivity Zone Distribution by Department")
-        fig4 = px.histogram(filtered_data, x='Department', color='Productivity_Zone',
-                            title="Productivity Zone Distribution by Department",
-                            color_discrete_map={'Green': 'green', 'Yellow': 'yellow', 'Red': 'red'})
-        st.plotly_chart(fig4)
+        st.dataframe(pivot_data, use_container_width=True)
 
-        # 5. Efficiency Rate by Department
-        st.header("Efficiency Rate by Department")
-        fig5 = px.box(filtered_data, x='Department', y='Labor_Efficiency_Rate', color='Department',
-                      title="Efficiency Rate by Department")
-        st.plotly_chart(fig5)
-    elif parameter == "Shift":
+    elif parameter == "Driver Analysis":
+        # Every dimension tested against one outcome at once, strongest driver first
+        st.header("Driver Analysis")
+        outcome = st.selectbox("Outcome", analytics.PIVOT_METRICS)
+        driver_results = driver_table(filtered_data, view_key, filters, outcome)
+        ranking, pairs = driver_results['ranking'], driver_results['pairs']
 
-        # 1. Productivity by Shift
-        st.header("Productivity by Shift")
-        fig1 = px.bar(filtered_data, x='Shift', y='Productivity', color='Shift', title="Overall Productivity by Shift")
+        # 1. Effect size of every dimension: share of the outcome's variance its groups explain
+        st.subheader(f"What Drives {outcome}")
+        fig1 = px.bar(
+            ranking,
+            x='Dimension',
+            y=['Omega_Squared', 'Epsilon_Squared'],
+            barmode='group',
+            title=f"Effect Size by Dimension ({outcome})",
+            labels={'value': 'Effect Size', 'variable': 'Measure'}
+        )
         st.plotly_chart(fig1)
+        st.caption(f"ANOVA (omega squared) and Kruskal-Wallis (epsilon squared) over {ranking['Rows'].max():,} rows; "
+                   f"pairs are significant at Holm-adjusted p < {drivers.ALPHA}.")
+        st.dataframe(ranking, use_container_width=True, hide_index=True)
 
-
-        # 3. Output by Shift and Product Type
-        st.header("Output by Shift and Product Type")
-        fig3 = px.bar(filtered_data, x='Shift', y='Labor_Total_Output', color='Product_Type', barmode='group',
-                      title="Total Output by Shift and Product Type")
-        st.plotly_chart(fig3)
-
-        # 4. Productivity Zone Distribution by Shift
-        st.header("Productivity Zone Distribution by Shift")
-        fig4 = px.histogram(filtered_data, x='Shift', color='Productivity_Zone',
-                            title="Productivity Zone Distribution by Shift")
-        st.plotly_chart(fig4)
-        st.subheader("Productivity by Shift")
-        shift_chart = px.bar(
-            filtered_data,
-            x='Shift',
-            y='Productivity',
-            color='Productivity_Zone',
-            title="Average Productivity by Shift",
-            color_discrete_map={'Green': 'green', 'Yellow': 'yellow', 'Red': 'red'}
+        # 2. Pairwise post-hoc tests within one dimension
+        driver_dimension = st.selectbox("Pairwise Tests For", list(ranking['Dimension']))
+        dimension_pairs = pairs[pairs['Dimension'] == driver_dimension].sort_values('Welch_p_Holm')
+        fig2 = px.bar(
+            dimension_pairs.assign(Pair=dimension_pairs['Group_A'].astype(str) + ' vs ' +
+                                   dimension_pairs['Group_B'].astype(str)),
+            x='Pair',
+            y='Hedges_g',
+            color=dimension_pairs['Welch_p_Holm'] < drivers.ALPHA,
+            title=f"Pairwise Effect Sizes within {driver_dimension} (Hedges' g)",
+            labels={'color': 'Significant'}
         )
-        st.plotly_chart(shift_chart)
+        st.plotly_chart(fig2)
+        st.dataframe(dimension_pairs, use_container_width=True, hide_index=True)
+
     elif parameter == "Time Intervals (Week, Month, Year)":
 
-        # Assuming 'data' is already loaded with necessary columns
-        data['Date'] = pd.to_datetime(data['Date'])
-        data['Week'] = data['Date'].dt.isocalendar().week
-        data['Month'] = data['Date'].dt.month
-        data['Year'] = data['Date'].dt.year
+        # Calendar columns go on a local copy; the loaded rows are shared with other sessions
+        interval_rows = data.copy(deep=False)
+        for key in analytics.INTERVAL_KEYS.values():
+            interval_rows[key] = analytics.TIME_KEYS[key](interval_rows['Date'])
 
         # Sidebar filter for time interval selection
                 # Filtered data setup for the chosen time interval
         time_interval = st.selectbox("Choose Interval", ["Weekly", "Monthly", "Yearly"])
 
         # Group the filtered data based on the selected time interval
-        if time_interval == "Weekly":
-            filtered_data['Week'] = filtered_data['Date'].dt.isocalendar().week
-            interval_data = filtered_data.groupby('Week').mean(numeric_only=True).reset_index()
-            x_column = 'Week'
-        elif time_interval == "Monthly":
-            filtered_data['Month'] = filtered_data['Date'].dt.month
-            interval_data = filtered_data.groupby('Month').mean(numeric_only=True).reset_index()
-            x_column = 'Month'
-        else:  # Yearly
-            filtered_data['Year'] = filtered_data['Date'].dt.year
-            interval_data = filtered_data.groupby('Year').mean(numeric_only=True).reset_index()
-            x_column = 'Year'
+        interval_data = tables[time_interval]
+        x_column = analytics.INTERVAL_KEYS[time_interval]
 
 
 
@@ -720,6 +1419,7 @@ elif analysis_choice == "Parameters for Analytics":
             interval_data,
             x=x_column,
             y='Productivity',
+            error_y=ci_column(interval_data, 'Productivity'),
             title=f"Productivity Trends ({time_interval})",
             markers=True
         )
@@ -731,6 +1431,7 @@ elif analysis_choice == "Parameters for Analytics":
             interval_data,
             x=x_column,
             y='Labor_Total_Output',
+            error_y=ci_column(interval_data, 'Labor_Total_Output'),
             title=f"Total Output by {time_interval}",
             color='Labor_Total_Output',
             color_discrete_sequence=['#2ca02c']  # Use a single color without specifying continuous scale
@@ -740,8 +1441,8 @@ elif analysis_choice == "Parameters for Analytics":
         # 3. Productivity Zone Distribution by Month (only for Monthly analysis)
         if time_interval == "Monthly":
             st.header("Productivity Zone Distribution by Month")
-            fig3 = px.histogram(
-                data,
+            fig3 = payload.govern(px.histogram,
+                interval_rows,
                 x='Month',
                 color='Productivity_Zone',
                 title="Productivity Zone Distribution by Month"
@@ -750,8 +1451,8 @@ elif analysis_choice == "Parameters for Analytics":
 
         # 4. Efficiency Rate by Time Interval
         st.header(f"Efficiency Rate ({time_interval})")
-        fig4 = px.box(
-            data,
+        fig4 = payload.govern(px.box,
+            interval_rows,
             x=x_column,
             y='Labor_Efficiency_Rate',
             title=f"{time_interval} Efficiency Rate",
@@ -770,10 +1471,11 @@ elif analysis_choice == "Parameters for Analytics":
             labels={x_column: x_column, "Productivity": "Productivity (%)"}
         )
 
-        # Overlay anomaly markers on the line chart
+        # Overlay the anomalies matching the filters, from the anomaly event index
+        overlay_events = anomalies.matching_events(anomaly_events, filters)
         fig5.add_scatter(
-            x=data[data['Anomaly_Conduct'].notna()][x_column],
-            y=data[data['Anomaly_Conduct'].notna()]['Productivity'],
+            x=analytics.TIME_KEYS[x_column](overlay_events['Date']),
+            y=overlay_events['Productivity'],
             mode='markers',
             marker=dict(color='red', size=10, symbol='x'),
             name='Anomalies'
@@ -794,102 +1496,19 @@ elif analysis_choice == "Parameters for Analytics":
         # 3. Productivity Zone Distribution by Month (only for Monthly analysis)
         if time_interval == "Monthly":
             st.header("Productivity Zone Distribution by Month")
-            fig3 = px.scatter(data, x='Month', color='Productivity_Zone',
-                                title="Productivity Zone Distribution by Month",color_discrete_map={'Green': 'green', 'Yellow': 'yellow', 'Red': 'red'})
+            fig3 = payload.govern(px.scatter, interval_rows, x='Month', color='Productivity_Zone',
+                                                title="Productivity Zone Distribution by Month",color_discrete_map={'Green': 'green', 'Yellow': 'yellow', 'Red': 'red'})
             st.plotly_chart(fig3)
 
         # 4. Monthly Efficiency Rate (only for Monthly analysis)
         if time_interval == "Monthly":
             st.header("Monthly Efficiency Rate")
-            fig4 = px.box(data, x='Month', y='Labor_Efficiency_Rate', title="Monthly Efficiency Rate",
-                          color_discrete_sequence=['#1f77b4'])
+            fig4 = payload.govern(px.box, interval_rows, x='Month', y='Labor_Efficiency_Rate', title="Monthly Efficiency Rate",
+                                          color_discrete_sequence=['#1f77b4'])
             st.plotly_chart(fig4)
 
 
 
-    elif parameter == "Manager":
-
-        # 1. Overall Productivity by Manager
-        st.header("Overall Productivity by Manager")
-        fig1 = px.bar(filtered_data, x='Manager', y='Productivity', color='Manager', title="Productivity by Manager")
-        st.plotly_chart(fig1)
-
-
-
-        # 3. Total Output by Manager and Product Type
-        st.header("Total Output by Manager and Product Type")
-        fig3 = px.bar(filtered_data, x='Manager', y='Labor_Total_Output', color='Product_Type', barmode='group',
-                      title="Total Output by Manager and Product Type")
-        st.plotly_chart(fig3)
-
-        # 4. Productivity Zone Distribution by Manager
-        st.header("Productivity Zone Distribution by Manager")
-        fig4 = px.histogram(filtered_data, x='Manager', color='Productivity_Zone',
-                            title="Productivity Zone Distribution by Manager")
-        st.plotly_chart(fig4)
-
-        # 5. Efficiency Rate by Manager
-        st.header("Efficiency Rate by Manager")
-        fig5 = px.box(filtered_data, x='Manager', y='Labor_Efficiency_Rate', color='Manager',
-                      title="Efficiency Rate by Manager")
-        st.plotly_chart(fig5)
-
-    elif parameter == "Factory Units":
-
-        # 1. Overall Productivity by Factory Unit
-        st.header("Overall Productivity by Factory Unit")
-        fig1 = px.bar(filtered_data, x='Factory_Unit', y='Productivity', color='Factory_Unit',
-                      title="Productivity by Factory Unit")
-        st.plotly_chart(fig1)
-
-
-
-        # 3. Total Output by Factory Unit and Product Type
-        st.header("Total Output by Factory Unit and Product Type")
-        fig3 = px.bar(filtered_data, x='Factory_Unit', y='Labor_Total_Output', color='Product_Type', barmode='group',
-                      title="Total Output by Factory Unit and Product Type")
-        st.plotly_chart(fig3)
-
-        # 4. Productivity Zone Distribution by Factory Unit
-        st.header("Productivity Zone Distribution by Factory Unit")
-        fig4 = px.histogram(filtered_data, x='Factory_Unit', color='Productivity_Zone',
-                            title="Productivity Zone Distribution by Factory Unit"
-                            ,color_discrete_map={'Green': 'green', 'Yellow': 'yellow', 'Red': 'red'})
-        st.plotly_chart(fig4)
-
-        # 5. Efficiency Rate by Factory Unit
-        st.header("Efficiency Rate by Factory Unit")
-        fig5 = px.box(filtered_data, x='Factory_Unit', y='Labor_Efficiency_Rate', color='Factory_Unit',
-                      title="Efficiency Rate by Factory Unit")
-        st.plotly_chart(fig5)
-
-    elif parameter == "Machine Unit":
-
-        # 1. Overall Productivity by Machine Unit
-        st.header("Overall Productivity by Machine Unit")
-        fig1 = px.bar(filtered_data, x='Machine_Unit', y='Productivity', color='Machine_Unit',
-                      title="Productivity by Machine Unit")
-        st.plotly_chart(fig1)
-
-
-        # 3. Total Output by Machine Unit and Product Type
-        st.header("Total Output by Machine Unit and Product Type")
-        fig3 = px.bar(filtered_data, x='Machine_Unit', y='Labor_Total_Output', color='Product_Type', barmode='group',
-                      title="Total Output by Machine Unit and Product Type")
-        st.plotly_chart(fig3)
-
-        # 4. Productivity Zone Distribution by Machine Unit
-        st.header("Productivity Zone Distribution by Machine Unit")
-        fig4 = px.histogram(filtered_data, x='Machine_Unit', color='Productivity_Zone',
-                            title="Productivity Zone Distribution by Machine Unit",
-                            color_discrete_map={'Green': 'green', 'Yellow': 'yellow', 'Red': 'red'})
-        st.plotly_chart(fig4)
-
-        # 5. Efficiency Rate by Machine Unit
-        st.header("Efficiency Rate by Machine Unit")
-        fig5 = px.box(filtered_data, x='Machine_Unit', y='Labor_Efficiency_Rate', color='Machine_Unit',
-                      title="Efficiency Rate by Machine Unit")
-        st.plotly_chart(fig5)
 
 elif analysis_choice == "Visual Themes of Labor Productivity":
     if theme == "Productivity Pulse":
@@ -902,32 +1521,23 @@ elif analysis_choice == "Visual Themes of Labor Productivity":
 
 
         # Group the filtered data based on the selected time interval
-        if time_interval == "Weekly":
-            filtered_data['Week'] = filtered_data['Date'].dt.isocalendar().week
-            interval_data = filtered_data.groupby(['Week', 'Shift']).mean(numeric_only=True).reset_index()
-            time_col = 'Week'
-        elif time_interval == "Monthly":
-            filtered_data['Month'] = filtered_data['Date'].dt.month
-            interval_data = filtered_data.groupby(['Month', 'Shift']).mean(numeric_only=True).reset_index()
-            time_col = 'Month'
-        else:  # Yearly
-            filtered_data['Year'] = filtered_data['Date'].dt.year
-            interval_data = filtered_data.groupby(['Year', 'Shift']).mean(numeric_only=True).reset_index()
-            time_col = 'Year'
+        interval_data = tables[time_interval]
+        time_col = analytics.INTERVAL_KEYS[time_interval]
 
         # 1. Time-Series Productivity by Shift
         st.header("Productivity Trends by Shift")
         fig1 = px.line(interval_data, x=time_col, y='Productivity', color='Shift', markers=True,
+                       error_y=ci_column(interval_data, 'Productivity'),
                        title=f"Productivity Trends Over {time_interval}",
                        labels={time_col: time_interval, 'Productivity': 'Productivity (%)'})
         st.plotly_chart(fig1)
 
         # 2. Shift-wise Productivity Peaks and Troughs
         st.header("Productivity Comparison Across Shifts")
-        fig2 = px.bar(filtered_data, x='Shift', y='Productivity', color='Shift',
-                      title="Shift-wise Productivity Peaks and Troughs",
-                      labels={'Productivity': 'Productivity (%)'})
-        st.plotly_chart(fig2)
+        fig2 = payload.govern(px.bar, filtered_data, x='Shift', y='Productivity', color='Shift',
+                                      title="Shift-wise Productivity Peaks and Troughs",
+                                      labels={'Productivity': 'Productivity (%)'})
+        selectable_chart(fig2, current_page, 'shift_peaks', {'x': 'Shift'})
 
         # 3. Anomaly Detection in Productivity (Time-Series Analysis)
         st.header("Anomaly Detection in Productivity")
@@ -939,24 +1549,25 @@ elif analysis_choice == "Visual Themes of Labor Productivity":
             shift_data = interval_data[interval_data['Shift'] == shift]
             mean_prod = shift_data['Productivity'].mean()
             std_prod = shift_data['Productivity'].std()
-            anomalies = shift_data[(shift_data['Productivity'] > mean_prod + 1.5 * std_prod) |
+            outliers = shift_data[(shift_data['Productivity'] > mean_prod + 1.5 * std_prod) |
                                    (shift_data['Productivity'] < mean_prod - 1.5 * std_prod)]
-            fig3.add_scatter(x=anomalies[time_col], y=anomalies['Productivity'], mode='markers',
+            fig3.add_scatter(x=outliers[time_col], y=outliers['Productivity'], mode='markers',
                              marker=dict(color='red', size=10), name=f"{shift} Anomalies")
 
         st.plotly_chart(fig3)
 
         # 4. Productivity Distribution Across Time Intervals
         st.header("Productivity Distribution by Time Interval")
+        filtered_data[time_col] = analytics.TIME_KEYS[time_col](filtered_data['Date'])
         if time_interval == "Weekly":
-            fig4 = px.box(filtered_data, x='Week', y='Productivity', color='Shift',
-                          title="Weekly Productivity Distribution")
+            fig4 = payload.govern(px.box, filtered_data, x='Week', y='Productivity', color='Shift',
+                                          title="Weekly Productivity Distribution")
         elif time_interval == "Monthly":
-            fig4 = px.box(filtered_data, x='Month', y='Productivity', color='Shift',
-                          title="Monthly Productivity Distribution")
+            fig4 = payload.govern(px.box, filtered_data, x='Month', y='Productivity', color='Shift',
+                                          title="Monthly Productivity Distribution")
         else:
-            fig4 = px.box(filtered_data, x='Year', y='Productivity', color='Shift',
-                          title="Yearly Productivity Distribution")
+            fig4 = payload.govern(px.box, filtered_data, x='Year', y='Productivity', color='Shift',
+                                          title="Yearly Productivity Distribution")
 
         st.plotly_chart(fig4)
 
@@ -967,7 +1578,7 @@ elif analysis_choice == "Visual Themes of Labor Productivity":
 
         # Departmental Productivity Comparison over Selected Time Interval
         st.header("Departmental Productivity Comparison")
-        fig1 = px.bar(
+        fig1 = payload.govern(px.bar,
             filtered_data,
             x='Department',
             y='Productivity',
@@ -979,7 +1590,7 @@ elif analysis_choice == "Visual Themes of Labor Productivity":
         st.plotly_chart(fig1)
         # Managerial Influence on Departmental Productivity
         st.header("Manager's Influence on Departmental Productivity")
-        fig2 = px.scatter(
+        fig2 = payload.govern(px.scatter,
             filtered_data,
             x='Manager',
             y='Productivity',
@@ -990,7 +1601,7 @@ elif analysis_choice == "Visual Themes of Labor Productivity":
         st.plotly_chart(fig2)
         # Bar chart showing average productivity by Manager
         st.header("Average Productivity by Manager")
-        fig3 = px.bar(
+        fig3 = payload.govern(px.bar,
             filtered_data,
             x='Manager',
             y='Productivity',
@@ -1002,7 +1613,7 @@ elif analysis_choice == "Visual Themes of Labor Productivity":
         st.plotly_chart(fig3)
         # Departmental Efficiency by Manager
         st.header("Departmental Efficiency by Manager")
-        fig4 = px.box(
+        fig4 = payload.govern(px.box,
             filtered_data,
             x='Department',
             y='Labor_Efficiency_Rate',
@@ -1013,7 +1624,7 @@ elif analysis_choice == "Visual Themes of Labor Productivity":
         st.plotly_chart(fig4)
         # Departmental Output vs. Managerial Influence
         st.header("Departmental Output vs. Managerial Influence")
-        fig5 = px.scatter(
+        fig5 = payload.govern(px.scatter,
             filtered_data,
             x='Manager',
             y='Labor_Total_Output',
@@ -1028,35 +1639,37 @@ elif analysis_choice == "Visual Themes of Labor Productivity":
 
         # 1. Stacked Bar Chart: Productivity by Factory and Machine Unit
         st.header("Productivity by Factory and Machine Unit (Stacked)")
-        stacked_data = filtered_data.groupby(['Factory_Unit', 'Machine_Unit'])['Productivity'].mean().reset_index()
+        tree = hierarchy_tree(filtered_data, view_key, filters)
+        stacked_data = tree[(tree['Hierarchy'] == 'Factory → Machine → Shift') & (tree['depth'] == 2)]
         fig1 = px.bar(stacked_data, x='Factory_Unit', y='Productivity', color='Machine_Unit', barmode='stack',
                       title="Stacked Productivity by Factory and Machine Unit",
                       labels={'Productivity': 'Average Productivity (%)'})
-        st.plotly_chart(fig1)
+        selectable_chart(fig1, current_page, 'factory_machine_stacked', {'x': 'Factory_Unit', 'legendgroup': 'Machine_Unit'})
 
         # 2. Bar Chart: Productivity by Machine Unit
         st.header("Productivity by Machine Unit")
-        bar_data = filtered_data.groupby('Machine_Unit')['Productivity'].mean().reset_index()
+        bar_data = tables['productivity_by_machine']
         fig2 = px.bar(bar_data, x='Machine_Unit', y='Productivity', color='Productivity',
+                      error_y=ci_column(bar_data, 'Productivity'),
                       title="Productivity by Machine Unit",
                       labels={'Productivity': 'Average Productivity (%)'},
                       color_continuous_scale="Cividis")
-        st.plotly_chart(fig2)
+        selectable_chart(fig2, current_page, 'productivity_by_machine', {'x': 'Machine_Unit'})
 
         # 3. Scatter Plot: Productivity by Factory and Machine Units
         st.header("Scatter Plot of Productivity by Factory and Machine Units")
         scatter_data = filtered_data[['Factory_Unit', 'Machine_Unit', 'Productivity']]
-        fig3 = px.scatter(scatter_data, x='Factory_Unit', y='Machine_Unit', size='Productivity', color='Productivity',
-                          title="Scatter Plot of Productivity by Factory and Machine Units",
-                          labels={'Productivity': 'Productivity (%)'},
-                          color_continuous_scale="Plasma", size_max=10)
+        fig3 = payload.govern(px.scatter, scatter_data, x='Factory_Unit', y='Machine_Unit', size='Productivity', color='Productivity',
+                                          title="Scatter Plot of Productivity by Factory and Machine Units",
+                                          labels={'Productivity': 'Productivity (%)'},
+                                          color_continuous_scale="Plasma", size_max=10)
         st.plotly_chart(fig3)
 
         # 4. Box Plot: Productivity Variation by Factory and Machine Units
         st.header("Productivity Variation by Factory and Machine Units")
-        fig4 = px.box(filtered_data, x='Factory_Unit', y='Productivity', color='Machine_Unit',
-                      title="Productivity Variation by Factory and Machine Units",
-                      labels={'Productivity': 'Productivity (%)'})
+        fig4 = payload.govern(px.box, filtered_data, x='Factory_Unit', y='Productivity', color='Machine_Unit',
+                                      title="Productivity Variation by Factory and Machine Units",
+                                      labels={'Productivity': 'Productivity (%)'})
         st.plotly_chart(fig4)
 
 
@@ -1064,37 +1677,60 @@ elif analysis_choice == "Visual Themes of Labor Productivity":
 
         # 4. Violin Plot: Productivity Distribution by Factory Unit
         st.header("Productivity Distribution by Factory Unit")
-        fig4 = px.violin(filtered_data, x='Factory_Unit', y='Productivity', color='Factory_Unit', box=True,
-                         points="all",
-                         title="Violin Plot of Productivity Distribution by Factory Unit",
-                         labels={'Productivity': 'Productivity (%)'})
+        fig4 = payload.govern(px.violin, filtered_data, x='Factory_Unit', y='Productivity', color='Factory_Unit', box=True,
+                                         points="all",
+                                         title="Violin Plot of Productivity Distribution by Factory Unit",
+                                         labels={'Productivity': 'Productivity (%)'})
         st.plotly_chart(fig4)
 
     elif theme == "Target Tracker":
 
         # 1. Grouped Bar Chart: Factory and Machine Unit Productivity Comparison
         st.header("Factory and Machine Unit Productivity Comparison (Grouped)")
-        grouped_data = filtered_data.groupby(['Factory_Unit', 'Machine_Unit'])['Productivity'].mean().reset_index()
+        grouped_data = tables['productivity_by_factory_machine']
         fig1 = px.bar(grouped_data, x='Factory_Unit', y='Productivity', color='Machine_Unit', barmode='group',
+                      error_y=ci_column(grouped_data, 'Productivity'),
                       title="Grouped Productivity by Factory and Machine Unit",
                       labels={'Productivity': 'Average Productivity (%)'})
-        st.plotly_chart(fig1)
+        selectable_chart(fig1, current_page, 'factory_machine_grouped', {'x': 'Factory_Unit', 'legendgroup': 'Machine_Unit'})
 
-        # 2. Treemap Chart: Hierarchical View of Productivity by Factory and Machine Units
+        # 2. Treemap Chart: Hierarchical View of Productivity, drawn from the rollup tree
         st.header("Productivity Hierarchy (Treemap)")
-        fig2 = px.treemap(filtered_data, path=['Factory_Unit', 'Machine_Unit'], values='Productivity',
-                          color='Productivity', color_continuous_scale="Cividis",
-                          title="Treemap Chart of Productivity by Factory and Machine Unit",
-                          labels={'Productivity': 'Average Productivity (%)'})
+        tree = hierarchy_tree(filtered_data, view_key, filters)
+        hierarchy_name = st.selectbox("Hierarchy", list(hierarchy.HIERARCHIES))
+        drill_root = st.selectbox("Drill Into", ["All"] + hierarchy.branches(tree, hierarchy_name))
+        root = None if drill_root == "All" else drill_root
+        # Tiles are sized by summed Productivity, as the treemap always was, and coloured by its mean
+        hover = ("%{label}<br>Total Productivity: %{value:,.0f}<br>Records: %{customdata:,.0f}"
+                 "<br>Average Productivity: %{color:.1f}%<extra></extra>")
+
+        nodes = hierarchy.visible_nodes(tree, hierarchy_name, root, depth=2)
+        fig2 = go.Figure(go.Treemap(
+            ids=nodes['id'], labels=nodes['label'], parents=nodes['parent'], values=nodes['Productivity_Sum'],
+            customdata=nodes['Rows'], branchvalues='total', hovertemplate=hover,
+            marker=dict(colors=nodes['Productivity'], colorscale="Cividis", showscale=True,
+                        colorbar=dict(title="Average Productivity (%)"))
+        ))
+        fig2.update_layout(title=f"Treemap Chart of Productivity by {hierarchy_name}")
         st.plotly_chart(fig2)
 
-
+        # 3. Sunburst Chart: every level below the drill point at once
+        st.header("Productivity Hierarchy (Sunburst)")
+        nodes = hierarchy.visible_nodes(tree, hierarchy_name, root, depth=len(hierarchy.HIERARCHIES[hierarchy_name]))
+        fig3 = go.Figure(go.Sunburst(
+            ids=nodes['id'], labels=nodes['label'], parents=nodes['parent'], values=nodes['Productivity_Sum'],
+            customdata=nodes['Rows'], branchvalues='total', hovertemplate=hover,
+            marker=dict(colors=nodes['Productivity'], colorscale="Cividis", showscale=True,
+                        colorbar=dict(title="Average Productivity (%)"))
+        ))
+        fig3.update_layout(title=f"Sunburst Chart of Productivity by {hierarchy_name}")
+        st.plotly_chart(fig3)
 
         # 4. Box Plot: Productivity Variation by Machine Unit within Factory Units
         st.header("Productivity Variation by Machine Unit within Factory Units")
-        fig4 = px.box(filtered_data, x='Factory_Unit', y='Productivity', color='Machine_Unit',
-                      title="Box Plot of Productivity Variation by Factory Unit and Machine Unit",
-                      labels={'Productivity': 'Productivity (%)'})
+        fig4 = payload.govern(px.box, filtered_data, x='Factory_Unit', y='Productivity', color='Machine_Unit',
+                                      title="Box Plot of Productivity Variation by Factory Unit and Machine Unit",
+                                      labels={'Productivity': 'Productivity (%)'})
         st.plotly_chart(fig4)
 
     elif theme == "Shift Synergy":
@@ -1102,12 +1738,12 @@ elif analysis_choice == "Visual Themes of Labor Productivity":
 
         # 1. Grouped Bar Chart: Productivity Rates by Shift and Department
         st.header("Productivity Rates by Shift and Department")
-        grouped_data = filtered_data.groupby(['Shift', 'Department', 'Productivity_Zone'])[
-            'Productivity'].mean().reset_index()
+        grouped_data = tables['productivity_by_shift_department_zone']
         fig1 = px.bar(grouped_data, x='Shift', y='Productivity', color='Productivity_Zone', barmode='group',
+                      error_y=ci_column(grouped_data, 'Productivity'),
                       facet_col='Department', title="Productivity Rates by Shift and Department",
                       labels={'Productivity': 'Average Productivity (%)'},color_discrete_map={'Green': 'green', 'Yellow': 'yellow', 'Red': 'red'})
-        st.plotly_chart(fig1)
+        selectable_chart(fig1, current_page, 'shift_zone', {'x': 'Shift', 'legendgroup': 'Productivity_Zone'})
 
 
 
@@ -1118,15 +1754,15 @@ elif analysis_choice == "Visual Themes of Labor Productivity":
 
         # 1. Line Chart with Real-Time Anomaly Detection
         st.header("Real-Time Productivity Trends with Anomaly Detection")
-        fig1 = px.scatter(filtered_data, x='Date', y='Productivity', color='Shift',
-                       title="Real-Time Productivity Trends by Shift",
-                       labels={'Productivity': 'Productivity (%)'})
+        fig1 = payload.govern(px.scatter, filtered_data, x='Date', y='Productivity', color='Shift',
+                                       title="Real-Time Productivity Trends by Shift",
+                                       labels={'Productivity': 'Productivity (%)'})
 
         # Highlight anomalies in red for each shift
         for shift in filtered_data['Shift'].unique():
             shift_data = filtered_data[filtered_data['Shift'] == shift]
-            anomalies = shift_data[shift_data['Productivity'] < anomaly_threshold]
-            fig1.add_scatter(x=anomalies['Date'], y=anomalies['Productivity'], mode='markers',
+            outliers = shift_data[shift_data['Productivity'] < anomaly_threshold]
+            fig1.add_scatter(x=outliers['Date'], y=outliers['Productivity'], mode='markers',
                              marker=dict(color='red', size=8, symbol='x'),
                              name=f"{shift} Anomalies")
 
@@ -1134,12 +1770,13 @@ elif analysis_choice == "Visual Themes of Labor Productivity":
 
         # 2. Scatter Plot for Productivity Zones with Anomaly Markers
         st.header("Productivity Zones with Anomaly Markers")
-        fig2 = px.scatter(filtered_data, x='Shift', y='Productivity', color='Productivity_Zone',
-                          title="Scatter Plot of Productivity Zones by Shift",
-                          labels={'Productivity'})
+        fig2 = payload.govern(px.scatter, filtered_data, x='Shift', y='Productivity', color='Productivity_Zone',
+                                          title="Scatter Plot of Productivity Zones by Shift",
+                                          labels={'Productivity'})
 
-        # Add red markers for anomalies
-        fig2.add_scatter(x=anomalies['Shift'], y=anomalies['Productivity'], mode='markers',
+        # Add red markers for the rows below the threshold, across every shift
+        outliers = filtered_data[filtered_data['Productivity'] < anomaly_threshold]
+        fig2.add_scatter(x=outliers['Shift'], y=outliers['Productivity'], mode='markers',
                          marker=dict(color='red', size=10, symbol='diamond'),
                          name="Anomalies")
 
@@ -1147,9 +1784,9 @@ elif analysis_choice == "Visual Themes of Labor Productivity":
 
         # 3. Distribution of Productivity Zones with Real-Time Anomaly Detection
         st.header("Productivity Distribution with Anomaly Detection")
-        fig3 = px.box(filtered_data, x='Shift', y='Productivity', color='Productivity_Zone',
-                      title="Productivity Distribution by Shift with Anomaly Detection",
-                      labels={'Productivity': 'Productivity (%)'})
+        fig3 = payload.govern(px.box, filtered_data, x='Shift', y='Productivity', color='Productivity_Zone',
+                                      title="Productivity Distribution by Shift with Anomaly Detection",
+                                      labels={'Productivity': 'Productivity (%)'})
 
         # Add threshold line for anomaly detection
         fig3.add_hline(y=anomaly_threshold, line_dash="dot", line_color="red",
@@ -1161,33 +1798,32 @@ elif analysis_choice == "Visual Themes of Labor Productivity":
 
         # 3. Comparative Violin Plot for Productivity Distribution by Zone
         st.header("Productivity Distribution by Zone Across Shifts")
-        fig3 = px.violin(filtered_data, x='Productivity_Zone', y='Productivity', color='Shift', box=True, points="all",
-                         title="Violin Plot of Productivity by Zone and Shift",
-                         labels={'Productivity': 'Productivity (%)', 'Productivity_Zone': 'Zone'})
+        fig3 = payload.govern(px.violin, filtered_data, x='Productivity_Zone', y='Productivity', color='Shift', box=True, points="all",
+                                         title="Violin Plot of Productivity by Zone and Shift",
+                                         labels={'Productivity': 'Productivity (%)', 'Productivity_Zone': 'Zone'})
         st.plotly_chart(fig3)
 
     elif theme == "Efficiency Compass":
         # 1. Scatter Plot: Efficiency vs. Productivity by Department
         st.header("Labor Efficiency Rate vs. Productivity by Department")
-        fig1 = px.scatter(filtered_data, x='Labor_Efficiency_Rate', y='Productivity', color='Department',
-                          title="Labor Efficiency Rate vs. Productivity (Department-wise)",
-                          labels={'Labor_Efficiency_Rate': 'Labor Efficiency Rate (%)',
-                                  'Productivity': 'Productivity (%)'},
-                          hover_data=['Machine_Unit'])
-        fig1.update_traces(marker=dict(size=10))
+        fig1 = payload.govern(px.scatter, filtered_data, x='Labor_Efficiency_Rate', y='Productivity', color='Department',
+                                          title="Labor Efficiency Rate vs. Productivity (Department-wise)",
+                                          labels={'Labor_Efficiency_Rate': 'Labor Efficiency Rate (%)',
+                                                  'Productivity': 'Productivity (%)'},
+                                          hover_data=['Machine_Unit'])
+        fig1.update_traces(marker=dict(size=10), selector=dict(type='scatter'))
         st.plotly_chart(fig1)
 
         # 2. Box Plot: Distribution of Labor Efficiency by Machine Unit
         st.header("Distribution of Labor Efficiency by Machine Unit")
-        fig2 = px.box(filtered_data, x='Machine_Unit', y='Labor_Efficiency_Rate', color='Machine_Unit',
-                      title="Labor Efficiency Distribution by Machine Unit",
-                      labels={'Labor_Efficiency_Rate': 'Labor Efficiency Rate (%)'})
+        fig2 = payload.govern(px.box, filtered_data, x='Machine_Unit', y='Labor_Efficiency_Rate', color='Machine_Unit',
+                                      title="Labor Efficiency Distribution by Machine Unit",
+                                      labels={'Labor_Efficiency_Rate': 'Labor Efficiency Rate (%)'})
         st.plotly_chart(fig2)
 
         # 3. Stacked Bar Chart: Average Efficiency and Productivity by Department
         st.header("Average Efficiency and Productivity by Department")
-        dept_data = filtered_data.groupby('Department').agg(
-            {'Labor_Efficiency_Rate': 'mean', 'Productivity': 'mean'}).reset_index()
+        dept_data = tables['department_summary']
         fig3 = go.Figure()
         fig3.add_trace(go.Bar(x=dept_data['Department'], y=dept_data['Labor_Efficiency_Rate'], name='Efficiency Rate',
                               marker_color='blue'))
@@ -1199,19 +1835,17 @@ elif analysis_choice == "Visual Themes of Labor Productivity":
 
         # 4. Bubble Chart: Efficiency and Productivity by Department and Machine Unit
         st.header("Efficiency and Productivity by Department and Machine Unit")
-        fig4 = px.scatter(filtered_data, x='Labor_Efficiency_Rate', y='Productivity', size='Productivity',
-                          color='Department', hover_name='Machine_Unit',
-                          title="Efficiency vs. Productivity by Department and Machine Unit",
-                          labels={'Labor_Efficiency_Rate': 'Labor Efficiency Rate (%)',
-                                  'Productivity': 'Productivity (%)'})
-        fig4.update_traces(marker=dict(sizemode='diameter', opacity=0.7))
+        fig4 = payload.govern(px.scatter, filtered_data, x='Labor_Efficiency_Rate', y='Productivity', size='Productivity',
+                                          color='Department', hover_name='Machine_Unit',
+                                          title="Efficiency vs. Productivity by Department and Machine Unit",
+                                          labels={'Labor_Efficiency_Rate': 'Labor Efficiency Rate (%)',
+                                                  'Productivity': 'Productivity (%)'})
+        fig4.update_traces(marker=dict(sizemode='diameter', opacity=0.7), selector=dict(type='scatter'))
         st.plotly_chart(fig4)
     elif theme == "Productivity Evolution":
 
-        # Ensure 'Year' and 'Month' columns exist and aggregate by month-year for heatmap
-        filtered_data['Month'] = filtered_data['Date'].dt.month
-        filtered_data['Year'] = filtered_data['Date'].dt.year
-        pivot_data = filtered_data.pivot_table(index='Year', columns='Month', values='Productivity', aggfunc='mean')
+        # Aggregate by month-year for heatmap
+        pivot_data = tables['productivity_by_year_month'].pivot(index='Year', columns='Month', values='Productivity')
 
         st.header("Monthly Productivity Patterns by Year")
         fig3 = px.imshow(
@@ -1227,18 +1861,27 @@ elif analysis_choice == "Visual Themes of Labor Productivity":
         time_interval = st.selectbox("Select Time Interval", ["Weekly", "Monthly", "Yearly"])
 
         # Group the filtered data based on the selected time interval
-        if time_interval == "Weekly":
-            filtered_data['Week'] = filtered_data['Date'].dt.isocalendar().week
-            interval_data = filtered_data.groupby(['Week', 'Shift']).mean(numeric_only=True).reset_index()
-            time_col = 'Week'
-        elif time_interval == "Monthly":
-            filtered_data['Month'] = filtered_data['Date'].dt.month
-            interval_data = filtered_data.groupby(['Month', 'Shift']).mean(numeric_only=True).reset_index()
-            time_col = 'Month'
-        else:  # Yearly
-            filtered_data['Year'] = filtered_data['Date'].dt.year
-            interval_data = filtered_data.groupby(['Year', 'Shift']).mean(numeric_only=True).reset_index()
-            time_col = 'Year'
+        interval_data = tables[time_interval]
+        time_col = analytics.EVOLUTION_KEYS[time_interval]
+
+        # Level shifts of the machines in view, detected once per dataset version
+        level_shifts = productivity_changepoints(data, data_key)
+        level_shifts = level_shifts[
+            (level_shifts['Week_Start'] >= pd.to_datetime(start_date)) &
+            (level_shifts['Week_Start'] <= pd.to_datetime(end_date)) &
+            (level_shifts['Machine_Unit'].isin(filtered_data['Machine_Unit'].unique()))
+        ]
+
+        # Forecasts of the series in view, fitted once per dataset version and model
+        forecast_model = st.selectbox("Forecast Model", list(forecasting.MODELS))
+        forecasts = productivity_forecasts(data, data_key, forecasting.MODELS[forecast_model])
+        forecasts = forecasts[
+            forecasts['Factory_Unit'].isin(filtered_data['Factory_Unit'].unique()) &
+            forecasts['Machine_Unit'].isin(filtered_data['Machine_Unit'].unique()) &
+            forecasts['Shift'].isin(filtered_data['Shift'].unique())
+        ]
+        if time_interval != "Weekly":
+            st.caption(f"Forecasts for the next {forecasting.HORIZON} weeks are drawn on the Weekly view.")
 
         # Generate productivity trend line charts for each shift
         shifts = interval_data['Shift'].unique()
@@ -1250,11 +1893,36 @@ elif analysis_choice == "Visual Themes of Labor Productivity":
                 shift_data,
                 x=time_col,
                 y='Productivity',
+                error_y=ci_column(shift_data, 'Productivity'),
                 title=f"{shift} Shift Productivity Trend ({time_interval})",
                 labels={'Productivity': 'Average Productivity (%)', time_col: time_interval},
                 markers=True
             )
 
+            # Overlay the machines of this shift whose productivity level shifted and stayed shifted
+            shift_breaks = level_shifts[level_shifts['Shift'] == shift]
+            if not shift_breaks.empty:
+                break_x = analytics.TIME_KEYS[time_col](shift_breaks['Week_Start'])
+                fig.add_scatter(
+                    x=break_x,
+                    y=shift_data.groupby(time_col)['Productivity'].mean().reindex(break_x).to_numpy(),
+                    mode='markers',
+                    marker=dict(
+                        symbol=['triangle-up' if c > 0 else 'triangle-down' for c in shift_breaks['Change']],
+                        color=['green' if c > 0 else 'red' for c in shift_breaks['Change']],
+                        size=12
+                    ),
+                    customdata=shift_breaks[['Machine_Unit', 'Before', 'After']].to_numpy(),
+                    hovertemplate="%{customdata[0]}: %{customdata[1]:.1f}% → %{customdata[2]:.1f}%<extra></extra>",
+                    name="Level Shifts"
+                )
+
+            # Continue the weekly line with the forecast of this shift's series
+            if time_interval == "Weekly" and not shift_data.empty:
+                shift_forecast = forecasting.combine_forecasts(forecasts[forecasts['Shift'] == shift])
+                if not shift_forecast.empty:
+                    add_forecast(fig, shift_forecast)
+
             # Customize the chart layout
             fig.update_layout(
                 xaxis_title=time_interval,
@@ -1278,6 +1946,9 @@ elif analysis_choice == "Visual Themes of Labor Productivity":
             markers=True
         )
 
+        if time_interval == "Weekly" and not forecasts.empty and not overall_productivity_trend.empty:
+            add_forecast(fig_overall, forecasting.combine_forecasts(forecasts))
+
         fig_overall.update_layout(
             xaxis_title=time_interval,
             yaxis_title="Average Productivity (%)",
@@ -1296,9 +1967,51 @@ elif analysis_choice == "Visual Themes of Labor Productivity":
             shift_data = interval_data[interval_data['Shift'] == shift]
             mean_prod = shift_data['Productivity'].mean()
             std_prod = shift_data['Productivity'].std()
-            anomalies = shift_data[(shift_data['Productivity'] > mean_prod + 1.5 * std_prod) |
+            outliers = shift_data[(shift_data['Productivity'] > mean_prod + 1.5 * std_prod) |
                                    (shift_data['Productivity'] < mean_prod - 1.5 * std_prod)]
-            fig3.add_scatter(x=anomalies[time_col], y=anomalies['Productivity'], mode='markers',
+            fig3.add_scatter(x=outliers[time_col], y=outliers['Productivity'], mode='markers',
                              marker=dict(color='red', size=10), name=f"{shift} Anomalies")
 
         st.plotly_chart(fig3)
+    elif theme == "Rolling KPIs":
+        st.title("Rolling KPIs")
+        col1, col2, col3 = st.columns(3)
+        rolling_group = rolling.ROLLING_GROUPS[col1.selectbox("Group By", list(rolling.ROLLING_GROUPS))]
+        rolling_metric = col2.selectbox("KPI", rolling.ROLLING_METRICS,
+                                        format_func=lambda m: "Output vs Target (%)" if m == 'Attainment' else m)
+        window = col3.selectbox("Window (days)", rolling.ROLLING_WINDOWS, index=1)
+
+        kpis = rolling_table(filtered_data, view_key, filters, rolling_group)
+        kpis = kpis[kpis['Metric'] == rolling_metric]
+
+        # 1. Moving average over the selected window
+        st.header(f"{window}-Day Moving Average by {rolling_group}")
+        fig1 = px.line(kpis, x='Date', y=f'MA{window}', color=rolling_group,
+                       title=f"{window}-Day Moving Average of {rolling_metric}",
+                       labels={f'MA{window}': rolling_metric})
+        st.plotly_chart(fig1, use_container_width=True)
+
+        # 2. All windows side by side with the EWMA
+        st.header("Short, Medium and Long Windows")
+        window_data = kpis.melt(id_vars=[rolling_group, 'Date'],
+                                value_vars=[f'MA{w}' for w in rolling.ROLLING_WINDOWS] + ['EWMA'],
+                                var_name='Window', value_name=rolling_metric)
+        fig2 = px.line(window_data, x='Date', y=rolling_metric, color='Window',
+                       facet_col=rolling_group, facet_col_wrap=3,
+                       title=f"{rolling_metric}: Moving Averages and EWMA by {rolling_group}",
+                       height=300 * max(1, -(-kpis[rolling_group].nunique() // 3)))
+        st.plotly_chart(fig2, use_container_width=True)
+
+        # 3. Rolling volatility
+        st.header(f"{window}-Day Rolling Standard Deviation")
+        fig3 = px.line(kpis, x='Date', y=f'Std{window}', color=rolling_group,
+                       title=f"{window}-Day Rolling Std of {rolling_metric}",
+                       labels={f'Std{window}': f"Std of {rolling_metric}"})
+        st.plotly_chart(fig3, use_container_width=True)
+
+run_profile.mark('first_render')
+run_profile.save()
+
+# In approximate mode, swap the estimates for exact results as soon as they are cached
+if showing_estimate:
+    await_exact(exact_pending)
@@ -0,0 +1,278 @@
+import argparse
+import asyncio
+import contextlib
+import datetime
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+import numpy as np
+import websockets
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+import shared_store
+from report import APP_PATH, CATEGORY_LABEL, DATE_LABELS, EFFICIENCY_LABEL, MULTISELECT_LABELS, PAGE_LABELS
+
+# What a simulated user does between reruns, with relative weights
+ACTIONS = {'page': 4, 'multiselect': 3, 'dates': 2, 'efficiency': 1, 'reset': 1}
+# Seconds the dashboard server is given to start answering health checks
+STARTUP_TIMEOUT = 120
+# Field of Streamlit's WidgetState message that carries each widget type's value
+STATE_FIELDS = {
+    'radio': 'string_value',
+    'multiselect': 'string_array_value',
+    'date_input': 'string_array_value',
+    'slider': 'double_array_value'
+}
+
+
+# Resident and peak memory of process `pid` in MB, from /proc (None where there is no /proc)
+def memory_mb(pid):
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            status = dict(line.split(':', 1) for line in f if ':' in line)
+    except OSError:
+        return None, None
+    return int(status['VmRSS'].split()[0]) / 1024, int(status['VmHWM'].split()[0]) / 1024
+
+
+# A dashboard server on a free local port, started as it is deployed (`streamlit run`) with this
+# process's environment, so every simulated session shares its caches, dataset and memory
+@contextlib.contextmanager
+def dashboard_server():
+    with socket.socket() as s:
+        s.bind(('localhost', 0))
+        port = s.getsockname()[1]
+    server = subprocess.Popen([sys.executable, '-m', 'streamlit', 'run', APP_PATH, '--server.port', str(port),
+                               '--server.headless', 'true', '--server.fileWatcherType', 'none',
+                               '--browser.gatherUsageStats', 'false'], stdout=subprocess.DEVNULL)
+    try:
+        deadline = time.monotonic() + STARTUP_TIMEOUT
+        while True:
+            try:
+                with urllib.request.urlopen(f'http://localhost:{port}/_stcore/health', timeout=1):
+                    break
+            except OSError:
+                if server.poll() is not None or time.monotonic() > deadline:
+                    raise RuntimeError(f"The dashboard server did not start on port {port}")
+                time.sleep(0.2)
+        yield port, server.pid
+    finally:
+        server.terminate()
+        try:
+            server.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            server.kill()
+
+
+# One browser tab's session over Streamlit's websocket protocol: the widgets the latest run drew
+# (label -> (type, proto)) and the widget values this user has set, sent with every rerun as the
+# frontend sends them
+class Session:
+    def __init__(self, websocket):
+        self.websocket = websocket
+        self.widgets = {}
+        self.states = {}
+        self.query_string = ''
+
+    # Find a widget of the latest run by its label
+    def widget(self, label):
+        try:
+            return self.widgets[label]
+        except KeyError:
+            raise KeyError(f"No widget labelled {label!r}") from None
+
+    def set_value(self, label, value):
+        kind, proto = self.widget(label)
+        state = WidgetState(id=proto.id)
+        if isinstance(value, str):
+            setattr(state, STATE_FIELDS[kind], value)
+        else:
+            values = [v.isoformat() if isinstance(v, datetime.date) else v for v in value]
+            getattr(state, STATE_FIELDS[kind]).data.extend(values)
+        self.states[proto.id] = state
+
+    # Rerun the script and wait for it to finish (past any st.rerun); returns the number of
+    # exceptions the run showed
+    async def run(self):
+        request = BackMsg()
+        request.rerun_script.query_string = self.query_string
+        current = {proto.id for _, proto in self.widgets.values()}
+        request.rerun_script.widget_states.widgets.extend(
+            state for widget_id, state in self.states.items() if widget_id in current)
+        await self.websocket.send(request.SerializeToString())
+        widgets, errors = {}, 0
+        while True:
+            msg = ForwardMsg()
+            msg.ParseFromString(await self.websocket.recv())
+            kind = msg.WhichOneof('type')
+            if kind == 'new_session':
+                widgets, errors = {}, 0
+            elif kind == 'delta' and msg.delta.WhichOneof('type') == 'new_element':
+                element_type = msg.delta.new_element.WhichOneof('type')
+                element = getattr(msg.delta.new_element, element_type)
+                if element_type == 'exception':
+                    errors += 1
+                elif element_type in STATE_FIELDS:
+                    widgets[element.label] = (element_type, element)
+            elif kind == 'page_info_changed':
+                self.query_string = msg.page_info_changed.query_string
+            elif kind == 'script_finished' and msg.script_finished != ForwardMsg.FINISHED_EARLY_FOR_RERUN:
+                break
+        self.widgets = widgets
+        return errors
+
+
+async def _random_action(session, rng, bounds, timeout):
+    action = rng.choices(list(ACTIONS), weights=list(ACTIONS.values()))[0]
+    if action == 'page':
+        category = rng.choice(session.widget(CATEGORY_LABEL)[1].options)
+        session.set_value(CATEGORY_LABEL, category)
+        await asyncio.wait_for(session.run(), timeout)
+        session.set_value(PAGE_LABELS[category], rng.choice(session.widget(PAGE_LABELS[category])[1].options))
+    elif action == 'multiselect':
+        label = rng.choice(list(MULTISELECT_LABELS.values()))
+        options = list(session.widget(label)[1].options)
+        session.set_value(label, rng.sample(options, rng.randint(0, min(3, len(options)))))
+    elif action == 'dates':
+        start, end = bounds['dates']
+        days = (end - start).days
+        first = start + datetime.timedelta(days=rng.randint(0, days))
+        last = first + datetime.timedelta(days=rng.randint(0, (end - first).days))
+        session.set_value(DATE_LABELS['start_date'], [first])
+        session.set_value(DATE_LABELS['end_date'], [last])
+    elif action == 'efficiency':
+        low, high = bounds['efficiency']
+        session.set_value(EFFICIENCY_LABEL, sorted(rng.uniform(low, high) for _ in range(2)))
+    else:
+        for label in MULTISELECT_LABELS.values():
+            session.set_value(label, [])
+        session.set_value(DATE_LABELS['start_date'], [bounds['dates'][0]])
+        session.set_value(DATE_LABELS['end_date'], [bounds['dates'][1]])
+        session.set_value(EFFICIENCY_LABEL, bounds['efficiency'])
+    return action
+
+
+# One simulated user: open the dashboard, then click through random pages and filters once every
+# session is open. Each rerun's latency is recorded with the action that triggered it.
+async def simulate_user(port, seed, actions, timeout, barrier):
+    rng = random.Random(seed)
+    async with websockets.connect(f'ws://localhost:{port}/_stcore/stream', subprotocols=['streamlit'],
+                                  max_size=None) as websocket:
+        session = Session(websocket)
+        started = time.perf_counter()
+        errors = await asyncio.wait_for(session.run(), timeout)
+        records = [('open', time.perf_counter() - started, errors)]
+        default = {label: session.widget(label)[1].default for label in [*DATE_LABELS.values(), EFFICIENCY_LABEL]}
+        bounds = {
+            'dates': tuple(datetime.date.fromisoformat(default[DATE_LABELS[key]][0]) for key in DATE_LABELS),
+            'efficiency': list(default[EFFICIENCY_LABEL])
+        }
+        await barrier.wait()
+        window_start = time.time()
+        for _ in range(actions):
+            try:
+                action = await _random_action(session, rng, bounds, timeout)
+                started = time.perf_counter()
+                errors = await asyncio.wait_for(session.run(), timeout)
+                records.append((action, time.perf_counter() - started, errors))
+            except Exception as e:
+                records.append(('failed', float('nan'), 1))
+                print(f"user {seed}: {type(e).__name__}: {e}", file=sys.stderr)
+    return {'records': records, 'start': window_start, 'end': time.time()}
+
+
+async def _simulate_users(port, users, actions, timeout, seed):
+    barrier = asyncio.Barrier(users)
+    return await asyncio.gather(*(simulate_user(port, seed + i, actions, timeout, barrier) for i in range(users)))
+
+
+# Run `users` simulated sessions at once against one fresh dashboard server and summarise their
+# rerun latencies. Sessions share the server's caches and dataset as browser tabs do; memory is
+# the server process's resident set after the level and its peak during it.
+def run_level(users, actions, timeout, seed):
+    with dashboard_server() as (port, pid):
+        sessions = asyncio.run(_simulate_users(port, users, actions, timeout, seed))
+        rss, peak = memory_mb(pid)
+
+    samples = [record for session in sessions for record in session['records']]
+    elapsed = max(s['end'] for s in sessions) - min(s['start'] for s in sessions)
+    latencies = np.array([latency for action, latency, _ in samples if action not in ('open', 'failed')])
+    opens = np.array([latency for action, latency, _ in samples if action == 'open'])
+    p50, p90, p99 = np.percentile(latencies, [50, 90, 99]) if len(latencies) else (np.nan,) * 3
+    return {
+        'users': users,
+        'reruns': len(latencies),
+        'errors': sum(errors > 0 for _, _, errors in samples),
+        'open_p50_s': float(np.median(opens)) if len(opens) else None,
+        'p50_s': float(p50),
+        'p90_s': float(p90),
+        'p99_s': float(p99),
+        'max_s': float(latencies.max()) if len(latencies) else None,
+        'throughput_per_s': len(latencies) / elapsed if elapsed > 0 else None,
+        'rss_mb': rss,
+        'peak_rss_mb': peak
+    }
+
+
+def print_table(results):
+    header = f"{'users':>5} {'reruns':>6} {'errors':>6} {'open p50':>9} {'p50':>7} {'p90':>7} {'p99':>7} " \
+             f"{'max':>7} {'reruns/s':>9} {'RSS MB':>8} {'peak MB':>8}"
+    print(header)
+    for r in results:
+        print(f"{r['users']:>5} {r['reruns']:>6} {r['errors']:>6} {r['open_p50_s'] or 0:>9.2f} {r['p50_s']:>7.2f} "
+              f"{r['p90_s']:>7.2f} {r['p99_s']:>7.2f} {r['max_s'] or 0:>7.2f} {r['throughput_per_s'] or 0:>9.2f} "
+              f"{r['rss_mb'] or 0:>8.0f} {r['peak_rss_mb'] or 0:>8.0f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Simulate concurrent dashboard sessions against labour.py and report rerun latency, "
+                    "throughput and memory as concurrency grows.")
+    parser.add_argument('--dataset', help="Workbook or CSV to publish into a private shared store "
+                                          "(default: the dashboard's own default dataset)")
+    parser.add_argument('--users', default='1,2,4,8', help="Comma-separated concurrency levels")
+    parser.add_argument('--actions', type=int, default=20, help="Random actions per simulated user")
+    parser.add_argument('--timeout', type=float, default=300, help="Seconds allowed per rerun")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--warm-cache', action='store_true',
+                        help="Use the configured disk cache instead of a fresh one per run")
+    parser.add_argument('--json', help="Also write the results to this JSON file")
+    args = parser.parse_args(argv)
+
+    scratch = tempfile.mkdtemp(prefix='labour-loadtest-')
+    if not args.warm_cache:
+        os.environ['LABOUR_CACHE_DIR'] = os.path.join(scratch, 'cache')
+    if args.dataset:
+        os.environ['LABOUR_STORE_ROOT'] = os.path.join(scratch, 'store')
+        df, quarantine = shared_store.read_dataset(args.dataset)
+        shared_store.publish(df, quarantine=quarantine)
+        del df, quarantine
+
+    results = []
+    try:
+        for users in (int(n) for n in args.users.split(',')):
+            result = run_level(users, args.actions, args.timeout, args.seed + 1000 * users)
+            print(f"{users} user(s): {result['reruns']} reruns, p90 {result['p90_s']:.2f}s", file=sys.stderr)
+            results.append(result)
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    print_table(results)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,229 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+# Per-chart payload budget of this deployment: points drawn and estimated bytes of figure JSON
+CHART_MAX_POINTS = int(os.environ.get('LABOUR_CHART_MAX_POINTS', '20000'))
+CHART_BUDGET_BYTES = int(os.environ.get('LABOUR_CHART_BUDGET_KB', '1024')) * 1024
+# Smallest share of the rows a sample may keep; below it binned aggregates say more
+MIN_SAMPLE_FRACTION = float(os.environ.get('LABOUR_CHART_MIN_SAMPLE', '0.1'))
+BINS = 40
+TABLE_ROWS = 200
+
+# Levels of detail, most detailed first
+LEVELS = ['raw', 'sampled', 'binned', 'table']
+# Charts that draw one mark per row, so a sample is still a faithful picture of the rows
+SAMPLED_KINDS = {'scatter', 'strip', 'box', 'violin'}
+# plotly express arguments naming columns, and those that split rows into traces
+COLUMN_ARGS = ['x', 'y', 'color', 'size', 'symbol', 'text', 'hover_name', 'hover_data', 'custom_data',
+               'facet_row', 'facet_col', 'names', 'values', 'line_group', 'pattern_shape']
+GROUP_ARGS = ['color', 'symbol', 'pattern_shape', 'line_group', 'facet_row', 'facet_col']
+# Arguments that only style a figure and carry over to its binned form
+STYLE_ARGS = ['title', 'labels', 'color_discrete_map', 'color_discrete_sequence', 'color_continuous_scale',
+              'barmode', 'height', 'width', 'orientation', 'facet_col_wrap', 'hole', 'markers']
+
+
+def _names(value):
+    if value is None:
+        return []
+    if isinstance(value, dict):
+        return list(value)
+    return list(value) if isinstance(value, (list, tuple)) else [value]
+
+
+def _used(df, kwargs, args):
+    return list(dict.fromkeys(c for arg in args for c in _names(kwargs.get(arg)) if isinstance(c, str) and c in df))
+
+
+# Bytes one value of a column adds to the figure JSON: numeric arrays travel base64-encoded,
+# dates as ISO strings and text as quoted strings
+def _value_bytes(series):
+    if pd.api.types.is_bool_dtype(series) or pd.api.types.is_numeric_dtype(series):
+        return 11
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return 24
+    sample = series.head(1000).astype(str)
+    return (sample.str.len().mean() if len(sample) else 0) + 3
+
+
+# Points and estimated bytes of the figure plotly express would build from these rows
+def estimate(df, kwargs):
+    ys = [c for c in _names(kwargs.get('y')) if c in df]
+    per_trace = sum(_value_bytes(df[c]) for c in _used(df, kwargs, COLUMN_ARGS) if c not in ys)
+    points = len(df) * max(1, len(ys))
+    size = points * per_trace + len(df) * sum(_value_bytes(df[c]) for c in ys)
+    return points, size
+
+
+def _within(points, size, max_points, budget):
+    return points <= max_points and size <= budget
+
+
+# Fewer distinct values for grouping: numeric and date columns with many values become bin midpoints
+def _coarsen(series):
+    if series.nunique() <= BINS or not (pd.api.types.is_numeric_dtype(series)
+                                        or pd.api.types.is_datetime64_any_dtype(series)):
+        return series
+    bins = pd.cut(series, BINS)
+    if pd.api.types.is_datetime64_any_dtype(series):
+        mids = bins.map(lambda interval: interval.left + (interval.right - interval.left) / 2)
+    else:
+        mids = bins.map(lambda interval: interval.mid)
+    return pd.Series(np.asarray(mids, dtype=series.dtype if pd.api.types.is_datetime64_any_dtype(series)
+                                else float), index=series.index, name=series.name)
+
+
+def _keys(df, kwargs, args):
+    return [_coarsen(df[c]) for c in _used(df, kwargs, args)]
+
+
+def _style(kwargs):
+    return {arg: kwargs[arg] for arg in STYLE_ARGS if arg in kwargs}
+
+
+# Sample of exactly n rows, in their original order, that keeps the mix of the chart's groups:
+# each group (continuous grouping columns by their binned values) gets its share of n, rounded
+# down, and the rows left over go to the groups with the largest remainders
+def _sample(df, kwargs, n):
+    keys = _keys(df, kwargs, GROUP_ARGS)
+    if not keys:
+        return df.sample(n=n, random_state=0)
+    codes = pd.Series(df.groupby(keys, observed=True, dropna=False, sort=False).ngroup().to_numpy())
+    sizes = np.bincount(codes)
+    shares = sizes * (n / len(df))
+    counts = np.floor(shares).astype(int)
+    leftover = n - counts.sum()
+    counts[np.argsort(counts - shares, kind='stable')[:leftover]] += 1
+    # A random order of the rows, of which every group keeps its first `count` rows
+    order = np.random.default_rng(0).permutation(len(df))
+    rank = codes.iloc[order].groupby(codes.iloc[order].to_numpy()).cumcount().to_numpy()
+    keep = np.sort(order[rank < counts[codes.to_numpy()[order]]])
+    return df.iloc[keep]
+
+
+# Quartiles, whisker ends and means per box, as plotly would compute them from the raw points
+def _box_stats(df, kwargs):
+    y = kwargs['y']
+    keys = _used(df, kwargs, ['x'] + GROUP_ARGS) or ['_all']
+    values = df.assign(_all='')[keys + [y]].dropna(subset=[y])
+    grouped = values.groupby(keys, observed=True, dropna=False)[y]
+    q1, q3 = grouped.transform('quantile', 0.25), grouped.transform('quantile', 0.75)
+    inner = values[y].where(values[y].between(q1 - 1.5 * (q3 - q1), q3 + 1.5 * (q3 - q1)))
+    inner_grouped = inner.groupby([values[k] for k in keys], observed=True, dropna=False)
+    return pd.DataFrame({
+        'q1': grouped.quantile(0.25), 'median': grouped.median(), 'q3': grouped.quantile(0.75),
+        'mean': grouped.mean(), 'lowerfence': inner_grouped.min(), 'upperfence': inner_grouped.max()
+    }).reset_index()
+
+
+def _box_figure(stats, kwargs):
+    import plotly.express as px
+    import plotly.graph_objects as go
+
+    x, y, color = kwargs.get('x'), kwargs['y'], kwargs.get('color')
+    labels = kwargs.get('labels') or {}
+    palette = kwargs.get('color_discrete_sequence') or px.colors.qualitative.Plotly
+    color_map = kwargs.get('color_discrete_map') or {}
+    fig = go.Figure()
+    groups = stats.groupby(color, observed=True, dropna=False, sort=False) if color else [(None, stats)]
+    for i, (name, part) in enumerate(groups):
+        fig.add_trace(go.Box(
+            x=part[x] if x else None,
+            q1=part['q1'], median=part['median'], q3=part['q3'], mean=part['mean'],
+            lowerfence=part['lowerfence'], upperfence=part['upperfence'],
+            name=str(name) if color else y, legendgroup=str(name) if color else None,
+            marker_color=color_map.get(name, palette[i % len(palette)]), showlegend=bool(color)
+        ))
+    fig.update_layout(title=kwargs.get('title'), boxmode='group' if color and color != x else 'overlay',
+                      xaxis_title=labels.get(x, x), yaxis_title=labels.get(y, y), legend_title_text=color)
+    return fig
+
+
+# Aggregated rows and a builder drawing them like the original chart, or None if this chart has
+# no binned form
+def _binned(chart, kind, df, kwargs):
+    import plotly.express as px
+
+    ys = [c for c in _names(kwargs.get('y')) if c in df]
+    if kind in ('bar', 'line', 'area'):
+        keys = [key for key in _keys(df, kwargs, ['x'] + GROUP_ARGS) if key.name not in ys]
+        frame = df.groupby(keys, observed=True, dropna=False)[ys].agg('sum' if kind == 'bar' else 'mean').reset_index()
+        args = dict(_style(kwargs), **{arg: kwargs[arg] for arg in ['x', 'y', 'color'] + GROUP_ARGS if arg in kwargs})
+        return frame, lambda: chart(frame, **args)
+    if kind == 'histogram':
+        x = kwargs['x']
+        keys = [_coarsen(df[x])] + _keys(df, kwargs, GROUP_ARGS)
+        grouped = df.groupby(keys, observed=True, dropna=False)
+        frame = (grouped[ys[0]].sum() if ys else grouped.size()).rename('Count').reset_index()
+        args = dict(_style(kwargs), x=x, y='Count', **{arg: kwargs[arg] for arg in GROUP_ARGS if arg in kwargs})
+        return frame, lambda: px.bar(frame, **args)
+    if kind == 'pie':
+        names = kwargs['names']
+        grouped = df.groupby(_used(df, kwargs, ['names', 'color']), observed=True, dropna=False)
+        values = kwargs.get('values')
+        frame = (grouped[values].sum() if values else grouped.size()).rename('Count').reset_index()
+        args = dict(_style(kwargs), names=names, values='Count', **({'color': kwargs['color']} if 'color' in kwargs else {}))
+        return frame, lambda: chart(frame, **args)
+    if kind in ('scatter', 'strip'):
+        keys = _keys(df, kwargs, ['x', 'y'] + GROUP_ARGS)
+        frame = df.groupby(keys, observed=True, dropna=False).size().rename('Count').reset_index()
+        args = dict(_style(kwargs), size='Count', **{arg: kwargs[arg] for arg in ['x', 'y'] + GROUP_ARGS if arg in kwargs})
+        return frame, lambda: px.scatter(frame, **args)
+    if kind in ('box', 'violin') and ys:
+        stats = _box_stats(df, kwargs)
+        return stats, lambda: _box_figure(stats, kwargs)
+    return None
+
+
+# Count and mean / min / max of the chart's measures per value of its categorical columns
+def _summary_table(df, kwargs):
+    import plotly.graph_objects as go
+
+    used = _used(df, kwargs, COLUMN_ARGS)
+    keys = [c for c in used if not pd.api.types.is_numeric_dtype(df[c]) and not pd.api.types.is_datetime64_any_dtype(df[c])]
+    measures = [c for c in used if c not in keys and pd.api.types.is_numeric_dtype(df[c])]
+    grouped = df.groupby(keys, observed=True, dropna=False) if keys else df.groupby(lambda _: 'All')
+    table = grouped[measures].agg(['mean', 'min', 'max']) if measures else pd.DataFrame(index=grouped.size().index)
+    table.columns = [f'{column} ({how})' for column, how in table.columns] if measures else []
+    table.insert(0, 'Rows', grouped.size())
+    table = table.sort_values('Rows', ascending=False).head(TABLE_ROWS).reset_index()
+    fig = go.Figure(go.Table(
+        header=dict(values=list(table.columns)),
+        cells=dict(values=[table[c].round(2) if pd.api.types.is_float_dtype(table[c]) else table[c].astype(str)
+                           for c in table.columns])
+    ))
+    fig.update_layout(title=kwargs.get('title'))
+    return fig
+
+
+def _with_note(fig, level, note):
+    fig.update_layout(title_subtitle_text=note)
+    fig.layout.meta = {'level_of_detail': level}
+    return fig
+
+
+# Build a plotly express chart of raw rows within the payload budget. The figure's cost is
+# estimated from the rows and the columns it uses before anything is built; over budget the
+# chart steps down: raw points, a sample of the points, binned aggregates, a summary table.
+def govern(chart, df, max_points=None, budget=None, **kwargs):
+    max_points = max_points or CHART_MAX_POINTS
+    budget = budget or CHART_BUDGET_BYTES
+    kind = chart.__name__
+    points, size = estimate(df, kwargs)
+    if _within(points, size, max_points, budget):
+        return chart(df, **kwargs)
+
+    if kind in SAMPLED_KINDS:
+        n = int(min(max_points * len(df) / points, budget * len(df) / size))
+        if n >= MIN_SAMPLE_FRACTION * len(df):
+            sample = _sample(df, kwargs, n)
+            return _with_note(chart(sample, **kwargs), 'sampled',
+                              f"Sample of {len(sample):,} of {len(df):,} rows (chart budget)")
+
+    binned = _binned(chart, kind, df, kwargs)
+    if binned is not None:
+        frame, build = binned
+        if _within(*estimate(frame, kwargs), max_points, budget):
+            return _with_note(build(), 'binned', f"{len(df):,} rows shown as {len(frame):,} binned aggregates (chart budget)")
+    return _with_note(_summary_table(df, kwargs), 'table', f"{len(df):,} rows summarised as a table (chart budget)")
@@ -0,0 +1,157 @@
+import datetime
+import json
+import os
+import tempfile
+
+import disk_cache
+import util
+from analytics import FILTER_COLUMNS
+from util import slugify
+
+# Named views saved on the server, as a JSON list in the format report.py --presets reads
+PRESET_PATH = os.environ.get('LABOUR_PRESET_PATH', os.path.join(disk_cache.CACHE_DIR, 'presets.json'))
+
+# Short query parameter of every part of the view state; multiselects repeat their parameter
+QUERY_KEYS = {
+    'page': 'p',
+    'start_date': 'from',
+    'end_date': 'to',
+    'Product_Type': 'prod',
+    'Department': 'dept',
+    'Shift': 'shift',
+    'Manager': 'mgr',
+    'Factory_Unit': 'fu',
+    'Machine_Unit': 'mu',
+    'Productivity_Zone': 'zone',
+    'Anomaly_Conduct': 'anom',
+    'efficiency_rate': 'eff'
+}
+PRESET_PARAM = 'preset'
+
+
+# The view a fresh session opens on: the first page, nothing narrowed
+def default_view(metadata, pages):
+    start, end = metadata['date_range']
+    view = {'page': next(iter(pages.values()))[0], 'start_date': start.date(), 'end_date': end.date()}
+    view.update({column: [] for column in FILTER_COLUMNS})
+    view['efficiency_rate'] = tuple(metadata['efficiency_range'])
+    return view
+
+
+# The sidebar filters of a view in canonical form: multiselects sorted, so every way of picking
+# the same values gives the same dict and therefore the same cache keys
+def view_filters(view):
+    filters = {'start_date': view['start_date'], 'end_date': view['end_date']}
+    filters.update({column: sorted(view[column], key=str) for column in FILTER_COLUMNS})
+    filters['efficiency_rate'] = tuple(float(x) for x in view['efficiency_rate'])
+    return filters
+
+
+# Short key of a view's filters (the page does not change what is computed)
+def view_key(view):
+    return disk_cache.make_key(view_filters(view))[:12]
+
+
+# A view from JSON-like values (ISO dates, lists), keeping only what fits the dataset: known
+# options, dates and efficiencies inside its range and a known page. Anything else is default.
+def parse_view(raw, defaults, options, pages):
+    view = dict(defaults)
+    by_name = {name: page for category in pages.values() for page in category for name in (page, slugify(page))}
+    view['page'] = by_name.get(raw.get('page'), defaults['page'])
+    for key in ('start_date', 'end_date'):
+        try:
+            value = datetime.date.fromisoformat(str(raw[key]))
+            view[key] = min(max(value, defaults['start_date']), defaults['end_date'])
+        except (KeyError, ValueError):
+            pass
+    for column in FILTER_COLUMNS:
+        by_text = {str(option): option for option in options[column]}
+        view[column] = [by_text[str(v)] for v in raw.get(column) or [] if str(v) in by_text]
+    try:
+        low, high = sorted(float(x) for x in raw['efficiency_rate'])
+        floor, ceiling = defaults['efficiency_rate']
+        view['efficiency_rate'] = (min(max(low, floor), ceiling), min(max(high, floor), ceiling))
+    except (KeyError, TypeError, ValueError):
+        pass
+    return view
+
+
+# Query parameters of a view, leaving out everything at its default so plain views get plain URLs
+def to_query(view, defaults):
+    query = {}
+    if view['page'] != defaults['page']:
+        query[QUERY_KEYS['page']] = slugify(view['page'])
+    for key in ('start_date', 'end_date'):
+        if view[key] != defaults[key]:
+            query[QUERY_KEYS[key]] = view[key].isoformat()
+    for column in FILTER_COLUMNS:
+        if view[column]:
+            query[QUERY_KEYS[column]] = [str(v) for v in sorted(view[column], key=str)]
+    if tuple(view['efficiency_rate']) != tuple(defaults['efficiency_rate']):
+        query[QUERY_KEYS['efficiency_rate']] = '~'.join(f'{x:g}' for x in view['efficiency_rate'])
+    return query
+
+
+# JSON-like view values from query parameters (name -> list of values)
+def from_query(params):
+    raw = {}
+    for key, name in QUERY_KEYS.items():
+        values = params.get(name) or []
+        if not values:
+            continue
+        if key in FILTER_COLUMNS:
+            raw[key] = values
+        elif key == 'efficiency_rate':
+            raw[key] = values[-1].split('~')
+        else:
+            raw[key] = values[-1]
+    return raw
+
+
+# JSON form of a view, as stored in the preset file
+def dump_view(view):
+    entry = {key: (value.isoformat() if isinstance(value, datetime.date) else value) for key, value in view.items()}
+    entry['efficiency_rate'] = list(view['efficiency_rate'])
+    for column in FILTER_COLUMNS:
+        entry[column] = [str(v) for v in sorted(view[column], key=str)]
+    return entry
+
+
+def load_presets(path=None):
+    try:
+        with open(path or PRESET_PATH) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return []
+
+
+def find_preset(name, path=None):
+    return next((preset for preset in load_presets(path) if preset.get('name') == name), None)
+
+
+# Replace the preset file atomically, so readers in other processes never see half a file
+def _write_presets(presets, path=None):
+    path = path or PRESET_PATH
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    with tempfile.NamedTemporaryFile('w', dir=directory, suffix='.tmp', delete=False) as f:
+        json.dump(presets, f, indent=2)
+    os.replace(f.name, path)
+
+
+# Read, change and rewrite the preset file under a lock, so concurrent saves from other sessions
+# or processes are never lost
+def _update_presets(change, path=None):
+    path = path or PRESET_PATH
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with util.file_lock(path):
+        _write_presets(change(load_presets(path)), path)
+
+
+def save_preset(name, view, path=None):
+    _update_presets(lambda presets: [preset for preset in presets if preset.get('name') != name] +
+                    [dict(dump_view(view), name=name)], path)
+
+
+def delete_preset(name, path=None):
+    _update_presets(lambda presets: [preset for preset in presets if preset.get('name') != name], path)
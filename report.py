@@ -0,0 +1,205 @@
+import argparse
+import concurrent.futures
+import datetime
+import html
+import json
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+
+import shared_store
+from util import slugify
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'labour.py')
+
+# Sidebar radio that lists the pages of each analysis category
+CATEGORY_LABEL = "Select Analysis Category:"
+PAGE_LABELS = {
+    "Labor Productivity Analytics": "Select Metric:",
+    "Parameters for Analytics": "Select Parameter:",
+    "Visual Themes of Labor Productivity": "Select Theme:"
+}
+
+# Preset keys (the same keys labour.py uses in its filters dict) mapped to sidebar widget labels
+MULTISELECT_LABELS = {
+    'Product_Type': "Select Product Type",
+    'Department': "Select Department",
+    'Shift': "Select Shift",
+    'Manager': "Select Manager",
+    'Factory_Unit': "Select Factory Unit",
+    'Machine_Unit': "Select Machine Unit",
+    'Productivity_Zone': "Select Productivity Zone",
+    'Anomaly_Conduct': "Select Anomaly Conduct"
+}
+DATE_LABELS = {'start_date': "Start Date", 'end_date': "End Date"}
+EFFICIENCY_LABEL = "Select Labor Efficiency Rate"
+
+
+# Find a sidebar widget by its label
+def find_widget(widgets, label):
+    for widget in widgets:
+        if widget.label == label:
+            return widget
+    raise KeyError(f"No sidebar widget labelled {label!r}")
+
+
+def _apply_preset(app, preset):
+    for key, label in DATE_LABELS.items():
+        if key in preset:
+            find_widget(app.sidebar.date_input, label).set_value(datetime.date.fromisoformat(preset[key]))
+    for key, label in MULTISELECT_LABELS.items():
+        if preset.get(key):
+            find_widget(app.sidebar.multiselect, label).set_value(preset[key])
+    if 'efficiency_rate' in preset:
+        find_widget(app.sidebar.slider, EFFICIENCY_LABEL).set_value(tuple(preset['efficiency_rate']))
+
+
+# Figure JSON of every plotly chart on the current page
+def _chart_specs(app):
+    specs = []
+    for element in app.get('plotly_chart'):
+        proto = element.proto
+        specs.append(getattr(proto, 'spec', '') or proto.figure.spec)
+    return specs
+
+
+def _render(spec, path_stem, formats):
+    import plotly.io as pio
+
+    fig = pio.from_json(spec)
+    written = []
+    if 'html' in formats:
+        fig.write_html(path_stem + '.html', include_plotlyjs='cdn', full_html=True)
+        written.append(path_stem + '.html')
+    if 'png' in formats:
+        # PNG export needs kaleido; report the page as HTML-only rather than failing the bundle
+        try:
+            fig.write_image(path_stem + '.png', width=1200, height=700)
+            written.append(path_stem + '.png')
+        except (ValueError, ImportError) as e:
+            print(f"PNG export skipped for {path_stem}: {e}", file=sys.stderr)
+    return written
+
+
+# Run every page of the dashboard for one preset inside a single headless session, so the
+# filter and any cached aggregates are computed once and reused by all pages
+def render_preset(preset, out_dir, formats, timeout):
+    from streamlit.testing.v1 import AppTest
+
+    app = AppTest.from_file(APP_PATH, default_timeout=timeout)
+    app.run()
+    _apply_preset(app, preset)
+    app.run()
+
+    preset_dir = os.path.join(out_dir, slugify(preset['name']))
+    pages = []
+    categories = find_widget(app.sidebar.radio, CATEGORY_LABEL).options
+    for category in categories:
+        find_widget(app.sidebar.radio, CATEGORY_LABEL).set_value(category)
+        app.run()
+        for page in find_widget(app.sidebar.radio, PAGE_LABELS[category]).options:
+            find_widget(app.sidebar.radio, PAGE_LABELS[category]).set_value(page)
+            app.run()
+            page_dir = os.path.join(preset_dir, slugify(category), slugify(page))
+            os.makedirs(page_dir, exist_ok=True)
+            files = []
+            for position, spec in enumerate(_chart_specs(app)):
+                files.extend(_render(spec, os.path.join(page_dir, f'{position:02d}'), formats))
+            pages.append({
+                'category': category,
+                'page': page,
+                'errors': [str(e.value) for e in app.exception],
+                'files': [os.path.relpath(f, out_dir) for f in files]
+            })
+    return {'preset': preset['name'], 'pages': pages}
+
+
+def _init_worker(store_root):
+    os.environ['LABOUR_STORE_ROOT'] = store_root
+
+
+# One preset per Factory_Unit for every preset that does not already pin factories
+def expand_per_factory_unit(presets, factory_units):
+    expanded = []
+    for preset in presets:
+        if preset.get('Factory_Unit'):
+            expanded.append(preset)
+            continue
+        for unit in factory_units:
+            expanded.append(dict(preset, name=f"{preset['name']}-{unit}", Factory_Unit=[unit]))
+    return expanded
+
+
+def write_index(out_dir, results):
+    parts = ["<html><head><meta charset='utf-8'><title>Labor Productivity Report</title></head><body>",
+             "<h1>Labor Productivity Report</h1>"]
+    for result in results:
+        parts.append(f"<h2>{html.escape(result['preset'])}</h2><ul>")
+        for page in result['pages']:
+            links = " ".join(f"<a href='{html.escape(f)}'>{i + 1}</a>" for i, f in enumerate(page['files']))
+            errors = f" <b>errors: {html.escape('; '.join(page['errors']))}</b>" if page['errors'] else ""
+            parts.append(f"<li>{html.escape(page['category'])} / {html.escape(page['page'])}: {links}{errors}</li>")
+        parts.append("</ul>")
+    parts.append("</body></html>")
+    with open(os.path.join(out_dir, 'index.html'), 'w', encoding='utf-8') as f:
+        f.write("\n".join(parts))
+    with open(os.path.join(out_dir, 'manifest.json'), 'w') as f:
+        json.dump(results, f, indent=2)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render every dashboard page for a list of filter presets.")
+    parser.add_argument('dataset', help="Workbook or CSV to report on")
+    parser.add_argument('--presets', help="JSON file with a list of presets; keys follow labour.py's filters "
+                                          "(start_date, end_date, Shift, Factory_Unit, ..., efficiency_rate)")
+    parser.add_argument('--per-factory-unit', action='store_true', help="Expand each preset once per Factory_Unit")
+    parser.add_argument('--out', default='report', help="Output directory for the bundle")
+    parser.add_argument('--format', action='append', choices=['html', 'png'], help="Figure formats (default html)")
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--timeout', type=float, default=300, help="Seconds allowed per page rerun")
+    parser.add_argument('--zip', action='store_true', help="Also write <out>.zip")
+    args = parser.parse_args(argv)
+    formats = set(args.format or ['html'])
+
+    presets = [{'name': 'all'}]
+    if args.presets:
+        with open(args.presets) as f:
+            presets = json.load(f)
+
+    # Publish the dataset once into a private store; every worker maps the same copy
+    df, quarantine = shared_store.read_dataset(args.dataset)
+    store_root = tempfile.mkdtemp(prefix='labour-report-')
+    shared_store.publish(df, root=store_root, quarantine=quarantine)
+    if args.per_factory_unit:
+        presets = expand_per_factory_unit(presets, sorted(df['Factory_Unit'].dropna().unique()))
+    del df, quarantine
+
+    os.makedirs(args.out, exist_ok=True)
+    results = []
+    try:
+        with concurrent.futures.ProcessPoolExecutor(
+            max_workers=max(1, min(args.workers, len(presets))),
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker,
+            initargs=(store_root,)
+        ) as pool:
+            futures = {pool.submit(render_preset, preset, args.out, formats, args.timeout): preset for preset in presets}
+            for future in concurrent.futures.as_completed(futures):
+                result = future.result()
+                print(f"Rendered preset {result['preset']} ({len(result['pages'])} pages)")
+                results.append(result)
+    finally:
+        shutil.rmtree(store_root, ignore_errors=True)
+
+    results.sort(key=lambda r: [p['name'] for p in presets].index(r['preset']))
+    write_index(args.out, results)
+    if args.zip:
+        shutil.make_archive(args.out.rstrip('/\\'), 'zip', args.out)
+    print(f"Report written to {os.path.abspath(args.out)}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
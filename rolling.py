@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+
+ROLLING_WINDOWS = (7, 28, 90)
+ROLLING_METRICS = ['Productivity', 'Labor_Efficiency_Rate', 'Attainment']
+# Grouping choices (label -> column)
+ROLLING_GROUPS = {'Shift': 'Shift', 'Machine Unit': 'Machine_Unit', 'Department': 'Department'}
+
+
+# Output vs target, in percent, per row
+def attainment(df):
+    return 100 * df['Labor_Total_Output'] / df['Labor_Target_Output']
+
+
+# Moving averages, rolling standard deviations and an EWMA over calendar-day windows for every
+# group at once. Rows are binned into a dense (group x day) grid of counts, sums and sums of
+# squares; with cumulative sums along the day axis every window is one O(1) difference, so the
+# whole table costs a single pass over the rows plus O(groups x days).
+def rolling_kpis(df, group, windows=ROLLING_WINDOWS, halflife=14):
+    if df.empty:
+        return pd.DataFrame(columns=[group, 'Date', 'Metric', 'Daily', 'EWMA']
+                            + [f'{k}{w}' for w in windows for k in ('MA', 'Std')])
+    dates = df['Date'].dt.normalize()
+    days = pd.date_range(dates.min(), dates.max(), freq='D')
+    groups = pd.Index(df[group].dropna().unique()).sort_values()
+    day_pos = (dates - days[0]).dt.days.to_numpy()
+    group_pos = groups.get_indexer(df[group])
+    shape = (len(groups), len(days))
+    # Index of the first day before each window, into the zero-padded cumulative arrays
+    window_start = {w: np.maximum(np.arange(1, len(days) + 1) - w, 0) for w in windows}
+
+    columns = {'Productivity': df['Productivity'], 'Labor_Efficiency_Rate': df['Labor_Efficiency_Rate'],
+               'Attainment': attainment(df)}
+    frames = []
+    for metric in ROLLING_METRICS:
+        x = columns[metric].to_numpy(dtype=float)
+        ok = (group_pos >= 0) & np.isfinite(x)
+        cell = group_pos[ok] * len(days) + day_pos[ok]
+        count = np.bincount(cell, minlength=shape[0] * shape[1]).reshape(shape)
+        total = np.bincount(cell, weights=x[ok], minlength=shape[0] * shape[1]).reshape(shape)
+        squares = np.bincount(cell, weights=x[ok] ** 2, minlength=shape[0] * shape[1]).reshape(shape)
+
+        def cumulative(a):
+            return np.concatenate([np.zeros((shape[0], 1)), np.cumsum(a, axis=1)], axis=1)
+
+        c_count, c_total, c_squares = cumulative(count), cumulative(total), cumulative(squares)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            daily = np.where(count > 0, total / count, np.nan)
+            result = {'Daily': daily}
+            for w in windows:
+                n = c_count[:, 1:] - c_count[:, window_start[w]]
+                s = c_total[:, 1:] - c_total[:, window_start[w]]
+                q = c_squares[:, 1:] - c_squares[:, window_start[w]]
+                mean = np.where(n > 0, s / n, np.nan)
+                variance = np.where(n > 1, (q - s * mean) / (n - 1), np.nan)
+                result[f'MA{w}'] = mean
+                result[f'Std{w}'] = np.sqrt(np.clip(variance, 0, None))
+        # Days without rows stay NaN, so the EWMA decays by calendar time rather than by row
+        result['EWMA'] = pd.DataFrame(daily.T).ewm(halflife=halflife, ignore_na=False).mean().to_numpy().T
+
+        group_idx, day_idx = np.nonzero(count > 0)
+        frame = pd.DataFrame({group: groups[group_idx], 'Date': days[day_idx], 'Metric': metric})
+        for name, values in result.items():
+            frame[name] = values[group_idx, day_idx]
+        frames.append(frame)
+    return pd.concat(frames, ignore_index=True)
@@ -0,0 +1,73 @@
+import itertools
+
+import numpy as np
+import pandas as pd
+
+from analytics import SAMPLE_WEIGHT
+
+# The rules baked into the dataset: Productivity = min(100 * output / target, 100),
+# Green at 90%+, Yellow at 80-90%, Red below 80%; "productive" needs 90% of target with 90% presence
+BASELINE = {'target_scale': 1.0, 'green': 90.0, 'yellow': 80.0, 'presence_min': 90.0}
+ZONES = ['Green', 'Yellow', 'Red']
+
+
+# Every combination of the given threshold values, skipping combinations where Yellow >= Green
+def scenario_grid(target_scales, green, yellow, presence_min):
+    combos = [
+        {'target_scale': float(t), 'green': float(g), 'yellow': float(y), 'presence_min': float(p)}
+        for t, g, y, p in itertools.product(target_scales, green, yellow, presence_min)
+        if y < g
+    ]
+    combos.append(BASELINE)
+    return pd.DataFrame(combos).drop_duplicates(ignore_index=True)
+
+
+# Evaluate every scenario in one pass. Identical (output, target, presence) rows are collapsed
+# into weighted points first (sampled rows keep their SAMPLE_WEIGHT), then all scenarios are
+# broadcast against the points in chunks of at most chunk_cells scenario x point cells, so
+# memory stays bounded on large selections.
+def evaluate_scenarios(df, scenarios, chunk_cells=1 << 22):
+    columns = ['Labor_Total_Output', 'Labor_Target_Output', 'Labor_Presence']
+    rows = df[columns].assign(weight=df[SAMPLE_WEIGHT] if SAMPLE_WEIGHT in df else 1.0).dropna()
+    points = rows[rows['Labor_Target_Output'] > 0].groupby(columns)['weight'].sum().reset_index()
+    output, target, presence, weights = (points[column].to_numpy(dtype=float) for column in columns + ['weight'])
+    base = 100 * output / target
+
+    scale = scenarios['target_scale'].to_numpy(dtype=float)[:, None]
+    green = scenarios['green'].to_numpy(dtype=float)[:, None]
+    yellow = scenarios['yellow'].to_numpy(dtype=float)[:, None]
+    presence_min = scenarios['presence_min'].to_numpy(dtype=float)[:, None]
+
+    totals = {name: np.zeros(len(scenarios)) for name in ['Green', 'Yellow', 'Productive', 'Productivity']}
+    chunk = max(1, chunk_cells // max(1, len(scenarios)))
+    for start in range(0, len(points), chunk):
+        part = slice(start, start + chunk)
+        w = weights[part]
+        productivity = np.minimum(base[part] / scale, 100)
+        is_green = productivity >= green
+        totals['Green'] += is_green @ w
+        totals['Yellow'] += ((productivity >= yellow) & ~is_green) @ w
+        totals['Productive'] += (is_green & (presence[part] >= presence_min)) @ w
+        totals['Productivity'] += productivity @ w
+
+    result = scenarios.copy()
+    n = weights.sum()
+    result['Rows'] = round(n)
+    result['Green'] = totals['Green']
+    result['Yellow'] = totals['Yellow']
+    result['Red'] = n - totals['Green'] - totals['Yellow']
+    with np.errstate(invalid='ignore', divide='ignore'):
+        for zone in ZONES:
+            result[f'{zone}_Share'] = 100 * result[zone] / n
+        result['Productive_Share'] = 100 * totals['Productive'] / n
+        result['Mean_Productivity'] = totals['Productivity'] / n
+    return result
+
+
+# Scenario x zone table in long form, one row per scenario and zone
+def zone_table(result):
+    keys = list(BASELINE)
+    counts = result.melt(id_vars=keys, value_vars=ZONES, var_name='Zone', value_name='Count')
+    shares = result.melt(id_vars=keys, value_vars=[f'{z}_Share' for z in ZONES], var_name='Zone', value_name='Share')
+    shares['Zone'] = shares['Zone'].str.replace('_Share', '', regex=False)
+    return counts.merge(shares, on=keys + ['Zone'])
@@ -0,0 +1,163 @@
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+import analytics
+import ingest
+import validation
+
+# Published datasets live in POSIX shared memory when the host has it, so every
+# Streamlit worker maps the same pages instead of holding its own copy
+DEFAULT_STORE_ROOT = ('/dev/shm/labour_productivity' if os.path.isdir('/dev/shm')
+                      else os.path.join(tempfile.gettempdir(), 'labour_productivity'))
+CURRENT_FILE = 'CURRENT'
+SCHEMA_FILE = 'schema.json'
+
+# Keys and measures of the daily rollup published next to the row data
+ROLLUP_KEYS = ['Date', 'Factory_Unit', 'Machine_Unit', 'Shift', 'Department']
+ROLLUP_MEASURES = ['Labor_Presence', 'Labor_Total_Output', 'Labor_Target_Output',
+                   'Labor_Efficiency_Rate', 'Productivity']
+
+
+# LABOUR_STORE_ROOT is read at call time so batch workers can point at a private store
+def store_root(root=None):
+    return root or os.environ.get('LABOUR_STORE_ROOT', DEFAULT_STORE_ROOT)
+
+
+# Function to read and validate workbooks and CSVs into one DataFrame and a table of quarantined
+# rows; every sheet unless sheet_name picks one
+def read_dataset(paths, sheet_name=None):
+    return ingest.ingest([paths] if isinstance(paths, str) else paths, sheet_name=sheet_name)
+
+
+# Daily sums and row counts per factory, machine, shift and department
+def build_rollups(df):
+    daily = df.groupby(ROLLUP_KEYS, observed=True)[ROLLUP_MEASURES].sum()
+    daily['Rows'] = df.groupby(ROLLUP_KEYS, observed=True).size()
+    return {'daily': daily.reset_index()}
+
+
+# Write every column of a table as a flat .npy file; text columns are dictionary encoded
+def _write_table(df, table_dir):
+    os.makedirs(table_dir)
+    columns = []
+    for position, name in enumerate(df.columns):
+        col = df[name]
+        entry = {'name': name, 'file': f'{position}.npy'}
+        if pd.api.types.is_datetime64_any_dtype(col):
+            values = col.to_numpy(dtype='datetime64[ns]')
+            entry['kind'] = 'datetime'
+        elif pd.api.types.is_numeric_dtype(col) and not pd.api.types.is_bool_dtype(col):
+            values = col.to_numpy()
+            entry['kind'] = 'numeric'
+        else:
+            categorical = col.astype('category')
+            values = categorical.cat.codes.to_numpy()
+            entry['kind'] = 'category'
+            entry['categories'] = categorical.cat.categories.tolist()
+        np.save(os.path.join(table_dir, entry['file']), values, allow_pickle=False)
+        columns.append(entry)
+    with open(os.path.join(table_dir, SCHEMA_FILE), 'w') as f:
+        json.dump({'rows': len(df), 'columns': columns}, f, default=str)
+
+
+# Map a table read-only; numeric and date columns stay views over the shared pages
+def _read_table(table_dir):
+    with open(os.path.join(table_dir, SCHEMA_FILE)) as f:
+        schema = json.load(f)
+    columns = {}
+    for entry in schema['columns']:
+        values = np.load(os.path.join(table_dir, entry['file']), mmap_mode='r', allow_pickle=False)
+        if entry['kind'] == 'category':
+            columns[entry['name']] = pd.Categorical.from_codes(values, categories=entry['categories'])
+        else:
+            columns[entry['name']] = values
+    return pd.DataFrame(columns, copy=False)
+
+
+# Return the version currently published, or None when nothing has been published yet
+def current_version(root=None):
+    root = store_root(root)
+    try:
+        with open(os.path.join(root, CURRENT_FILE)) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+# Publish the dataset (rows grouped into month x Factory_Unit partitions, with their statistics),
+# its rollups and the rows validation quarantined as a new version, then swap CURRENT atomically
+def publish(df, root=None, keep=2, quarantine=None):
+    root = store_root(root)
+    # Microseconds keep versions published in the same second apart, and still sort by time
+    now = time.time()
+    version = time.strftime('%Y%m%dT%H%M%S', time.localtime(now)) + f'.{int(now % 1 * 1e6):06d}-{os.getpid()}'
+    staging = os.path.join(root, f'.{version}')
+    os.makedirs(root, exist_ok=True)
+    df, partitions = analytics.partition_table(df)
+    tables = {'data': df, 'partitions': partitions}
+    tables.update(build_rollups(df))
+    if quarantine is not None:
+        tables['quarantine'] = quarantine
+    for name, table in tables.items():
+        _write_table(table, os.path.join(staging, name))
+    os.rename(staging, os.path.join(root, version))
+
+    pointer = os.path.join(root, f'.{CURRENT_FILE}.{os.getpid()}')
+    with open(pointer, 'w') as f:
+        f.write(version)
+    os.replace(pointer, os.path.join(root, CURRENT_FILE))
+
+    # Older versions may still be mapped by workers mid-rerun; keep a few around
+    versions = sorted(v for v in os.listdir(root) if not v.startswith('.') and v != CURRENT_FILE)
+    for old in versions[:-keep]:
+        shutil.rmtree(os.path.join(root, old), ignore_errors=True)
+    return version
+
+
+# Attach every table of a published version read-only
+def attach(version=None, root=None):
+    root = store_root(root)
+    version = version or current_version(root)
+    if version is None:
+        raise FileNotFoundError(f"No dataset has been published under {root}")
+    version_dir = os.path.join(root, version)
+    return {name: _read_table(os.path.join(version_dir, name)) for name in sorted(os.listdir(version_dir))}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Publish the labour dataset into shared memory for all dashboard workers.")
+    parser.add_argument('--root', default=None, help="Directory backing the shared store")
+    commands = parser.add_subparsers(dest='command', required=True)
+    publish_cmd = commands.add_parser('publish', help="Load workbooks and CSVs and publish them as the current version")
+    publish_cmd.add_argument('paths', nargs='+')
+    publish_cmd.add_argument('--sheet', default=None, help="Only read this worksheet (default: every sheet)")
+    commands.add_parser('status', help="Show the currently published version")
+    args = parser.parse_args(argv)
+
+    if args.command == 'publish':
+        df, quarantine = read_dataset(args.paths, sheet_name=args.sheet)
+        version = publish(df, root=args.root, quarantine=quarantine)
+        print(f"Published {len(df)} rows as version {version}")
+        if len(quarantine):
+            print(f"Quarantined {len(quarantine)} rows:")
+            print(validation.summarise(quarantine).to_string(index=False))
+    else:
+        version = current_version(args.root)
+        if version is None:
+            print("No dataset published")
+            return 1
+        tables = attach(version, root=args.root)
+        print(f"Version {version}: " + ", ".join(f"{name}={len(t)} rows" for name, t in tables.items()))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
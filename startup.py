@@ -0,0 +1,138 @@
+import argparse
+import importlib
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+
+# Where labour.py writes the timings of its script runs, when set
+PROFILE_ENV = 'LABOUR_STARTUP_PROFILE'
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'labour.py')
+# Modules a cold start should not pay for until a page draws a chart or reads a workbook. Only
+# modules Streamlit does not import itself can be deferred; plotly.graph_objects is not one.
+DEFERRED = ['plotly.express', 'openpyxl']
+
+
+# Stand-in for a module that imports it on first attribute access. It stays out of sys.modules
+# until then, so code walking sys.modules (inspect, Streamlit's own checks) cannot load it early.
+class LazyModule:
+    def __init__(self, name):
+        self._name = name
+
+    def __getattr__(self, attribute):
+        return getattr(importlib.import_module(self._name), attribute)
+
+
+# Whether a module has been imported yet
+def is_loaded(name):
+    return name in sys.modules
+
+
+# Seconds since the start of one script run at named points, written as JSON to the file
+# named by LABOUR_STARTUP_PROFILE so startup.py can read them back
+class RunProfile:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.marks = {}
+
+    def mark(self, name):
+        self.marks[name] = time.perf_counter() - self.started
+        self.marks[f'{name}_loaded'] = [module for module in DEFERRED if is_loaded(module)]
+
+    def save(self):
+        path = os.environ.get(PROFILE_ENV)
+        if path:
+            with open(path, 'w') as f:
+                json.dump(self.marks, f)
+
+
+# Cumulative microseconds of every top-level import from `python -X importtime` output
+def parse_importtime(stderr):
+    costs = {}
+    for line in stderr.splitlines():
+        match = re.match(r'import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)', line)
+        if match and not match.group(3):
+            costs[match.group(4)] = costs.get(match.group(4), 0) + int(match.group(2))
+    return costs
+
+
+# Child process: open the dashboard once with AppTest, as a fresh server session would
+def _child(timeout):
+    started = time.perf_counter()
+    from streamlit.testing.v1 import AppTest
+    boot = time.perf_counter() - started
+    app = AppTest.from_file(APP_PATH, default_timeout=timeout)
+    started = time.perf_counter()
+    app.run()
+    print(json.dumps({'boot_s': boot, 'first_run_s': time.perf_counter() - started,
+                      'exceptions': len(app.exception)}))
+
+
+# One cold start in a fresh interpreter: framework boot, then the script's own marks
+def measure(timeout):
+    with tempfile.TemporaryDirectory(prefix='labour-startup-') as scratch:
+        profile_path = os.path.join(scratch, 'profile.json')
+        env = dict(os.environ, **{PROFILE_ENV: profile_path})
+        proc = subprocess.run([sys.executable, '-X', 'importtime', os.path.abspath(__file__), '--child',
+                               '--timeout', str(timeout)],
+                              env=env, capture_output=True, text=True, cwd=os.path.dirname(APP_PATH))
+        if proc.returncode:
+            raise RuntimeError(proc.stderr[-2000:])
+        result = json.loads(proc.stdout.strip().splitlines()[-1])
+        if not os.path.exists(profile_path):
+            raise RuntimeError(f"labour.py stopped before its first render ({result['exceptions']} exception(s))")
+        with open(profile_path) as f:
+            result['marks'] = json.load(f)
+    result['imports_us'] = parse_importtime(proc.stderr)
+    return result
+
+
+def print_report(runs, top):
+    print(f"{'run':>3} {'boot':>7} {'imports':>8} {'sidebar':>8} {'data':>7} {'render':>7} {'total':>7}  "
+          f"deferred modules loaded at sidebar")
+    for i, run in enumerate(runs, 1):
+        marks = run['marks']
+        print(f"{i:>3} {run['boot_s']:>7.2f} {marks.get('imports', 0):>8.2f} {marks.get('sidebar', 0):>8.2f} "
+              f"{marks.get('data', 0):>7.2f} {marks.get('first_render', 0):>7.2f} {run['first_run_s']:>7.2f}  "
+              f"{', '.join(marks.get('sidebar_loaded', [])) or '-'}")
+    print("\nSlowest top-level imports (first run, cumulative ms):")
+    costs = sorted(runs[0]['imports_us'].items(), key=lambda item: -item[1])[:top]
+    for name, us in costs:
+        print(f"  {us / 1000:>9.1f}  {name}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Measure dashboard cold starts: framework boot, script imports, time to the sidebar, "
+                    "data load and first full render, each in a fresh interpreter.")
+    parser.add_argument('--runs', type=int, default=3,
+                        help="Cold starts to measure; the first also fills the disk cache for the rest")
+    parser.add_argument('--fresh-cache', action='store_true',
+                        help="Use an empty disk cache instead of the configured one")
+    parser.add_argument('--top', type=int, default=15, help="Slowest imports to list")
+    parser.add_argument('--timeout', type=float, default=300, help="Seconds allowed for the first run")
+    parser.add_argument('--json', help="Also write the measurements to this JSON file")
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        _child(args.timeout)
+        return 0
+
+    with tempfile.TemporaryDirectory(prefix='labour-startup-cache-') as cache_dir:
+        if args.fresh_cache:
+            os.environ['LABOUR_CACHE_DIR'] = cache_dir
+        runs = [measure(args.timeout) for _ in range(args.runs)]
+
+    print_report(runs, args.top)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(runs, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,185 @@
+import collections
+import json
+import os
+import re
+import sys
+import threading
+
+import numpy as np
+import pandas as pd
+
+import disk_cache
+import ingest
+import shared_store
+
+# Plants served by one instance. LABOUR_PLANTS names a JSON file mapping every plant to its
+# settings, e.g. {"north": {"data_path": "north.xlsx", "quota_mb": 2048}}; any of data_path,
+# store_root, cache_dir, quota_mb and disk_mb may be left out. Without it the instance serves a
+# single plant from the default dataset, shared store and disk cache.
+PLANTS_PATH = os.environ.get('LABOUR_PLANTS')
+DEFAULT_PLANT = 'default'
+PLANT_PARAM = 'plant'
+PLANT_NAME = re.compile(r'^[A-Za-z0-9_-]+$')
+
+# In-memory cache quota of a plant unless its settings give one, and of the whole instance
+# (by default the sum of the plants' quotas)
+TENANT_QUOTA_BYTES = int(os.environ.get('LABOUR_TENANT_QUOTA_MB', '1024')) * 1024 * 1024
+MEMORY_BUDGET_BYTES = (int(os.environ['LABOUR_MEMORY_BUDGET_MB']) * 1024 * 1024
+                       if os.environ.get('LABOUR_MEMORY_BUDGET_MB') else None)
+MB = 1024 * 1024
+
+
+# Settings of every plant, with the defaults filled in: each plant reads its own workbook and
+# shared store and keeps its own disk cache, so no plant's data or results evict another's
+def load_plants(path=None):
+    path = path or PLANTS_PATH
+    if not path:
+        return {DEFAULT_PLANT: {'data_path': ingest.DEFAULT_DATA_PATH, 'store_root': None,
+                                'cache_dir': disk_cache.CACHE_DIR, 'quota_bytes': TENANT_QUOTA_BYTES,
+                                'disk_bytes': disk_cache.CACHE_MAX_BYTES}}
+    with open(path) as f:
+        configured = json.load(f)
+    plants = {}
+    for name, settings in configured.items():
+        if not PLANT_NAME.match(name):
+            raise ValueError(f"Plant names may only use letters, digits, '_' and '-': {name!r}")
+        plants[name] = {
+            'data_path': settings.get('data_path', ingest.DEFAULT_DATA_PATH),
+            'store_root': settings.get('store_root', os.path.join(shared_store.store_root(), name)),
+            'cache_dir': settings.get('cache_dir', os.path.join(disk_cache.CACHE_DIR, 'plants', name)),
+            'quota_bytes': int(settings.get('quota_mb', TENANT_QUOTA_BYTES // MB)) * MB,
+            'disk_bytes': int(settings.get('disk_mb', disk_cache.CACHE_MAX_BYTES // MB)) * MB
+        }
+    if not plants:
+        raise ValueError(f"{path} configures no plants")
+    return plants
+
+
+# Data keys name their plant, so every cache keyed by a data key is scoped to one plant. The
+# default plant keeps bare keys, which the API shares.
+def scoped_key(plant, data_key):
+    return data_key if plant == DEFAULT_PLANT else f"{plant}/{data_key}"
+
+
+def tenant_of(key):
+    return key.split('/', 1)[0] if '/' in key else DEFAULT_PLANT
+
+
+# Approximate bytes a cached value holds in memory: columns and arrays by their buffers, text by
+# a sample of its strings, containers by their contents
+def sizeof(value):
+    if isinstance(value, pd.DataFrame):
+        return sum(sizeof(value[column]) for column in value.columns) + value.index.nbytes
+    if isinstance(value, pd.Series):
+        if value.dtype == object:
+            sample = value.head(1000)
+            per_value = np.mean([sys.getsizeof(v) for v in sample]) if len(sample) else 0
+            return int(len(value) * (8 + per_value)) + value.index.nbytes
+        return int(value.memory_usage(index=True, deep=False))
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(sizeof(k) + sizeof(v) for k, v in value.items())
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return sys.getsizeof(value) + sum(sizeof(v) for v in value)
+    return sys.getsizeof(value)
+
+
+# In-memory cache of every plant's datasets, indexes and results. Each plant has a quota: past it
+# the plant evicts its own least recently used entries, so a heavy plant only ever displaces
+# itself. Past the instance budget (when quotas are overcommitted) the plant furthest over its
+# quota, relative to the quota's size, gives up entries first. Values larger than their plant's
+# quota are computed but not kept. Identical computations in flight run once.
+class TenantCache:
+    def __init__(self, quotas, budget=None):
+        self.quotas = dict(quotas)
+        self.budget = budget or sum(self.quotas.values())
+        self.entries = collections.defaultdict(collections.OrderedDict)
+        self.usage = collections.Counter()
+        self.counters = collections.defaultdict(collections.Counter)
+        self.lock = threading.Lock()
+        self.inflight = {}
+
+    def quota(self, tenant):
+        return self.quotas.get(tenant, TENANT_QUOTA_BYTES)
+
+    def get_or_compute(self, tenant, key, compute):
+        missing = object()
+        while True:
+            with self.lock:
+                value = self._get(tenant, key, missing)
+                if value is not missing:
+                    return value
+                waiting = self.inflight.get((tenant, key))
+                if waiting is None:
+                    self.inflight[(tenant, key)] = done = threading.Event()
+                    self.counters[tenant]['misses'] += 1
+                    break
+            # Another thread is computing it; use its result (or compute if it failed or was not kept)
+            waiting.wait()
+            with self.lock:
+                value = self._get(tenant, key, missing)
+                if value is not missing:
+                    return value
+        try:
+            value = compute()
+            self._put(tenant, key, value)
+            return value
+        finally:
+            with self.lock:
+                del self.inflight[(tenant, key)]
+            done.set()
+
+    def _get(self, tenant, key, default):
+        entries = self.entries[tenant]
+        if key not in entries:
+            return default
+        entries.move_to_end(key)
+        self.counters[tenant]['hits'] += 1
+        return entries[key][0]
+
+    def _put(self, tenant, key, value):
+        size = sizeof(value)
+        with self.lock:
+            if size > self.quota(tenant):
+                self.counters[tenant]['rejected'] += 1
+                return
+            entries = self.entries[tenant]
+            if key in entries:
+                self.usage[tenant] -= entries.pop(key)[1]
+            entries[key] = (value, size)
+            self.usage[tenant] += size
+            while self.usage[tenant] > self.quota(tenant):
+                self._evict(tenant)
+            while sum(self.usage.values()) > self.budget:
+                self._evict(max((t for t in self.usage if self.entries[t]),
+                                key=lambda t: self.usage[t] / self.quota(t)))
+
+    def _evict(self, tenant):
+        _, (_, size) = self.entries[tenant].popitem(last=False)
+        self.usage[tenant] -= size
+        self.counters[tenant]['evictions'] += 1
+
+    def clear(self, tenant):
+        with self.lock:
+            self.entries[tenant].clear()
+            self.usage[tenant] = 0
+
+    # Per-plant usage: entries, megabytes held against the quota, hits, misses, hit rate,
+    # evictions and values too large to keep
+    def stats(self):
+        with self.lock:
+            tenants = sorted(set(self.quotas) | set(self.entries))
+            rows = []
+            for tenant in tenants:
+                counters = self.counters[tenant]
+                lookups = counters['hits'] + counters['misses']
+                rows.append({
+                    'Plant': tenant, 'Entries': len(self.entries[tenant]),
+                    'Used_MB': round(self.usage[tenant] / MB, 1), 'Quota_MB': round(self.quota(tenant) / MB, 1),
+                    'Used_%': round(100 * self.usage[tenant] / self.quota(tenant), 1),
+                    'Hits': counters['hits'], 'Misses': counters['misses'],
+                    'Hit_Rate_%': round(100 * counters['hits'] / lookups, 1) if lookups else None,
+                    'Evictions': counters['evictions'], 'Too_Large': counters['rejected']
+                })
+        return pd.DataFrame(rows)
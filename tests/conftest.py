@@ -0,0 +1,22 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WORKBOOK = os.path.join(ROOT, 'Labor_Productivity_Analytics_Dataset.xlsx')
+
+# The modules are flat scripts next to labour.py, and read their paths from the environment on
+# import: point them at the bundled workbook and at scratch stores and caches
+sys.path.insert(0, ROOT)
+_scratch = tempfile.mkdtemp(prefix='labour-tests-')
+os.environ['LABOUR_DATA_PATH'] = WORKBOOK
+os.environ['LABOUR_STORE_ROOT'] = os.path.join(_scratch, 'store')
+os.environ['LABOUR_CACHE_DIR'] = os.path.join(_scratch, 'cache')
+os.environ.pop('LABOUR_PLANTS', None)
+
+
+@pytest.fixture(scope='session')
+def workbook():
+    return WORKBOOK
@@ -0,0 +1,37 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import analytics
+
+
+@pytest.fixture
+def rows():
+    rng = np.random.default_rng(0)
+    n = 2000
+    rows = pd.DataFrame({column: rng.choice(['a', 'b', 'c'], n) for column in analytics.PIVOT_DIMENSIONS.values()})
+    for metric in analytics.PIVOT_METRICS:
+        rows[metric] = rng.normal(50, 10, n)
+    # A large offset with a small spread: raw sums of squares would cancel to noise
+    rows['Labor_Total_Output'] = 1e9 + rng.normal(0, 0.01, n)
+    rows.loc[rows.index[::7], 'Shift'] = np.nan
+    rows.loc[rows.index[::11], 'Productivity'] = np.nan
+    return rows
+
+
+@pytest.mark.parametrize('dims', [['Shift'], ['Department', 'Shift']])
+@pytest.mark.parametrize('metric', ['Productivity', 'Labor_Total_Output'])
+def test_pivot_matches_rows(rows, dims, metric):
+    cube = analytics.build_cube(rows)
+    expected = rows.groupby(dims, dropna=False)[metric].agg(['mean', 'std', 'count']).reset_index()
+    for how in ['mean', 'std', 'count']:
+        result = analytics.pivot(cube, dims, metric, how)
+        assert result[dims].equals(expected[dims])
+        np.testing.assert_allclose(result[metric], expected[how], rtol=1e-4)
+
+
+def test_cube_keeps_rows_with_missing_dimensions(rows):
+    cube = analytics.build_cube(rows)
+    assert cube['Productivity__count'].sum() == rows['Productivity'].notna().sum()
+    shifts = analytics.pivot(cube, ['Shift'], 'Productivity', 'count')
+    assert shifts['Shift'].isna().sum() == 1
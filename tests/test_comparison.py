@@ -0,0 +1,68 @@
+import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import comparison
+
+D = datetime.date
+
+
+@pytest.fixture
+def buckets():
+    # Unit_1 works both weeks, Unit_2 only the first and Unit_3 only the second
+    rows = pd.DataFrame({
+        'Date': pd.to_datetime(['2024-01-01', '2024-01-02', '2024-01-03', '2024-01-08', '2024-01-09']),
+        'Factory_Unit': ['Unit_1', 'Unit_1', 'Unit_2', 'Unit_1', 'Unit_3'],
+        'Productivity': [80.0, 90.0, 70.0, 100.0, 60.0],
+        'Labor_Efficiency_Rate': [1.0, 1.0, 1.0, 1.0, 1.0],
+        'Labor_Presence': [8.0, 8.0, 8.0, 8.0, 8.0],
+        'Labor_Total_Output': [40.0, 50.0, 30.0, 60.0, 20.0],
+        'Labor_Target_Output': [50.0, 50.0, 50.0, 50.0, 50.0]
+    })
+    others = [column for column in comparison.COMPARE_DIMENSIONS.values() if column not in rows]
+    return comparison.daily_buckets(rows.assign(**dict.fromkeys(others, 'All')))
+
+
+@pytest.mark.parametrize('mode, expected', [
+    ("Previous Period", (D(2024, 4, 24), D(2024, 4, 30))),
+    ("Previous Week", (D(2024, 4, 24), D(2024, 4, 30))),
+    ("Previous Month", (D(2024, 4, 1), D(2024, 4, 7))),
+    ("Same Period Last Year", (D(2023, 5, 1), D(2023, 5, 7)))
+])
+def test_prior_period(mode, expected):
+    assert comparison.prior_period(D(2024, 5, 1), D(2024, 5, 7), mode) == expected
+
+
+def test_prior_period_keeps_month_ends():
+    assert comparison.prior_period(D(2024, 3, 1), D(2024, 3, 31), "Previous Month") == (D(2024, 2, 1), D(2024, 2, 29))
+    assert comparison.prior_period(D(2024, 2, 1), D(2024, 2, 29), "Same Period Last Year") == (D(2023, 2, 1), D(2023, 2, 28))
+
+
+def test_compare_totals(buckets):
+    totals = comparison.compare(buckets, None, (D(2024, 1, 8), D(2024, 1, 14)),
+                                (D(2024, 1, 1), D(2024, 1, 7))).set_index('KPI')
+    assert list(totals.index) == list(comparison.KPIS)
+    assert totals.loc['Productivity', 'Current'] == 80.0
+    assert totals.loc['Productivity', 'Prior'] == 80.0
+    assert totals.loc['Labor_Total_Output', 'Delta'] == -40.0
+    assert totals.loc['Rows', 'Change_%'] == pytest.approx(-100 / 3)
+    assert totals.loc['Target_Attainment', 'Current'] == 80.0
+
+
+def test_compare_without_rows_has_every_kpi(buckets):
+    totals = comparison.compare(buckets, None, (D(2025, 1, 1), D(2025, 1, 2)),
+                                (D(2024, 12, 30), D(2024, 12, 31))).set_index('KPI')
+    assert list(totals.index) == list(comparison.KPIS)
+    assert totals[['Current', 'Prior', 'Delta', 'Change_%']].isna().all().all()
+
+
+def test_compare_by_value(buckets):
+    deltas = comparison.compare(buckets, 'Factory_Unit', (D(2024, 1, 8), D(2024, 1, 14)),
+                                (D(2024, 1, 1), D(2024, 1, 7)))
+    deltas = deltas[deltas['KPI'] == 'Productivity'].set_index('Factory_Unit')
+    assert deltas.loc['Unit_1', 'Delta'] == 15.0
+    assert deltas.loc['Unit_1', 'Change_%'] == pytest.approx(100 * 15 / 85)
+    assert np.isnan(deltas.loc['Unit_2', 'Current']) and np.isnan(deltas.loc['Unit_3', 'Prior'])
+    assert comparison.direction(deltas).to_dict() == {'Unit_1': 'Increase', 'Unit_2': 'Dropped', 'Unit_3': 'New'}
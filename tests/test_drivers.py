@@ -0,0 +1,74 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import drivers
+
+# Reference values from scipy.stats (f_oneway, kruskal, ttest_ind and the distributions' sf)
+PRODUCTIVITY = [71.5, 80.0, 75.2, 80.0, 90.1, 88.4, 92.0, 85.5, 60.3, 66.0, 70.0, 64.8]
+
+
+@pytest.fixture
+def rows():
+    return pd.DataFrame({
+        'Productivity': PRODUCTIVITY,
+        'Shift': ['Morning'] * 4 + ['Afternoon'] * 4 + ['Night'] * 4,
+        'Department': ['Assembly', 'Packaging'] * 6
+    })
+
+
+def test_tail_probabilities():
+    np.testing.assert_allclose(drivers.f_sf([0.5, 3.0, 10.0], [2, 5, 3], [1e6, 30, 7]),
+                               [0.6065308113452162, 0.025936992113207345, 0.006331603506624043], rtol=1e-9)
+    np.testing.assert_allclose(drivers.chi2_sf([0.5, 3.0, 40.0], [2, 5, 60]),
+                               [0.7788007830714049, 0.6999858358786276, 0.9781817824744425], rtol=1e-9)
+    np.testing.assert_allclose(drivers.t_two_sided([0.5, 3.0, -10.0], [2, 5e5, 3]),
+                               [0.6666666666666667, 0.0026999290204542626, 0.0021283990584141503], rtol=1e-9)
+    np.testing.assert_allclose(drivers.z_two_sided([0.0, 1.96, -3.0]),
+                               [1.0, 0.04999579029644087, 0.0026997960632601866], rtol=1e-9)
+
+
+def test_non_positive_shapes_are_nan():
+    assert np.isnan(drivers.gamma_inc_upper([0.0, -1.0], [1e-14, 1.0])).all()
+    assert np.isnan(drivers.beta_inc([0.0, 1.0], [1.0, -1.0], [0.5, 0.5])).all()
+
+
+def test_holm():
+    np.testing.assert_allclose(drivers.holm([0.01, 0.04, 0.03]), [0.03, 0.06, 0.06])
+
+
+def test_anova_and_kruskal_match_reference(rows):
+    ranking = drivers.driver_analysis(rows, dimensions=['Shift', 'Department'])['ranking'].set_index('Dimension')
+    shift = ranking.loc['Shift']
+    assert shift['Groups'] == 3 and shift['Rows'] == 12
+    assert shift['F'] == pytest.approx(41.64192991825153)
+    assert shift['ANOVA_p'] == pytest.approx(2.8250452821455153e-05)
+    assert shift['H'] == pytest.approx(9.880701754385965)
+    assert shift['Kruskal_p'] == pytest.approx(0.007152088427287768)
+    assert ranking.loc['Department', 'ANOVA_p'] == pytest.approx(0.8877019061517575)
+    # Ranked strongest first
+    assert ranking.index[0] == 'Shift' and ranking['Rank'].tolist() == [1, 2]
+
+
+def test_pairwise_tests(rows):
+    pairs = drivers.driver_analysis(rows, dimensions=['Shift', 'Department'])['pairs']
+    assert len(pairs) == 3 + 1
+    pair = pairs[(pairs['Group_A'] == 'Morning') & (pairs['Group_B'] == 'Afternoon')].iloc[0]
+    assert pair['Welch_t'] == pytest.approx(-4.966976037373752)
+    assert pair['Welch_p'] == pytest.approx(0.0037200307473994965)
+    assert (pairs['Welch_p_Holm'] >= pairs['Welch_p']).all()
+
+
+# One group left in view has nothing to test; it used to reach lgamma(0)
+def test_single_group_dimension_is_untested(rows):
+    result = drivers.driver_analysis(rows[rows['Shift'] == 'Night'], dimensions=['Shift', 'Department'])
+    shift = result['ranking'].set_index('Dimension').loc['Shift']
+    assert shift['Groups'] == 1
+    assert np.isnan(shift[['F', 'ANOVA_p', 'H', 'Kruskal_p']].astype(float)).all()
+    assert (result['pairs']['Dimension'] != 'Shift').all()
+
+
+def test_empty_rows(rows):
+    result = drivers.driver_analysis(rows.iloc[:0], dimensions=['Shift', 'Department'])
+    assert result['ranking']['Groups'].tolist() == [0, 0]
+    assert result['pairs'].empty
@@ -0,0 +1,73 @@
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import export
+
+
+def frame(n):
+    rng = np.random.default_rng(0)
+    rows = pd.DataFrame({
+        'Date': pd.date_range('2024-01-01', periods=n, freq='h'),
+        'Shift': rng.choice(['Morning', 'Night'], n).astype(object),
+        'Rows': np.arange(n, dtype='int64'),
+        'Productivity': rng.uniform(0, 100, n).round(4)
+    })
+    # A text column empty in whole chunks and a missing measure
+    rows['Anomaly_Conduct'] = pd.Series([None] * n, dtype=object)
+    rows.loc[rows.index[n // 2:], 'Anomaly_Conduct'] = 'Late'
+    rows.loc[rows.index[::5], 'Productivity'] = np.nan
+    return rows
+
+
+def read_back(buffer, fmt):
+    buffer = io.BytesIO(buffer.getvalue())
+    if fmt == 'csv':
+        return pd.read_csv(buffer, parse_dates=['Date'], dtype={'Shift': object, 'Anomaly_Conduct': object})
+    if fmt == 'parquet':
+        return pd.read_parquet(buffer).astype({'Shift': object, 'Anomaly_Conduct': object})
+    return pd.read_excel(buffer, sheet_name=None, engine='openpyxl')['Rows 1']
+
+
+# Missing text reads back as NaN, None or <NA> depending on the format
+def text_as_nan(df):
+    return df.assign(**{column: df[column].astype(object).where(df[column].notna(), np.nan)
+                        for column in ['Shift', 'Anomaly_Conduct']})
+
+
+def assert_round_trip(rows, result):
+    assert list(result.columns) == list(rows.columns)
+    assert len(result) == len(rows)
+    pd.testing.assert_frame_equal(text_as_nan(result), text_as_nan(rows), check_dtype=False)
+
+
+@pytest.mark.parametrize('fmt', list(export.FORMATS))
+def test_round_trip_over_several_chunks(fmt):
+    rows = frame(50)
+    positions = np.arange(3, 50, 2)
+    result = read_back(export.to_buffer(export.row_chunks(rows, positions, chunk_rows=7), fmt), fmt)
+    assert_round_trip(rows.iloc[positions].reset_index(drop=True), result)
+
+
+@pytest.mark.parametrize('fmt', list(export.FORMATS))
+def test_empty_slice(fmt):
+    rows = frame(10)
+    result = read_back(export.to_buffer(export.row_chunks(rows, np.empty(0, dtype=np.intp)), fmt), fmt)
+    assert list(result.columns) == list(rows.columns) and result.empty
+
+
+@pytest.mark.parametrize('fmt', ['csv', 'parquet'])
+def test_more_rows_than_a_chunk(fmt):
+    rows = frame(export.CHUNK_ROWS + 1)
+    assert len(list(export.row_chunks(rows))) == 2
+    assert_round_trip(rows, read_back(export.to_buffer(export.row_chunks(rows), fmt), fmt))
+
+
+def test_size_cap():
+    rows = frame(5000)
+    assert 0 < export.estimate_bytes(rows, len(rows))
+    assert export.estimate_bytes(rows, 0) == 0
+    with pytest.raises(export.ExportTooLarge):
+        export.to_buffer(export.row_chunks(rows, chunk_rows=100), 'csv', max_bytes=10_000)
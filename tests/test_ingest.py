@@ -0,0 +1,67 @@
+import pandas as pd
+import pytest
+
+import ingest
+import validation
+
+
+@pytest.fixture(scope='module')
+def sample(workbook):
+    return pd.read_excel(workbook, engine='openpyxl').head(50)
+
+
+@pytest.fixture
+def bad_csv(sample, tmp_path):
+    rows = sample.astype({'Date': object})
+    rows.loc[3, 'Productivity'] = 150
+    rows.loc[7, 'Shift'] = 'Lunch'
+    rows.loc[9, 'Date'] = 'not a date'
+    path = tmp_path / 'bad.csv'
+    rows.to_csv(path, index=False)
+    return str(path)
+
+
+def test_bad_rows_are_quarantined(bad_csv):
+    data, quarantine = ingest.ingest([bad_csv])
+    assert len(data) == 47
+    assert data['Productivity'].between(0, 100).all()
+    assert pd.api.types.is_datetime64_any_dtype(data['Date'])
+    # Header on row 1, so frame row i is file row i + 2
+    assert quarantine['Source_Row'].tolist() == [5, 9, 11]
+    assert (quarantine[ingest.SOURCE_COLUMN] == 'bad.csv').all()
+    reasons = quarantine.set_index('Source_Row')['Reason']
+    assert 'Productivity: outside 0..100' in reasons[5]
+    assert reasons[9].startswith('Shift: not one of')
+    assert reasons[11] == 'Date: not a date'
+
+
+def test_summary_counts_each_problem(bad_csv):
+    _, quarantine = ingest.ingest([bad_csv])
+    summary = validation.summarise(quarantine).set_index('Problem')
+    assert summary.loc['Date: not a date', 'Rows'] == 1
+    assert summary.loc['Date: not a date', 'First_Seen'] == 'bad.csv row 11'
+
+
+@pytest.mark.parametrize('productivity, zone, valid', [
+    (79.9, 'Red', True), (80.0, 'Red', False), (80.0, 'Yellow', True), (89.9, 'Yellow', True),
+    (90.0, 'Yellow', False), (90.0, 'Green', True), (100.0, 'Green', True)
+])
+def test_zone_bands_match_zone_assignment(sample, productivity, zone, valid):
+    rows = sample.head(1).assign(Productivity=productivity, Productivity_Zone=zone)
+    clean, quarantine = validation.validate(rows)
+    assert len(clean) == int(valid)
+    if not valid:
+        assert quarantine['Reason'].iloc[0].startswith(f"Productivity_Zone: {zone} needs Productivity")
+
+
+def test_missing_columns_reject_the_file(sample, tmp_path):
+    path = tmp_path / 'renamed.csv'
+    sample.rename(columns={'Productivity': 'Prod'}).to_csv(path, index=False)
+    with pytest.raises(validation.SchemaError, match='missing column'):
+        ingest.ingest([str(path)])
+
+
+def test_load_dataset_partitions_the_clean_rows(bad_csv):
+    data, partitions, quarantine = ingest.load_dataset([bad_csv])
+    assert len(data) == 47 and len(quarantine) == 3
+    assert partitions['Rows'].sum() == len(data)
@@ -0,0 +1,63 @@
+import ast
+import datetime
+
+import pytest
+from streamlit.testing.v1 import AppTest
+
+from report import APP_PATH, CATEGORY_LABEL, DATE_LABELS, MULTISELECT_LABELS, PAGE_LABELS, find_widget
+
+
+# (category, page) of every dashboard page, read from labour.py's ANALYSIS_PAGES
+def dashboard_pages():
+    with open(APP_PATH, encoding='utf-8') as f:
+        tree = ast.parse(f.read())
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and any(getattr(t, 'id', None) == 'ANALYSIS_PAGES' for t in node.targets):
+            pages = ast.literal_eval(node.value)
+            return [(category, page) for category, names in pages.items() for page in names]
+    raise AssertionError("ANALYSIS_PAGES not found in labour.py")
+
+
+PAGES = dashboard_pages()
+# A narrow view (one shift of one factory from March) and one that matches no rows at all
+VIEWS = {
+    'narrow': {'Shift': ['Overtime'], 'Factory_Unit': ['Unit_1'], 'start_date': datetime.date(2024, 3, 1)},
+    'empty': {'Shift': ['Overtime'], 'Factory_Unit': ['Unit_1'], 'Machine_Unit': ['Machine_6'],
+              'start_date': datetime.date(2024, 1, 1), 'end_date': datetime.date(2024, 1, 2)}
+}
+
+
+@pytest.fixture(scope='module', params=list(VIEWS))
+def app(request):
+    app = AppTest.from_file(APP_PATH, default_timeout=300)
+    app.run()
+    for key, value in VIEWS[request.param].items():
+        if key in DATE_LABELS:
+            find_widget(app.sidebar.date_input, DATE_LABELS[key]).set_value(value)
+        else:
+            find_widget(app.sidebar.multiselect, MULTISELECT_LABELS[key]).set_value(value)
+    app.run()
+    assert not app.exception, [e.value for e in app.exception]
+    return app
+
+
+@pytest.mark.parametrize('category, page', PAGES, ids=[page for _, page in PAGES])
+def test_page_renders(app, category, page):
+    find_widget(app.sidebar.radio, CATEGORY_LABEL).set_value(category)
+    app.run()
+    find_widget(app.sidebar.radio, PAGE_LABELS[category]).set_value(page)
+    app.run()
+    assert not app.exception, [e.value for e in app.exception]
+
+
+@pytest.mark.parametrize('mode', ["Previous Period", "Same Period Last Year"])
+def test_period_comparison_renders(app, mode):
+    category = "Parameters for Analytics"
+    find_widget(app.sidebar.radio, CATEGORY_LABEL).set_value(category)
+    find_widget(app.sidebar.checkbox, "Compare Periods").check()
+    app.run()
+    find_widget(app.sidebar.selectbox, "Compare Against").set_value(mode)
+    app.run()
+    assert not app.exception, [e.value for e in app.exception]
+    find_widget(app.sidebar.checkbox, "Compare Periods").uncheck()
+    app.run()
@@ -0,0 +1,42 @@
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import pytest
+
+import payload
+
+
+@pytest.fixture
+def rows():
+    rng = np.random.default_rng(1)
+    n = 30_000
+    return pd.DataFrame({
+        'Factory_Unit': rng.choice(['Unit_1', 'Unit_2', 'Unit_3'], n, p=[0.6, 0.3, 0.1]),
+        'Machine_Unit': rng.choice([f'Machine_{i}' for i in range(20)], n),
+        'Productivity': rng.uniform(0, 100, n)
+    })
+
+
+def test_sample_has_exactly_n_rows(rows):
+    # A continuous colour column would otherwise make every row its own group
+    for kwargs in ({}, {'color': 'Productivity'}, {'color': 'Factory_Unit'},
+                   {'color': 'Machine_Unit', 'symbol': 'Factory_Unit'}):
+        sample = payload._sample(rows, kwargs, 1001)
+        assert len(sample) == 1001
+        assert not sample.index.duplicated().any()
+
+
+def test_sample_keeps_group_shares(rows):
+    sample = payload._sample(rows, {'color': 'Factory_Unit'}, 1000)
+    expected = rows['Factory_Unit'].value_counts() * 1000 / len(rows)
+    counts = sample['Factory_Unit'].value_counts().reindex(expected.index)
+    assert (counts - expected).abs().max() < 1
+    assert sample.index.is_monotonic_increasing
+
+
+def test_govern_samples_within_budget(rows):
+    fig = payload.govern(px.scatter, rows, max_points=5000, x='Factory_Unit', y='Machine_Unit',
+                         size='Productivity', color='Productivity')
+    assert fig.layout.meta['level_of_detail'] == 'sampled'
+    assert sum(len(trace.x) for trace in fig.data) == 5000
+    assert fig.layout.title.subtitle.text.startswith('Sample of 5,000 of 30,000 rows')
@@ -0,0 +1,46 @@
+import os
+
+import pandas as pd
+import pytest
+
+import analytics
+import shared_store
+
+
+@pytest.fixture(scope='module')
+def dataset(workbook):
+    return shared_store.read_dataset(workbook)
+
+
+def _plain(df):
+    return df.astype({column: object for column in df.columns if isinstance(df[column].dtype, pd.CategoricalDtype)})
+
+
+def test_read_dataset_returns_rows_and_quarantine(dataset):
+    data, quarantine = dataset
+    assert len(data) > 0
+    assert 'Source_Row' in quarantine and 'Reason' in quarantine
+
+
+def test_publish_and_attach_round_trip(dataset, tmp_path):
+    data, quarantine = dataset
+    root = str(tmp_path)
+    version = shared_store.publish(data, root=root, quarantine=quarantine)
+    assert shared_store.current_version(root) == version
+
+    tables = shared_store.attach(root=root)
+    assert {'data', 'partitions', 'quarantine'} <= set(tables)
+    expected, partitions = analytics.partition_table(data)
+    pd.testing.assert_frame_equal(_plain(tables['data']), expected.reset_index(drop=True), check_dtype=False)
+    assert tables['partitions']['Rows'].sum() == len(data)
+    assert len(tables['quarantine']) == len(quarantine)
+
+
+def test_publish_keeps_recent_versions(dataset, tmp_path):
+    data, _ = dataset
+    root = str(tmp_path)
+    versions = [shared_store.publish(data.head(100), root=root, keep=2) for _ in range(3)]
+    assert len(set(versions)) == 3
+    assert shared_store.current_version(root) == versions[-1]
+    assert len(shared_store.attach(root=root)['data']) == 100
+    assert sorted(entry for entry in os.listdir(root) if not entry.startswith('.') and entry != 'CURRENT') == versions[1:]
@@ -0,0 +1,102 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+import tenants
+
+KB = 1024
+
+
+def block(kilobytes):
+    return np.zeros(kilobytes * KB, dtype=np.uint8)
+
+
+def put(cache, tenant, key, value):
+    return cache.get_or_compute(tenant, key, lambda: value)
+
+
+def keys(cache, tenant):
+    return list(cache.entries[tenant])
+
+
+def test_scoped_keys():
+    assert tenants.scoped_key(tenants.DEFAULT_PLANT, 'default:abc') == 'default:abc'
+    assert tenants.scoped_key('north', 'upload:abc') == 'north/upload:abc'
+    assert tenants.tenant_of('north/upload:abc') == 'north'
+    assert tenants.tenant_of('default:abc') == tenants.DEFAULT_PLANT
+
+
+def test_hits_do_not_recompute():
+    cache = tenants.TenantCache({'a': 100 * KB})
+    calls = []
+    for _ in range(3):
+        cache.get_or_compute('a', 'k', lambda: calls.append(1) or 'value')
+    assert calls == [1]
+    stats = cache.stats().set_index('Plant').loc['a']
+    assert (stats['Hits'], stats['Misses']) == (2, 1)
+
+
+def test_tenant_over_quota_evicts_its_own_least_recent_entries():
+    cache = tenants.TenantCache({'a': 100 * KB, 'b': 100 * KB})
+    put(cache, 'b', 'b1', block(40))
+    for key in ('a1', 'a2'):
+        put(cache, 'a', key, block(40))
+    put(cache, 'a', 'a1', None)  # a hit: a1 becomes most recent
+    put(cache, 'a', 'a3', block(40))
+    assert keys(cache, 'a') == ['a1', 'a3']
+    assert keys(cache, 'b') == ['b1']
+    assert cache.usage['a'] <= cache.quota('a')
+
+
+def test_budget_evicts_from_the_tenant_furthest_over_its_share():
+    cache = tenants.TenantCache({'a': 100 * KB, 'b': 200 * KB}, budget=150 * KB)
+    put(cache, 'a', 'a1', block(60))
+    put(cache, 'b', 'b1', block(40))
+    put(cache, 'b', 'b2', block(40))
+    # 160 KB held: a uses 80% of its quota and b 40%, so a gives up its oldest entry
+    put(cache, 'a', 'a2', block(20))
+    assert keys(cache, 'a') == ['a2']
+    assert keys(cache, 'b') == ['b1', 'b2']
+    assert sum(cache.usage.values()) <= cache.budget
+
+
+def test_values_larger_than_the_quota_are_not_kept():
+    cache = tenants.TenantCache({'a': 10 * KB})
+    assert len(put(cache, 'a', 'big', block(20))) == 20 * KB
+    assert keys(cache, 'a') == []
+    assert cache.stats().set_index('Plant').loc['a', 'Too_Large'] == 1
+
+
+def test_identical_computations_run_once():
+    cache = tenants.TenantCache({'a': 100 * KB})
+    calls = []
+    started = threading.Event()
+
+    def compute():
+        calls.append(1)
+        started.set()
+        time.sleep(0.2)
+        return 'value'
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_compute('a', 'k', compute)))
+               for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert calls == [1]
+    assert results == ['value'] * 8
+
+
+def test_failed_computation_is_retried():
+    cache = tenants.TenantCache({'a': 100 * KB})
+
+    def fail():
+        raise RuntimeError('boom')
+
+    with pytest.raises(RuntimeError):
+        cache.get_or_compute('a', 'k', fail)
+    assert cache.get_or_compute('a', 'k', lambda: 'value') == 'value'
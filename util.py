@@ -0,0 +1,34 @@
+import contextlib
+import os
+import re
+
+
+# URL- and file-name-safe form of a page, category or preset name
+def slugify(text):
+    return re.sub(r'[^a-z0-9]+', '-', str(text).lower()).strip('-') or 'page'
+
+
+# Exclusive lock across processes for the duration of the block, held on `path`.lock so the file
+# itself can still be replaced atomically while it is held
+@contextlib.contextmanager
+def file_lock(path):
+    with open(f"{path}.lock", 'a+') as f:
+        if os.name == 'nt':
+            import msvcrt
+
+            f.seek(0)
+            # LK_LOCK retries for about 10 seconds before raising OSError
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
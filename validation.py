@@ -0,0 +1,136 @@
+import numpy as np
+import pandas as pd
+
+from analytics import FILTER_COLUMNS, MEASURES
+
+# Columns every file and worksheet must carry; names cannot change, only rows can be added
+REQUIRED_COLUMNS = ['Date'] + FILTER_COLUMNS + MEASURES
+# Columns a row may leave empty
+NULLABLE = ['Anomaly_Conduct']
+# Values the categorical columns may take
+DOMAINS = {
+    'Shift': ['Morning', 'Afternoon', 'Night', 'Overtime'],
+    'Productivity_Zone': ['Red', 'Yellow', 'Green']
+}
+# Inclusive (low, high) range of every measure; None leaves that side open
+RANGES = {
+    'Labor_Presence': (0, None),
+    'Labor_Total_Output': (0, None),
+    'Labor_Target_Output': (0, None),
+    'Labor_Efficiency_Rate': (0, 1),
+    'Productivity': (0, 100)
+}
+# Productivity band of every zone, so a zone cannot contradict the number it is derived from.
+# Bands are half-open, low <= Productivity < high (None leaves the top open), as zones are
+# assigned: Red below 80, Yellow from 80 up to 90, Green from 90.
+ZONE_BANDS = {'Red': (0, 80), 'Yellow': (80, 90), 'Green': (90, None)}
+
+# Rows checked at a time; bounds the temporary masks and reason strings of very large sheets
+CHUNK_ROWS = 250_000
+QUARANTINE_COLUMNS = ['Source_Row', 'Reason']
+# Problems and rows the error summaries show at most
+SUMMARY_LIMIT = 10
+PREVIEW_ROWS = 50
+
+
+class SchemaError(ValueError):
+    pass
+
+
+# Refuse a file or worksheet that lacks expected columns; its rows cannot be checked one by one
+def check_columns(df, name):
+    missing = [column for column in REQUIRED_COLUMNS if column not in df]
+    if missing:
+        unexpected = [column for column in df.columns if column not in REQUIRED_COLUMNS]
+        message = f"{name} is missing column(s) {', '.join(missing)}"
+        if unexpected:
+            message += f"; found unexpected column(s) {', '.join(unexpected)} (column names cannot change)"
+        raise SchemaError(message)
+
+
+def _out_of(values, low, high):
+    outside = pd.Series(False, index=values.index)
+    if low is not None:
+        outside |= values < low
+    if high is not None:
+        outside |= values > high
+    return outside
+
+
+def _bounds(low, high):
+    return f"{low if low is not None else '-inf'}..{high if high is not None else 'inf'}"
+
+
+def _out_of_band(values, low, high):
+    outside = values < low
+    if high is not None:
+        outside |= values >= high
+    return outside
+
+
+def _band(low, high):
+    return f"from {low} to under {high}" if high is not None else f"of {low} or more"
+
+
+# Check one chunk: coerce dates and measures, then test every rule at once per column. Returns
+# the coerced chunk, which rows failed and each failed row's reasons.
+def _check_chunk(chunk):
+    checked = chunk.copy()
+    bad = np.zeros(len(chunk), dtype=bool)
+    reasons = pd.Series('', index=chunk.index, dtype=object)
+
+    def flag(mask, reason):
+        mask = mask.to_numpy()
+        if mask.any():
+            bad[mask] = True
+            reasons[mask] += reason + '; '
+
+    checked['Date'] = pd.to_datetime(chunk['Date'], errors='coerce')
+    flag(chunk['Date'].notna() & checked['Date'].isna(), "Date: not a date")
+    for column in MEASURES:
+        checked[column] = pd.to_numeric(chunk[column], errors='coerce')
+        flag(chunk[column].notna() & checked[column].isna(), f"{column}: not a number")
+        flag(_out_of(checked[column], *RANGES[column]), f"{column}: outside {_bounds(*RANGES[column])}")
+    for column in REQUIRED_COLUMNS:
+        if column not in NULLABLE:
+            flag(chunk[column].isna(), f"{column}: missing")
+    for column, allowed in DOMAINS.items():
+        flag(chunk[column].notna() & ~chunk[column].isin(allowed), f"{column}: not one of {', '.join(allowed)}")
+    for zone, (low, high) in ZONE_BANDS.items():
+        flag((chunk['Productivity_Zone'] == zone) & _out_of_band(checked['Productivity'], low, high),
+             f"Productivity_Zone: {zone} needs Productivity {_band(low, high)}")
+    return checked, bad, reasons[bad].str[:-2]
+
+
+# Validate the rows of one file or worksheet in chunks. Returns the clean rows, with dates and
+# measures coerced to their types, and the quarantined rows as they were read (as text) with
+# their row number in the file and every reason they failed.
+def validate(df, chunk_rows=CHUNK_ROWS):
+    clean, quarantined = [], []
+    for start in range(0, max(len(df), 1), chunk_rows):
+        chunk = df.iloc[start:start + chunk_rows]
+        checked, bad, reasons = _check_chunk(chunk)
+        if not bad.any():
+            clean.append(checked)
+            continue
+        clean.append(checked[~bad])
+        # Header on row 1, so row i of the frame is row i + 2 of the file
+        quarantined.append(chunk[bad].astype('string').assign(
+            Source_Row=np.flatnonzero(bad) + start + 2, Reason=reasons))
+    quarantine = (pd.concat(quarantined, ignore_index=True) if quarantined else
+                  pd.DataFrame(columns=list(df.columns) + QUARANTINE_COLUMNS))
+    return pd.concat(clean), quarantine
+
+
+# Bounded summary of a quarantine: rows failing each rule, most frequent first, with the first
+# offending row of each
+def summarise(quarantine, limit=SUMMARY_LIMIT):
+    if quarantine.empty:
+        return pd.DataFrame(columns=['Problem', 'Rows', 'First_Seen'])
+    problems = quarantine.assign(Problem=quarantine['Reason'].str.split('; ')).explode('Problem')
+    first_seen = problems['Source_Row'].astype(str)
+    if 'Source_File' in problems:
+        first_seen = problems['Source_File'].astype(str) + ' row ' + first_seen
+    summary = problems.assign(First_Seen=first_seen).groupby('Problem', sort=False).agg(
+        Rows=('Problem', 'size'), First_Seen=('First_Seen', 'first'))
+    return summary.sort_values('Rows', ascending=False, kind='stable').head(limit).reset_index()